@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+
+import numpy as np
+
+from duckdaq.util import isRecords, fromRecords, drainQueue
+
+class AsyncBridge():
+    """
+    Wakes up an asyncio event loop, whenever something is put into a MeasurementQueue.
+
+    The producers of duckDAQ are threads (and the stream reader process behind them). The
+    bridge registers a listener at the queue (see MeasurementQueue.add_listener()), which
+    writes one byte into a pipe. The read end of the pipe is watched by the event loop
+    (loop.add_reader()), so waiting coroutines are woken up by the file descriptor, without
+    polling and without a thread per consumer. Several puts in a row cause only one write.
+    Event loops without add_reader() (the proactor loop on Windows) are woken up with
+    loop.call_soon_threadsafe() instead.
+
+    *Arguments*
+
+        queue : MeasurementQueue
+            The queue to watch.
+        loop : asyncio.AbstractEventLoop
+            The loop to wake up. None: the running loop.
+
+    """
+    def __init__(self, queue, loop=None):
+        if loop is None:
+            loop = asyncio.get_running_loop()
+
+        self.queue = queue
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.pending = False        # a wakeup is on the way
+
+        self.rfd, self.wfd = os.pipe()
+        os.set_blocking(self.rfd, False)
+        os.set_blocking(self.wfd, False)
+        try:
+            loop.add_reader(self.rfd, self.__wakeup)
+            self.notify = self.__write
+        except NotImplementedError:
+            os.close(self.rfd)
+            os.close(self.wfd)
+            self.rfd = self.wfd = None
+            self.notify = self.__call
+
+        queue.add_listener(self.notify)
+
+    def __write(self):
+        """ listener, called in the thread of the producer """
+        if self.pending:
+            return
+        self.pending = True
+        try:
+            os.write(self.wfd, b"\0")
+        except (BlockingIOError, OSError):     # pipe full or closed: a wakeup is pending anyway
+            pass
+
+    def __call(self):
+        if self.pending:
+            return
+        self.pending = True
+        try:
+            self.loop.call_soon_threadsafe(self.__wakeup)
+        except RuntimeError:                   # loop is closed
+            pass
+
+    def __wakeup(self):
+        """ called in the event loop """
+        if self.rfd is not None:
+            try:
+                while os.read(self.rfd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        # only after draining: a byte written meanwhile would be swallowed, and with
+        # pending True, no further byte would ever come. A put meanwhile is seen by the
+        # consumer, which drains the queue after the event.
+        self.pending = False
+        self.event.set()
+
+    async def wait(self):
+        """ Waits, until something was put into the queue or it was woken up. """
+        await self.event.wait()
+        self.event.clear()
+
+    def close(self):
+        """ Unregisters the listener and closes the pipe. """
+        self.queue.remove_listener(self.notify)
+        if self.rfd is not None:
+            self.loop.remove_reader(self.rfd)
+            os.close(self.rfd)
+            os.close(self.wfd)
+            self.rfd = self.wfd = None
+
+
+def drain(q):
+    """ takes one batch out of a queue without blocking, see util.drainQueue() """
+    return drainQueue(q)
+
+
+def toBlocks(items):
+    """ converts a list of queue items to blocks: consecutive tuples are stacked into one block """
+    blocks = []
+    rows = []
+    for data in items:
+        if isinstance(data, tuple):
+            rows.append(data)
+        else:
+            if len(rows) > 0:
+                blocks.append( np.asarray(rows, dtype=np.float64) )
+                rows = []
+            if isRecords(data):
+                data = fromRecords(data)
+            blocks.append(data)
+    if len(rows) > 0:
+        blocks.append( np.asarray(rows, dtype=np.float64) )
+    return blocks
+
+
+async def iterBlocks(meas):
+    """
+    Async generator of the data of a measurement, as blocks (see util.isBlock()). It ends,
+    when the measurement is not RUNNING any more and its queue is empty.
+
+    *Arguments*
+
+        meas : Measurement / VirtualMeasurement
+
+    """
+    bridge = AsyncBridge(meas.queue)
+    try:
+        while True:
+            running = meas.RUNNING      # before draining: data put before the end is drained too
+            items = drain(meas.queue)
+            for block in toBlocks(items):
+                yield block
+            if len(items) > 0:          # a batch is bounded, there may be more
+                continue
+            if not running:
+                break
+            await bridge.wait()
+    finally:
+        bridge.close()
+
+
+async def waitFinished(meas):
+    """
+    Waits until a measurement is not RUNNING any more.
+
+    *Arguments*
+
+        meas : Measurement / VirtualMeasurement
+
+    """
+    bridge = AsyncBridge(meas.queue)
+    try:
+        while meas.RUNNING:
+            await bridge.wait()
+    finally:
+        bridge.close()
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
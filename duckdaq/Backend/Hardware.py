@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+class Hardware():
+    """
+    The default backend: real U3 devices, driven by LabJackPython.
+
+    A backend provides everything of LabJackPython's u3 module, which duckDAQ uses:
+    the device class U3, the feedback commands (AIN, PortStateRead, TimerConfig, Timer0,
+    Timer1, Counter0, Counter1) and NullHandleException, which is raised when no device
+    is connected. This class simply passes them through from u3, which is imported
+    not until the first use.
+
+    See U3Emulator for a backend without hardware.
+
+    """
+    def __getattr__(self, name):
+        if name.startswith("__"):       # no special methods, i.e. for copy or pickle
+            raise AttributeError(name)
+
+        if name == "NullHandleException":
+            from LabJackPython import NullHandleException
+            return NullHandleException
+
+        import u3
+        return getattr(u3, name)
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+
+import struct
+import time
+import numpy as np
+
+# nominal calibration of a U3-HV, like LabJackPython uses without calibration data
+CALIBRATION = {
+    "lvSESlope" : 0.000037231,  "lvSEOffset" : 0.0,
+    "lvDiffSlope" : 0.000074463, "lvDiffOffset" : -2.44,
+    "hvAIN0Slope" : 0.000314,   "hvAIN0Offset" : -10.3,
+    "hvAIN1Slope" : 0.000314,   "hvAIN1Offset" : -10.3,
+    "hvAIN2Slope" : 0.000314,   "hvAIN2Offset" : -10.3,
+    "hvAIN3Slope" : 0.000314,   "hvAIN3Offset" : -10.3,
+    }
+
+# a digital input reads HIGH above this voltage
+DIGITAL_THRESHOLD = 1.5
+
+
+#
+#   signal generators: take the time in seconds (float or ndarray), return volts
+#
+def sine(frequency=1, amplitude=1, offset=0):
+    """ Returns a sine generator for U3Emulator(signals=...). """
+    return lambda t: offset + amplitude * np.sin(2 * np.pi * frequency * t)
+
+def square(frequency=1, low=0, high=5):
+    """ Returns a square wave generator for U3Emulator(signals=...), starting with high. """
+    return lambda t: np.where( np.mod(t * frequency, 1) < 0.5, high, low )
+
+def constant(value=0):
+    """ Returns a generator of a constant voltage for U3Emulator(signals=...). """
+    return lambda t: value + 0 * np.asarray(t, dtype=np.float64)
+
+
+#
+#   feedback commands, named like the ones in LabJackPython's u3 module
+#
+class AIN():
+    def __init__(self, PositiveChannel, NegativeChannel=31, LongSettling=False, QuickSample=False):
+        self.positiveChannel = PositiveChannel
+        self.negativeChannel = NegativeChannel
+
+class BitStateRead():
+    def __init__(self, IONumber):
+        self.ioNumber = IONumber
+
+class PortStateRead():
+    pass
+
+class TimerConfig():
+    def __init__(self, timer, TimerMode, Value=0):
+        self.timer = timer
+        self.mode = TimerMode
+
+class Timer():
+    def __init__(self, timer, UpdateReset=False, Value=0, Mode=None):
+        self.timer = timer
+        self.reset = UpdateReset
+
+class Timer0(Timer):
+    def __init__(self, UpdateReset=False, Value=0, Mode=None):
+        Timer.__init__(self, 0, UpdateReset, Value, Mode)
+
+class Timer1(Timer):
+    def __init__(self, UpdateReset=False, Value=0, Mode=None):
+        Timer.__init__(self, 1, UpdateReset, Value, Mode)
+
+class Counter():
+    def __init__(self, counter, Reset=False):
+        self.counter = counter
+        self.reset = Reset
+
+class Counter0(Counter):
+    def __init__(self, Reset=False):
+        Counter.__init__(self, 0, Reset)
+
+class Counter1(Counter):
+    def __init__(self, Reset=False):
+        Counter.__init__(self, 1, Reset)
+
+class NullHandleException(Exception):
+    pass
+
+
+class U3Emulator():
+    """
+    A backend, which emulates U3-HV devices in-process. With it, the whole acquisition path
+    (stream reader, converter, poll and count loops, filters) runs without a LabJack, i.e.
+    for benchmarks on CI machines:
+
+        dd.Backend.use( dd.Backend.U3Emulator(signals={0: dd.Backend.sine(50, 2)},
+                                              latency=0.001) )
+        m = dd.Measurement(ports=["AIN0"], type="STREAM", scan_frequency=50000, max_count=10**6)
+        m.start_block()
+
+    The emulated device answers in the raw formats of the real one: streamData(convert=False)
+    delivers packets of 16 bit samples, getFeedback() raw AIN bits, timer and counter values.
+    Streaming is paced by the scan frequency, so a converter, which is too slow, really
+    falls behind.
+
+    *Arguments*
+
+        signals : dict
+            Channel number -> generator function of the time in seconds, returning volts. See
+            sine(), square() and constant(). Channels, which are not given, read 0V. Digital
+            inputs read HIGH above DIGITAL_THRESHOLD.
+        counter_frequency : tuple of two floats
+            Frequency of the events at Counter0 and Counter1 in Hz.
+        latency : float
+            Seconds every USB transaction (getFeedback, streamData request) takes additionally.
+        packets_per_request : int
+            Stream packets per streamData() request: the packet cadence.
+        noise : float
+            Standard deviation of gaussian noise added to the analog signals in volts.
+        serial : int
+            Serial number of the (first) emulated device.
+        devices : int
+            Number of emulated devices. They have consecutive serial numbers and
+            all get the same signals.
+
+    """
+    # the feedback commands, like in the u3 module
+    AIN = AIN
+    BitStateRead = BitStateRead
+    PortStateRead = PortStateRead
+    TimerConfig = TimerConfig
+    Timer0 = Timer0
+    Timer1 = Timer1
+    Counter0 = Counter0
+    Counter1 = Counter1
+    NullHandleException = NullHandleException
+
+    def __init__(self, signals=None,
+                       counter_frequency=(1000., 1000.),
+                       latency=0,
+                       packets_per_request=48,
+                       noise=0,
+                       serial=320000001,
+                       devices=1):
+        if signals is None:
+            signals = {}
+        self.signals = signals
+        self.counter_frequency = counter_frequency
+        self.latency = latency
+        self.packets_per_request = packets_per_request
+        self.noise = noise
+        self.serials = list( range(serial, serial + devices) )
+
+    def U3(self, debug=False, autoOpen=True, serial=None, **kargs):
+        """ Opens an emulated device, like u3.U3(). """
+        if serial is None:
+            serial = self.serials[0]
+        elif serial not in self.serials:
+            raise NullHandleException("no U3 with serial number " + str(serial))
+        return EmulatedU3(self, serial)
+
+
+class EmulatedU3():
+    """
+    The device of U3Emulator. Implements the parts of u3.U3, which duckDAQ uses.
+    """
+    def __init__(self, emulator, serial):
+        self.emulator = emulator
+        self.serialNumber = serial
+        self.isHV = True
+        self.calData = None
+        self.openTime = time.monotonic()
+
+        self.timerMode = [None, None]
+        self.counterZero = [0., 0.]     # time of the last counter reset
+
+        self.rng = np.random.default_rng()
+
+    #
+    #   helpers
+    #
+    def __now(self):
+        return time.monotonic() - self.openTime
+
+    def __usb(self):
+        """ one USB transaction """
+        if self.emulator.latency > 0:
+            time.sleep(self.emulator.latency)
+
+    def __volts(self, channel, t):
+        signal = self.emulator.signals.get(channel, None)
+        if signal is None:
+            volts = np.zeros( np.shape(t) )
+        else:
+            volts = np.asarray( signal(t), dtype=np.float64 )
+        if self.emulator.noise > 0:
+            volts = volts + self.rng.normal(0, self.emulator.noise, np.shape(t))
+        return volts
+
+    def __calibration(self, channel):
+        cal = self.calData if self.calData is not None else CALIBRATION
+        if self.isHV and channel < 4:
+            return cal["hvAIN%sSlope" % channel], cal["hvAIN%sOffset" % channel]
+        return cal["lvSESlope"], cal["lvSEOffset"]
+
+    def __bits(self, channel, volts):
+        """ volts -> raw 16 bit value, inverse calibration """
+        slope, offset = self.__calibration(channel)
+        return np.clip( np.rint( (volts - offset) / slope ), 0, 65535 ).astype(np.uint16)
+
+    def __digital(self, n, t):
+        return int( self.__volts(n, t) >= DIGITAL_THRESHOLD )
+
+    #
+    #   configuration
+    #
+    def getCalibrationData(self):
+        self.calData = dict(CALIBRATION)
+        return self.calData
+
+    def configU3(self, **kargs):
+        return {"SerialNumber" : self.serialNumber, "DeviceName" : "U3-HV (emulated)"}
+
+    def configIO(self, **kargs):
+        return kargs
+
+    def configAnalog(self, *fioNumbers):
+        pass
+
+    def configDigital(self, *fioNumbers):
+        pass
+
+    def configTimerClock(self, TimerClockBase=None, TimerClockDivisor=None):
+        return {"TimerClockBase" : TimerClockBase, "TimerClockDivisor" : TimerClockDivisor}
+
+    def close(self):
+        pass
+
+    #
+    #   command/response
+    #
+    def getFeedback(self, *commandlist):
+        """ executes all commands in one emulated USB transaction """
+        if len(commandlist) == 1 and isinstance(commandlist[0], list):
+            commandlist = commandlist[0]
+
+        self.__usb()
+        t = self.__now()
+
+        results = []
+        for command in commandlist:
+            if isinstance(command, AIN):
+                volts = self.__volts(command.positiveChannel, t)
+                results.append( int(self.__bits(command.positiveChannel, volts)) )
+            elif isinstance(command, BitStateRead):
+                results.append( self.__digital(command.ioNumber, t) )
+            elif isinstance(command, PortStateRead):
+                fio = 0
+                for n in range(8):
+                    fio = fio | (self.__digital(n, t) << n)
+                results.append( {"FIO" : fio, "EIO" : 0, "CIO" : 0} )
+            elif isinstance(command, TimerConfig):
+                self.timerMode[command.timer] = command.mode
+                results.append( None )
+            elif isinstance(command, Timer):
+                if self.timerMode[command.timer] == 10:     # system timer, 4MHz, low 32 bits
+                    results.append( int(t * 4e6) & 0xFFFFFFFF )
+                else:
+                    results.append( 0 )
+            elif isinstance(command, Counter):
+                n = command.counter
+                events = int( (t - self.counterZero[n]) * self.emulator.counter_frequency[n] )
+                results.append( events & 0xFFFFFFFF )
+                if command.reset:
+                    self.counterZero[n] = t
+            else:
+                raise NotImplementedError("feedback command " + type(command).__name__ + " is not emulated")
+
+        return results
+
+    def binaryToCalibratedAnalogVoltage(self, bits, isLowVoltage=True, isSingleEnded=True, isSpecialSetting=False, channelNumber=0):
+        cal = self.calData if self.calData is not None else CALIBRATION
+        if isLowVoltage:
+            return bits * cal["lvSESlope"] + cal["lvSEOffset"]
+        return bits * cal["hvAIN%sSlope" % channelNumber] + cal["hvAIN%sOffset" % channelNumber]
+
+    def getAIN(self, posChannel, negChannel=31, longSettle=False, quickSample=False):
+        bits = self.getFeedback( AIN(posChannel, negChannel, longSettle, quickSample) )[0]
+        isLowVoltage = not (self.isHV and posChannel < 4)
+        return self.binaryToCalibratedAnalogVoltage(bits, isLowVoltage=isLowVoltage, channelNumber=posChannel)
+
+    def getFIOState(self, fioNum):
+        return self.getFeedback( BitStateRead(fioNum) )[0]
+
+    #
+    #   stream
+    #
+    def streamConfig(self, NumChannels=1, PChannels=None, NChannels=None, Resolution=3, ScanFrequency=None, SamplesPerPacket=25, **kargs):
+        self.streamChannelNumbers = list(PChannels)
+        self.streamSamplesPerPacket = SamplesPerPacket
+        self.packetsPerRequest = self.emulator.packets_per_request
+        self.scanFrequency = ScanFrequency
+        self.streamPacketOffset = 0
+
+    def streamStart(self):
+        self.__usb()
+        self.streamStartTime = time.monotonic()
+        self.streamSample = 0       # samples of all channels, which are sent already
+        self.streamPacket = 0
+
+    def streamStop(self):
+        self.__usb()
+
+    def streamData(self, convert=False):
+        """ yields one request of raw packets, not before the last sample of it would be measured """
+        channels = np.asarray( self.streamChannelNumbers )
+        numChannels = len(channels)
+        samplesPerPacket = self.streamSamplesPerPacket
+        numSamples = samplesPerPacket * self.packetsPerRequest
+        sampleRate = float(self.scanFrequency) * numChannels
+
+        while True:
+            ready = self.streamStartTime + (self.streamSample + numSamples) / sampleRate
+            delay = ready - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.__usb()
+
+            index = np.arange(self.streamSample, self.streamSample + numSamples)
+            position = index % numChannels
+            t = (index // numChannels) / float(self.scanFrequency)
+
+            bits = np.empty( numSamples, dtype=np.uint16 )
+            for i, channel in enumerate(channels):
+                mask = position == i
+                bits[mask] = self.__bits( channel, self.__volts(channel, t[mask]) )
+
+            packets = np.zeros( (self.packetsPerRequest, 7 + samplesPerPacket), dtype="<u2" )
+            packets[:, 6:-1] = bits.reshape(self.packetsPerRequest, samplesPerPacket)
+            header = packets.view(np.uint8)
+            header[:, 10] = np.arange(self.streamPacket, self.streamPacket + self.packetsPerRequest) & 0xFF  # packet number
+
+            result = { "result" : packets.tobytes(),
+                       "numPackets" : self.packetsPerRequest,
+                       "firstPacket" : self.streamPacket & 0xFF,
+                       "missed" : 0,
+                       "errors" : 0 }
+
+            self.streamSample = self.streamSample + numSamples
+            self.streamPacket = self.streamPacket + self.packetsPerRequest
+
+            if convert:
+                result.update( self.processStreamData(result["result"]) )
+            yield result
+
+    def processStreamData(self, result, numBytes=None):
+        """ the per-sample decoding of LabJackPython, as reference for the vectorized one """
+        if numBytes is None:
+            numBytes = 14 + (self.streamSamplesPerPacket * 2)
+
+        returnDict = {}
+        for channel in self.streamChannelNumbers:
+            returnDict["AIN%d" % channel] = []
+
+        j = self.streamPacketOffset
+        for start in range(0, len(result), numBytes):
+            packet = result[start:start + numBytes]
+            for k in range(12, numBytes - 2, 2):
+                bits = struct.unpack("<H", packet[k:k + 2])[0]
+                channel = self.streamChannelNumbers[j]
+                isLowVoltage = not (self.isHV and channel < 4)
+                returnDict["AIN%d" % channel].append(
+                        self.binaryToCalibratedAnalogVoltage(bits, isLowVoltage=isLowVoltage, channelNumber=channel) )
+                j = (j + 1) % len(self.streamChannelNumbers)
+        self.streamPacketOffset = j
+
+        return returnDict
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
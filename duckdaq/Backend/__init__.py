@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+from .Hardware import Hardware
+from .U3Emulator import U3Emulator, sine, square, constant
+
+__all__ = ["Hardware", "U3Emulator", "sine", "square", "constant", "use", "current"]
+
+# the backend, which util.initLJ() and the measurements use
+__backend = Hardware()
+
+def use(backend):
+    """
+    Selects the backend for all measurements, which are started from now on.
+
+    *Arguments*
+
+        backend : Hardware / U3Emulator
+            The backend, Hardware() is the default.
+
+    *Returns*
+
+        None
+
+    """
+    global __backend
+    __backend = backend
+
+def current():
+    """
+    Returns the selected backend, see use().
+    """
+    return __backend
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
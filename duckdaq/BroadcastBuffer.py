@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+
+from duckdaq.MeasurementQueue import EndOfStream, itemBytes
+
+
+class BroadcastBuffer():
+    """
+    Fan-out of one stream to many readers, used by the Multiplexer. Instead of putting
+    every item into one queue per reader, put() appends it once to a shared buffer; every
+    subscriber has a cursor into it. An item is dropped from the buffer, as soon as the
+    slowest cursor has passed it. So a display, a recorder and an analysis chain fed from
+    one stream cost one copy, not three.
+
+    The items are shared by all subscribers, so they must not be changed: the subscribers
+    get read-only views of the blocks (copy them, if you want to modify them).
+
+    Subscribers can be added and removed at any time. A new subscriber starts at the
+    end of the buffer, it gets the items put after subscribe(). A subscriber can be
+    bounded, see BroadcastQueue.limit().
+
+        buffer = BroadcastBuffer()
+        q = buffer.subscribe()          # queue-like, see BroadcastQueue
+        buffer.put(block)
+        q.get()
+
+    *Variables*
+
+        subscribers : tuple of BroadcastQueue
+            The current subscribers.
+        rows_put : int
+            Number of samples put.
+        bytes_put : int
+            Bytes of the items put (estimated for tuples).
+
+    """
+    def __init__(self):
+        self.items = deque()
+        self.offsets = deque()      # bytes_put before each item
+        self.first = 0              # sequence number of items[0]
+        self.subscribers = ()
+        self.rows_put = 0
+        self.bytes_put = 0
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+
+    def __len__(self):
+        return len(self.items)
+
+    def subscribe(self):
+        """
+        Adds a subscriber.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            queue : BroadcastQueue
+                Reads the items put from now on.
+
+        """
+        with self.mutex:
+            subscriber = BroadcastQueue(self, self.first + len(self.items))
+            self.subscribers = self.subscribers + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """
+        Removes a subscriber. The items, it has not read yet, are given free. A waiting
+        get() of the subscriber returns EndOfStream.
+
+        *Arguments*
+
+            subscriber : BroadcastQueue
+
+        *Returns*
+
+            None
+
+        """
+        with self.mutex:
+            self.subscribers = tuple( [ s for s in self.subscribers if s is not subscriber ] )
+            subscriber.closed = True
+            self._reclaim()
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+        subscriber.wake()
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Appends an item for all subscribers. Blocks are shared as read-only views, the
+        array of the caller stays writeable. If a subscriber with overflow "block" is full,
+        put() waits like Queue.put().
+
+        *Arguments*
+
+            item : tuple / np.ndarray
+            block : bool
+                False: raise queue.Full at once, instead of waiting.
+            timeout : float
+                Raise queue.Full after so many seconds. None: wait as long as needed.
+
+        *Returns*
+
+            None
+
+        """
+        if isinstance(item, np.ndarray):
+            item = item.view()
+            item.flags.writeable = False
+            rows = len(item)
+        else:
+            rows = 1
+        nbytes = itemBytes(item)
+
+        with self.mutex:
+            if not self.not_full.wait_for(self._hasSpace, timeout if block else 0):
+                raise queue.Full
+            subscribers = self.subscribers
+            if len(subscribers) == 0:       # nobody would ever read it
+                return
+            self.items.append(item)
+            self.offsets.append(self.bytes_put)
+            self.rows_put = self.rows_put + rows
+            self.bytes_put = self.bytes_put + nbytes
+            end = self.first + len(self.items)
+            skipped = False
+            for s in subscribers:
+                if not s.active:            # does not read, must not hold the items
+                    s.cursor = end
+                    skipped = True
+                    continue
+                s.rows_put = s.rows_put + rows
+                if s.overflow == "drop_oldest":
+                    while self._over(s):
+                        s.cursor = s.cursor + 1
+                        s.dropped = s.dropped + 1
+                        skipped = True
+                if end - s.cursor > s.highwater:
+                    s.highwater = end - s.cursor
+            if skipped:
+                self._reclaim()
+            self.not_empty.notify_all()
+
+        for s in subscribers:
+            for callback in s.listeners:
+                callback()
+
+    def _get(self, subscriber):
+        """ the item at the cursor of subscriber, called with the mutex held """
+        item = self.items[subscriber.cursor - self.first]
+        subscriber.cursor = subscriber.cursor + 1
+        if subscriber.cursor - 1 == self.first:     # maybe the slowest one
+            self._reclaim()
+        if subscriber.overflow == "block":
+            self.not_full.notify_all()
+        return item
+
+    def _unread(self, subscriber):
+        """ number and bytes of the items, subscriber has not read, called with the mutex held """
+        n = self.first + len(self.items) - subscriber.cursor
+        if n <= 0:
+            return 0, 0
+        return n, self.bytes_put - self.offsets[subscriber.cursor - self.first]
+
+    def _over(self, subscriber):
+        """ True, if subscriber has more unread items than its limits (the newest one is kept) """
+        n, nbytes = self._unread(subscriber)
+        return (subscriber.maxsize > 0 and n > subscriber.maxsize) or \
+               (subscriber.max_memory is not None and n > 1 and nbytes > subscriber.max_memory)
+
+    def _hasSpace(self):
+        """ True, if no subscriber with overflow "block" is full, called with the mutex held """
+        for s in self.subscribers:
+            if not s.active or s.overflow != "block":
+                continue
+            n, nbytes = self._unread(s)
+            if (s.maxsize > 0 and n >= s.maxsize) or \
+               (s.max_memory is not None and n > 0 and nbytes >= s.max_memory):
+                return False
+        return True
+
+    def _reclaim(self):
+        """ drops the items, which every subscriber has read """
+        if len(self.subscribers) == 0:
+            oldest = self.first + len(self.items)
+        else:
+            oldest = min( [ s.cursor for s in self.subscribers ] )
+        while self.first < oldest:
+            self.items.popleft()
+            self.offsets.popleft()
+            self.first = self.first + 1
+
+
+class BroadcastQueue():
+    """
+    A subscriber of a BroadcastBuffer. It behaves like a MeasurementQueue for the readers
+    (get(), get_nowait(), empty(), qsize(), listeners, interrupt()), so it can be the queue
+    of a VirtualMeasurement. put() puts into the buffer, for all subscribers.
+
+    *Arguments*
+
+        buffer : BroadcastBuffer
+        cursor : int
+            Sequence number of the next item to read.
+
+    *Variables*
+
+        closed : bool
+            True, if the producer is finished (or the subscriber removed).
+        active : bool
+            If False, the subscriber gets nothing and does not hold items in the buffer,
+            i.e. while its measurement reads another queue.
+        maxsize, overflow, max_memory
+            The limits, see limit().
+        rows_put, highwater, dropped, spilled
+            Statistics like MeasurementQueue.
+
+    """
+    def __init__(self, buffer, cursor):
+        self.buffer = buffer
+        self.cursor = cursor
+        self.closed = True
+        self.active = True
+        self.maxsize = 0
+        self.overflow = "block"
+        self.max_memory = None
+        self.listeners = ()
+        self.rows_put = 0
+        self.highwater = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.__interrupts = 0
+
+    def qsize(self):
+        with self.buffer.mutex:
+            return self.__available()
+
+    def __available(self):
+        if self not in self.buffer.subscribers:
+            return 0
+        return self.buffer.first + len(self.buffer.items) - self.cursor
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def put(self, item, block=True, timeout=None):
+        self.buffer.put(item, block, timeout)
+
+    def limit(self, maxsize, overflow="block", max_memory=None):
+        """
+        Bounds the items, which this subscriber has not read yet, like
+        MeasurementQueue.limit(). The items are shared with the other subscribers, so
+        only two policies are possible: "block" (put() waits for this subscriber) and
+        "drop_oldest" (this subscriber skips its oldest items). max_memory bounds the
+        bytes of the unread items with the same policy, there is no spill file.
+
+        *Arguments*
+
+            maxsize : int
+                Maximum number of unread items. 0 means unbounded.
+            overflow : string
+                "block" or "drop_oldest".
+            max_memory : int
+                Maximum bytes of the unread items. None means unbounded.
+
+        *Returns*
+
+            None
+
+        """
+        if overflow not in ("block", "drop_oldest"):
+            raise ValueError("overflow of a BroadcastQueue has to be block or drop_oldest")
+
+        with self.buffer.mutex:
+            self.maxsize = maxsize
+            self.overflow = overflow
+            self.max_memory = max_memory
+            self.buffer.not_full.notify_all()      # maybe less strict now
+
+    def get(self, block=True, timeout=None):
+        """
+        Like MeasurementQueue.get(): a blocking get() without timeout returns EndOfStream,
+        if the queue is closed (or interrupted) and empty.
+        """
+        with self.buffer.not_empty:
+            if not block:
+                if not self.__available():
+                    raise queue.Empty
+            elif timeout is not None:
+                if not self.buffer.not_empty.wait_for(self.__available, timeout):
+                    raise queue.Empty
+            else:
+                while not self.__available():
+                    if self.__interrupts > 0:
+                        self.__interrupts = self.__interrupts - 1
+                        return EndOfStream
+                    if self.closed:
+                        return EndOfStream
+                    self.buffer.not_empty.wait()
+            return self.buffer._get(self)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def open(self):
+        """ Called by the producer, before it starts to put items. Interrupts of the
+        last run, which no get() has taken, are dropped. """
+        with self.buffer.mutex:
+            self.closed = False
+            self.rows_put = 0
+            self.highwater = self.__available()
+            self.__interrupts = 0
+
+    def close(self):
+        """ Called by the producer, when it is finished. """
+        with self.buffer.mutex:
+            self.closed = True
+            self.buffer.not_empty.notify_all()
+        self.wake()
+
+    def interrupt(self):
+        """ A waiting (or the next) blocking get() on an empty queue returns EndOfStream. """
+        with self.buffer.mutex:
+            self.__interrupts = self.__interrupts + 1
+            self.buffer.not_empty.notify_all()
+
+    def clear(self):
+        """ Skips everything, which is not read yet. """
+        with self.buffer.mutex:
+            if self in self.buffer.subscribers:
+                self.cursor = self.buffer.first + len(self.buffer.items)
+                self.buffer._reclaim()
+                self.buffer.not_full.notify_all()
+
+    def add_listener(self, callback):
+        """ See MeasurementQueue.add_listener(). """
+        self.listeners = self.listeners + (callback,)
+
+    def remove_listener(self, callback):
+        """ Unregisters a function of add_listener(). """
+        self.listeners = tuple( [ l for l in self.listeners if l is not callback ] )
+
+    def wake(self):
+        """ Calls the listeners without an item. """
+        for callback in self.listeners:
+            callback()
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+
+import queue
+
+from duckdaq.MeasurementQueue import EndOfStream
+from duckdaq.VirtualMeasurement import VirtualMeasurement
+
+
+class ColumnView(VirtualMeasurement):
+    """
+    Some ports of a measurement, created by select() / split() of the measurement. A view
+    has no thread: all views of a measurement read one BroadcastBuffer, which gets the
+    items of the measurement, and every view picks its columns, when an item is read. The
+    blocks are not copied, a view of them is returned, if the columns are evenly spaced
+    (i.e. one port, or every second one); otherwise the selected columns of the block are
+    copied at once. Records keep their fields, tuples are rebuilt.
+
+    A view can be the input of any filter, display or device:
+
+        meas = Measurement(ports=["AIN0", "AIN1", "AIN2"], type="STREAM")
+        a0, a1, a2 = meas.split()
+        schmitt = SchmittTrigger( meas.select(["AIN0", "AIN2"]) )
+
+    Views have to be created, before the measurement (or its filter) is started and before
+    filters read the measurement itself. From then on, the data goes to the views only,
+    the queue of the measurement itself stays empty (like after a ChannelSplitter). The
+    bound of that queue is taken over by every view (see BroadcastQueue.limit()). A view,
+    which is not read, keeps the data for it in memory; detach() it, if it is not needed
+    any more.
+
+    *Arguments*
+
+        parent : Measurement / VirtualMeasurement / ColumnView
+            The measurement to select from.
+        ports : list of strings / ints
+            The ports to select, by name or by index into parent.ports.
+
+    *Variables*
+
+        parent : Measurement / VirtualMeasurement
+            The measurement, where the data comes from (for a view of a view, the
+            measurement of the first one).
+        columns : list of ints
+            The columns of the items of parent, which are selected, 0 is the time.
+        ports : list of strings
+            The selected ports.
+        queue : ViewQueue
+            Queue-like, it returns the selected columns.
+
+    """
+    def __init__(self, parent, ports):
+        columns = []
+        for port in ports:
+            if isinstance(port, int):
+                if port < 0 or port >= len(parent.ports):
+                    raise ValueError("port index " + str(port) + " out of range")
+                columns.append(port + 1)    # time is column 0
+            elif port in parent.ports:
+                columns.append( parent.ports.index(port) + 1 )
+            else:
+                raise ValueError("port " + str(port) + " is not in the measurement")
+
+        if isinstance(parent, ColumnView):  # a view of a view reads the same buffer
+            columns = [ parent.columns[c] for c in columns ]
+            parent = parent.parent
+
+        self.parent = parent
+        self.parentFilter = None
+        self.columns = [0] + columns
+        self.ports = [ parent.ports[c - 1] for c in columns ]
+        self.FILE = None
+        self.consumers = []         # filters reading this view
+
+        self.dtype = None
+        if getattr(parent, "dtype", None) is not None:
+            import numpy as np
+            names = parent.dtype.names
+            self.dtype = np.dtype( [ (names[c], parent.dtype[c]) for c in self.columns ] )
+
+        source = viewSource(parent)
+        self.queue = ViewQueue(source.subscribe(), self.columns)
+        source.views = source.views + [self]
+        if not source.closed:       # the producer is running already
+            self.queue.open()
+
+    @property
+    def RUNNING(self):
+        """ True, while the parent measurement is RUNNING """
+        return self.parent.RUNNING
+
+    def findHardwareMeasurement(self, meas=None):
+        """
+        The hardware measurement of the parent, see VirtualMeasurement.findHardwareMeasurement().
+        """
+        return self.parent.findHardwareMeasurement()
+
+    def detach(self):
+        """
+        Removes the view from its measurement: it gets no more data, filters reading it
+        finish.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        source = viewSource(self.parent)
+        source.views = [ v for v in source.views if v is not self ]
+        source.buffer.unsubscribe(self.queue.subscriber)
+
+
+def viewSource(meas):
+    """
+    The ViewSource of a measurement. At the first call, it replaces the queue of meas,
+    which must not be started yet and must not be read by filters (they would get nothing
+    from then on). The limits of the queue are taken over, see ViewSource.limit().
+    """
+    if isinstance(meas.queue, ViewSource):
+        return meas.queue
+    if meas.RUNNING or getattr(meas, "ARMED", False):
+        raise RuntimeError("views have to be created, before the measurement is started")
+    if len(getattr(meas, "consumers", [])) > 0:
+        raise RuntimeError("views have to be created, before filters read the measurement")
+
+    source = ViewSource()
+    source.limit(getattr(meas.queue, "maxsize", 0),
+                 getattr(meas.queue, "overflow", "block"),
+                 getattr(meas.queue, "max_memory", None))
+    meas.queue = source
+    return meas.queue
+
+
+def columnSelector(columns):
+    """ a slice for evenly spaced columns (numpy returns a view then), otherwise the list """
+    if len(columns) == 1:
+        return slice(columns[0], columns[0] + 1)
+    step = columns[1] - columns[0]
+    if step > 0 and columns == list( range(columns[0], columns[-1] + 1, step) ):
+        return slice(columns[0], columns[-1] + 1, step)
+    return columns
+
+
+class ViewSource():
+    """
+    Stands in for the queue of a measurement, which has views: the producer puts its items
+    into one BroadcastBuffer, open() and close() are passed to the queues of the views.
+    For readers of the measurement itself, the queue is empty.
+
+    *Variables*
+
+        buffer : BroadcastBuffer
+            The items for the views.
+        views : list of ColumnView
+        closed : bool
+            True, if the producer is not running.
+        maxsize, overflow, max_memory
+            The limits of every view, see limit().
+
+    """
+    def __init__(self):
+        from duckdaq.BroadcastBuffer import BroadcastBuffer
+        self.buffer = BroadcastBuffer()
+        self.views = []
+        self.closed = True
+        self.maxsize = 0
+        self.overflow = "block"
+        self.max_memory = None
+        self.listeners = ()
+        self.dropped = 0
+        self.spilled = 0
+
+    @property
+    def rows_put(self):
+        return self.buffer.rows_put
+
+    @property
+    def highwater(self):
+        return max( [0] + [ view.queue.highwater for view in self.views ] )
+
+    def qsize(self):
+        return 0
+
+    def empty(self):
+        return True
+
+    def put(self, item, block=True, timeout=None):
+        self.buffer.put(item, block, timeout)
+
+    def subscribe(self):
+        """ A subscriber of the buffer for a new view, with the limits. """
+        subscriber = self.buffer.subscribe()
+        subscriber.limit(self.maxsize, self.overflow, self.max_memory)
+        return subscriber
+
+    def limit(self, maxsize, overflow="block", max_memory=None):
+        """
+        Bounds the queue of every view, see BroadcastQueue.limit(). The items are shared
+        by the views, so overflow can only be "block" or "drop_oldest", and max_memory
+        bounds the unread bytes of a view with the same policy, instead of spilling.
+
+        *Arguments*
+
+            maxsize : int
+            overflow : string
+            max_memory : int
+
+        *Returns*
+
+            None
+
+        """
+        if maxsize <= 0 and max_memory is None:     # unbounded, the policy does not matter
+            overflow = "block"
+        if overflow not in ("block", "drop_oldest"):
+            raise ValueError("the views of a measurement can only block or drop_oldest, not " + str(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.max_memory = max_memory
+        for view in self.views:
+            view.queue.limit(maxsize, overflow, max_memory)
+
+    def get(self, block=True, timeout=None):
+        """ Nothing comes here: EndOfStream for a blocking get(), queue.Empty otherwise. """
+        if not block or timeout is not None:
+            raise queue.Empty
+        return EndOfStream
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def open(self):
+        """ Called by the producer, opens the queues of the views. """
+        self.closed = False
+        for view in self.views:
+            view.queue.open()
+
+    def close(self):
+        """ Called by the producer, closes the queues of the views. """
+        self.closed = True
+        for view in self.views:
+            view.queue.close()
+
+    def interrupt(self):
+        pass
+
+    def clear(self):
+        """ Clears the queues of the views. """
+        for view in self.views:
+            view.queue.clear()
+
+    def add_listener(self, callback):
+        self.listeners = self.listeners + (callback,)
+
+    def remove_listener(self, callback):
+        self.listeners = tuple( [ l for l in self.listeners if l is not callback ] )
+
+
+class ViewQueue():
+    """
+    The queue of a ColumnView: a subscriber of the BroadcastBuffer of the measurement,
+    get() returns the selected columns of the items. Everything else is the one of
+    the BroadcastQueue.
+
+    *Arguments*
+
+        subscriber : BroadcastQueue
+        columns : list of ints
+            The selected columns, 0 (the time) included.
+
+    """
+    def __init__(self, subscriber, columns):
+        self.subscriber = subscriber
+        self.columns = columns
+        self.selector = columnSelector(columns)
+
+    def __getattr__(self, name):    # qsize(), open(), listeners, statistics, ...
+        return getattr(self.subscriber, name)
+
+    def select(self, item):
+        """ the selected columns of one item """
+        if isinstance(item, tuple):
+            return tuple( [ item[c] for c in self.columns ] )
+        if item.dtype.names is not None:    # records, a view of the fields
+            return item[ [ item.dtype.names[c] for c in self.columns ] ]
+        return item[:, self.selector]
+
+    def get(self, block=True, timeout=None):
+        item = self.subscriber.get(block, timeout)
+        if item is EndOfStream:
+            return item
+        return self.select(item)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
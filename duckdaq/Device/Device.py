@@ -4,10 +4,59 @@ from threading import Thread
 from duckdaq.Filter import Filter, Filter_Thread
 
 class Device(Filter):
+    """
+    A Filter for a sensor or apparatus. Devices are often built of other filters
+    (i.e. SchmittTrigger -> EdgeFinder), whose last output becomes the input of the
+    device thread. Such inner filters are put into self.filters and run by a
+    FusedExecutor in self.executor; start(), stop() and join() handle them together
+    with the device thread, so no thread is left behind.
+
+    *Arguments*
+
+        inm : Measurement / VirtualMeasurement
+            The input measurement.
+
+    *Variables*
+
+        ainm : Measurement / VirtualMeasurement
+            The input measurement of the device, self.inm may be the output of the
+            inner filters.
+        filters : list of Filter
+            The inner filters.
+        executor : FusedExecutor
+            Runs the inner filters, None if there are none.
+
+    """
     def __init__(self, inm):
         Filter.__init__(self, inm)
+        self.ainm = inm
+        self.filters = []
+        self.executor = None
+
+    def start(self, executor="thread"):
+        """
+        Starts the inner filters, then the device thread, see Filter.start().
+        """
+        if self.executor is not None:
+            self.executor.start()
+        Filter.start(self, executor)
+
+    def stop(self):
+        """
+        Stops the inner filters and the device thread.
+        """
+        if self.executor is not None:
+            self.executor.stop()
+        Filter.stop(self)
+
+    def join(self):
+        """
+        Waits, until the inner filters and the device thread are finished.
+        """
+        if self.executor is not None:
+            self.executor.join()
+        Filter.join(self)
 
-        
 
 """
 This file is part of duckDAQ.
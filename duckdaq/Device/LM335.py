@@ -51,6 +51,14 @@ class LM335_Thread(Filter_Thread):
 
         self.parent.outm.queue.put( tuple( newData ) )
 
+    def process_block(self, block):
+        newBlock = block.copy()
+        newBlock[:, 1:] = block[:, 1:] * 100 * self.parent.voltageDivider
+        if self.parent.celsius == True:
+            newBlock[:, 1:] -= 273.15
+
+        self.parent.outm.queue.put(newBlock)
+
 """
 This file is part of duckDAQ.
 
@@ -51,13 +51,15 @@ class SpikeWheel(Device):
 
         self.ainm = self.inm  # give to schmitttriger
 
-        from duckdaq.Filter import SchmittTrigger, EdgeFinder
+        from duckdaq.Filter import SchmittTrigger, EdgeFinder, FusedExecutor
         # create SchmittTrigger for digitalisation
         self.schmitt = SchmittTrigger(self.ainm)
-        self.schmitt.start()
         # create EdgeFinder for delays
         self.edge = EdgeFinder(self.schmitt.outm, putNones=True)  # without Nones, process is not called every sample
-        self.edge.start()
+
+        # both run in one thread, started by start()
+        self.filters = [self.schmitt, self.edge]
+        self.executor = FusedExecutor(self.filters)
 
         # will be called by the thread instead
         self.inm = self.edge.outm
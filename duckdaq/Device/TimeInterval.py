@@ -59,10 +59,10 @@ class TimeInterval(Device):
             raise TypeError("intervalType must be boolean")
 
 
-        from duckdaq.Filter import SchmittTrigger, EdgeFinder, Outlier_Buster
+        from duckdaq.Filter import SchmittTrigger, EdgeFinder, Outlier_Buster, FusedExecutor
         # create SchmittTrigger for digitalisation
         self.schmitt = SchmittTrigger(self.ainm)
-        self.schmitt.start()
+        self.filters = [self.schmitt]
 
         # for outliers
         #self.ob = Outlier_Buster(self.schmitt.outm)
@@ -75,32 +75,21 @@ class TimeInterval(Device):
             if len(invert) != len(self.inm.ports):
                 raise TypeError("invert invalid")
             
-            from duckdaq.Filter import ChannelSplitter, ChannelMerger, Inverter
+            from duckdaq.Filter import Inverter
 
-            self.cs = ChannelSplitter(self.ob.outm)
-            self.cs.start()
-            
-            # create inverter, if channel should be inverted
-            self.splittedChannels = []
-            for i, channel in zip( list(range(len(self.cs.outm))), self.cs.outm ):
-                if invert[i] == True:
-                    inv = Inverter(channel)
-                    inv.start()
-                    self.splittedChannels.append( inv.outm )
-                else:
-                    self.splittedChannels.append( channel )
-            
-            # merge channels together
-            self.cm = ChannelMerger( self.splittedChannels )
-            self.cm.start()
+            # only the selected channels, no splitting and merging
+            self.inv = Inverter( self.ob.outm, ports=[ i for i in range(len(invert)) if invert[i] == True ] )
+            self.filters.append(self.inv)
             
             # create EdgeFinder for delays
-            self.edge = EdgeFinder(self.cm.outm)
+            self.edge = EdgeFinder(self.inv.outm)
         else:
             # create EdgeFinder for delays
             self.edge = EdgeFinder(self.ob.outm)
+        self.filters.append(self.edge)
         
-        self.edge.start()
+        # the inner filters run in as few threads as possible, started by start()
+        self.executor = FusedExecutor(self.filters)
 
         # will be called by the thread instead
         self.inm = self.edge.outm
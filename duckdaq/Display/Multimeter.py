@@ -64,7 +64,7 @@ class Multimeter_Filter_Thread(Filter.Filter_Thread):
 
         # update the display one every ?? second
         time.sleep(self.parent.parent.update_time)
-        self.parent.parent.inm.queue.queue.clear()
+        util.clearQueue(self.parent.parent.inm.queue)
 
 
 
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class FeedbackScan():
+    """
+    Reads all ports of a poll measurement in one USB transaction.
+
+    Instead of one getAIN() / getFIOState() call per port, a single getFeedback() command
+    list is built once: one AIN command for every analog port and one PortStateRead for all
+    digital FIO pins. The answer is decoded vectorized: the raw AIN values are calibrated
+    with the arrays of util.calibrationArrays(), the digital states are bits of the FIO byte.
+    Besides the time saved, all ports are sampled within one transaction, so the skew
+    between the channels is minimal.
+
+    *Arguments*
+
+        labjack : U3.U3
+            **Initalised** LabJack instance, setDataDirection() has to be called already.
+        portlist : portlist created by Measurement.Daq_thread.create_portlist()
+            already formated portlist, **not a regular list of strings**
+        backend : Hardware / U3Emulator
+            Where the feedback commands come from, see Backend.current()
+
+    """
+    def __init__(self, labjack, portlist, backend):
+        from duckdaq.util import calibrationArrays
+
+        self.lj = labjack
+
+        analog = [ (i, n) for i, (typ, n) in enumerate(portlist) if typ == "A" ]
+        digital = [ (i, n) for i, (typ, n) in enumerate(portlist) if typ == "D" ]
+
+        self.commands = [ backend.AIN(n, 31) for (i, n) in analog ]   # single ended
+        self.numAnalog = len(analog)
+        if len(digital) > 0:
+            self.commands.append( backend.PortStateRead() )
+
+        self.slope, self.offset = calibrationArrays(labjack, [ n for (i, n) in analog ])
+        self.pins = np.asarray( [ n for (i, n) in digital ], dtype=np.int64 )
+
+        # results are computed analog first, then digital; this restores the order of the ports
+        columns = [ i for (i, n) in analog ] + [ i for (i, n) in digital ]
+        self.order = [ columns.index(i) for i in range(len(portlist)) ]
+
+    def read(self):
+        """
+        Reads all ports.
+
+        *Returns*
+
+            values : tuple
+                One value per port, in the order of the portlist. Analog ports in volts,
+                digital ports 0 or 1.
+
+        """
+        results = self.lj.getFeedback(self.commands)
+
+        bits = np.asarray( results[:self.numAnalog], dtype=np.float64 )
+        values = (bits * self.slope + self.offset).tolist()
+
+        if len(self.pins) > 0:
+            fio = results[self.numAnalog]["FIO"]
+            values = values + ( (fio >> self.pins) & 1 ).tolist()
+
+        return tuple( [ values[i] for i in self.order ] )
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import inspect
+
+from .Filter import Filter
+
+
+class AsyncFilter(Filter):
+    """
+    A filter, which runs as a task in an asyncio event loop instead of a thread. So many
+    filters (and displays) can run in one event loop, i.e. in a Jupyter notebook. The
+    filter is woken up by its input queue (see AsyncBridge), it does not poll.
+
+    Unlike Filter_Thread.process(), process() gets whole blocks (see util.isBlock()).
+    Either pass a function, or make an inheritance class and overload process(); both
+    may be coroutine functions.
+
+        async def scale(block):
+            block[:, 1:] *= 10
+            return block
+
+        f = AsyncFilter(meas, function=scale)
+        await asyncio.gather( meas.run(), f.run() )
+
+    The input measurement has to be RUNNING, when the filter starts, like with threaded
+    filters.
+
+    *Arguments*
+
+        in_measurement : Measurement / VirtualMeasurement
+            Measurement to read from
+        function : function
+            Called with every block. The result is put into the output measurement,
+            unless it is None.
+
+    *Variables*
+        outm : VirtualMeasurement
+            The output measurement
+        task : asyncio.Task
+            The task of start().
+
+    """
+    def __init__(self, in_measurement, function=None):
+        Filter.__init__(self, in_measurement)
+        self.function = function
+        self.task = None
+
+    def start(self):
+        """
+        Creates a task of run() in the running event loop.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            task : asyncio.Task
+
+        """
+        from duckdaq.util import openQueue
+
+        self.RUNNING = True
+        self.outm.RUNNING = True
+        openQueue(self.outm.queue)
+        self.task = asyncio.get_running_loop().create_task( self.run() )
+        return self.task
+
+    def stop(self):
+        """
+        Cancels the task of start().
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        if self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        """
+        Processes the input measurement until it is finished.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        from duckdaq.AsyncBridge import iterBlocks
+        from duckdaq.util import openQueue, closeQueue
+
+        self.RUNNING = True
+        self.outm.RUNNING = True
+        openQueue(self.outm.queue)
+        try:
+            async for block in iterBlocks(self.inm):
+                result = self.process(block)
+                if inspect.isawaitable(result):
+                    await result
+        finally:
+            self.RUNNING = False
+            self.outm.RUNNING = False
+            closeQueue(self.outm.queue)
+
+    async def process(self, block):
+        """
+        Processes one block. As implemented here, it calls the function of the arguments
+        and puts its result into the output queue.
+
+        *Arguments*
+
+            block : np.ndarray
+                data to process
+
+        *Returns*
+
+            None
+
+        """
+        if self.function is None:
+            return
+        result = self.function(block)
+        if inspect.isawaitable(result):
+            result = await result
+        if result is not None:
+            self.outm.queue.put(result)
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
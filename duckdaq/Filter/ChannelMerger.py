@@ -1,96 +1,381 @@
 # -*- coding: utf-8 -*-
 
-from .Filter import Filter, Filter_Thread
+from .Filter import Filter, Filter_Thread, register
 import queue
+import threading
+import time
+import numpy as np
+from duckdaq.util import closeQueue, isRecords, fromRecords
+from duckdaq.Stats import sampleAge
 
 class ChannelMerger(Filter):
     """
-    Merges the one-channel measurements (most likely) of a ChannelSplitter into one single
-    measurement. All channels **must** have the same timestamps.
+    Merges several measurements into one single measurement, i.e. the channels of a
+    ChannelSplitter, or a POLL digital and a STREAM analog measurement. The samples are
+    aligned by their timestamps, see MergeEngine: every output time (the clock) gets the
+    sample of every input, which is nearest to it (or the last one before it, align="asof"),
+    if it is not further away than tolerance. So inputs with other rates, or one which is a
+    sample behind, are merged correctly. With the defaults, every sample of the first input
+    gets the nearest samples of the others; for inputs with the same timestamps this is the
+    plain merge of the rows.
+
+    The output is a block (NaN for missing values), if all inputs give blocks, otherwise a
+    tuple per sample (None for missing values).
 
     The ChannelMerger takes a list of measurements, which is not supported by the Filter base class.
     Therefor some methods have to be rewritten. If you want to create something simlar, the sourcecode
     if this class is the right point to start.
-        
+
     *Arguments*
-        
+
         in_measList : **list** of Measurement / VirtualMeasurement
             The Measurements, which should be glued together.
-        
+        align : string
+            "nearest": the sample nearest to the output time.
+            "asof": the last sample at or before the output time.
+        tolerance : float
+            Maximal distance in seconds between the output time and the sample; a sample
+            further away is missing. None: no limit.
+        fill : string
+            None: missing samples are None / NaN.
+            "forward": missing samples are filled with the last sample before.
+        clock : int / "union" / float
+            The output times. int: the timestamps of this input (default 0, the first one).
+            "union": every timestamp of any input. float: a fixed period in seconds.
+        max_lag : float
+            An input, which is more than max_lag seconds (sample time) behind the others,
+            is not waited for: its samples are missing, until it catches up. None: wait.
+
     *Variables*
         self.outm : VirtualMeasurement
             The resulting single Measurement.
 
     """
-    def __init__(self, in_measList):
+    def __init__(self, in_measList, align="nearest", tolerance=None, fill=None, clock=0, max_lag=None):
+        self.RUNNING = False
         self.thread_class = ChannelMerger_Thread
-        
+
         from duckdaq import VirtualMeasurement
         self.inm = in_measList         # input measurement
         self.outm = VirtualMeasurement(parentFilter=self)          # output measuremnt
 
+        # check the arguments, before anything is registered
+        MergeEngine([ len(meas.ports) for meas in self.inm ], align, tolerance, fill, clock, max_lag)
+        self.align = align
+        self.tolerance = tolerance
+        self.fill = fill
+        self.clock = clock
+        self.max_lag = max_lag
+        register(self)
+
         # merge all portslists into one
         self.outm.ports = []
         for portslist in [meas.ports for meas in self.inm]:
             self.outm.ports = self.outm.ports + portslist
 
+
+class MergeEngine():
+    """
+    Sorted k-way merge of timestamped streams, used by the ChannelMerger. It has no thread:
+    add() gives it the items of an input, finish() tells, that an input is finished, merge()
+    returns the merged rows, which are complete.
+
+    An output time t is complete, if every input has a sample at or after t (or is finished,
+    or is more than max_lag behind): then no later sample can be a better match. Of the
+    samples before, only the last one is kept, so every input is buffered only as far as
+    the slowest input needs it.
+
+    The alignment is done per batch with np.searchsorted(), not per sample.
+
+        engine = MergeEngine([2, 1], align="asof", tolerance=0.01)
+        engine.add(0, block)
+        engine.add(1, (0.005, True))
+        items = engine.merge()
+
+    *Arguments*
+
+        widths : list of int
+            Number of ports of every input.
+        align, tolerance, fill, clock, max_lag
+            See ChannelMerger.
+
+    *Variables*
+
+        finished : list of bool
+            True for the inputs, which are finished.
+        last : float
+            The last output time.
+
+    """
+    def __init__(self, widths, align="nearest", tolerance=None, fill=None, clock=0, max_lag=None):
+        n = len(widths)
+        if align not in ("nearest", "asof"):
+            raise ValueError("align must be \"nearest\" or \"asof\"")
+        if fill not in (None, "forward"):
+            raise ValueError("fill must be None or \"forward\"")
+        if isinstance(clock, bool) or not ( clock == "union" or isinstance(clock, (int, float)) ):
+            raise ValueError("clock must be an input index, \"union\" or a period")
+        if isinstance(clock, int) and not 0 <= clock < n:
+            raise ValueError("clock input " + str(clock) + " does not exist")
+        if isinstance(clock, float) and clock <= 0:
+            raise ValueError("clock period must be positive")
+
+        self.align = align
+        self.tolerance = tolerance
+        self.fill = fill
+        self.clock = clock
+        self.max_lag = max_lag
+        self.widths = widths
+
+        self.times = [ np.empty(0) for i in range(n) ]     # per input: the buffered samples
+        self.values = [ None for i in range(n) ]            # 2-d, float or object
+        self.chunks = [ [] for i in range(n) ]              # added, not yet buffered
+        self.blocks = [ True for i in range(n) ]            # False, if the input gives tuples
+        self.finished = [ False for i in range(n) ]
+        self.first = None       # earliest sample time of all inputs
+        self.last = -np.inf     # last output time
+        self.flushed = False    # True, if all inputs are finished and merged
+
+    def add(self, i, item):
+        """
+        Adds an item (tuple, block or records) of input i. The times of an input must
+        increase.
+
+        *Arguments*
+
+            i : int
+                The input.
+            item : tuple / np.ndarray
+
+        *Returns*
+
+            None
+
+        """
+        if isRecords(item):
+            item = fromRecords(item)
+        if isinstance(item, tuple):
+            self.blocks[i] = False
+            row = np.empty( (1, len(item) - 1), dtype=object )
+            row[0, :] = item[1:]
+            self.chunks[i].append( ( np.array( [ item[0] ], dtype=np.float64 ), row ) )
+        elif len(item) > 0:
+            self.chunks[i].append( ( item[:, 0], item[:, 1:] ) )
+
+    def finish(self, i):
+        """ Input i is finished: it is not waited for any more. """
+        self.finished[i] = True
+
+    def done(self):
+        """ True, if no more output can come. """
+        if isinstance(self.clock, int) and self.finished[self.clock]:
+            self.__collect(self.clock)
+            if not np.any(self.times[self.clock] > self.last):
+                return True
+        return self.flushed
+
+    def __collect(self, i):
+        """ buffers the added chunks of input i """
+        if len(self.chunks[i]) == 0:
+            return
+        times = [ self.times[i] ] + [ t for t, v in self.chunks[i] ]
+        values = [ v for t, v in self.chunks[i] ]
+        if self.values[i] is not None:
+            values = [ self.values[i] ] + values
+        self.chunks[i] = []
+        self.times[i] = np.concatenate(times)
+        self.values[i] = np.concatenate(values)
+        if self.first is None or self.times[i][0] < self.first:
+            self.first = float(self.times[i][0])
+
+    def horizon(self):
+        """ the last output time, which is complete """
+        n = len(self.times)
+        for i in range(n):
+            self.__collect(i)
+
+        marks = [ self.times[i][-1] if len(self.times[i]) > 0 else None for i in range(n) ]
+        known = [ m for m in marks if m is not None ]
+        if len(known) == 0:
+            return np.inf if all(self.finished) else None
+        latest = max(known)
+
+        waiting = []
+        for i in range(n):
+            if self.finished[i]:
+                continue
+            mark = marks[i] if marks[i] is not None else self.first     # silent from the start
+            if self.max_lag is not None and mark < latest - self.max_lag:
+                continue
+            if marks[i] is None:        # nothing yet, which could be aligned
+                return None
+            waiting.append(marks[i])
+
+        if len(waiting) > 0:
+            return min(waiting)
+        if all(self.finished):
+            return np.inf
+        return latest
+
+    def merge(self):
+        """
+        The rows, which are complete.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            items : list
+                One block, or tuples. Empty, if nothing is complete.
+
+        """
+        horizon = self.horizon()
+        if horizon is None:
+            return []
+        if horizon == np.inf:       # everything, which is left
+            self.flushed = True
+
+        if self.clock == "union":
+            times = np.unique( np.concatenate( [ t for t in self.times ] ) )
+            times = times[ (times > self.last) & (times <= horizon) ]
+        elif isinstance(self.clock, float):
+            times = self.__ticks(horizon)
+        else:
+            times = self.times[self.clock]
+            times = times[ (times > self.last) & (times <= horizon) ]
+        if len(times) == 0:
+            return []
+
+        blocks = all(self.blocks)
+        columns = [ self.__align(i, times, blocks) for i in range( len(self.times) ) ]
+        self.last = float(times[-1])
+        self.__trim()
+
+        if blocks:
+            return [ np.column_stack( [times] + columns ) ]
+        rows = [ c.tolist() for c in columns ]
+        return [ tuple( [t] + [ v for row in sample for v in row ] )
+                 for t, sample in zip( times.tolist(), zip(*rows) ) ]
+
+    def __ticks(self, horizon):
+        """ output times of a fixed period """
+        if self.first is None:
+            return np.empty(0)
+        if horizon == np.inf:       # all finished: up to the last sample
+            horizon = max( [ t[-1] for t in self.times if len(t) > 0 ] )
+        start = max( self.first, self.last + self.clock / 2 )
+        begin = int( np.ceil(start / self.clock - 1e-9) )
+        end = int( np.floor(horizon / self.clock + 1e-9) )
+        return np.arange(begin, end + 1) * self.clock
+
+    def __align(self, i, times, blocks):
+        """ the values of input i at the output times, missing ones are NaN (blocks) / None """
+        t = self.times[i]
+        missing = np.nan if blocks else None
+        if len(t) == 0:
+            out = np.empty( (len(times), self.widths[i]), dtype=np.float64 if blocks else object )
+            out[:] = missing
+            return out
+
+        before = np.searchsorted(t, times, side="right") - 1   # last sample at or before
+        index = before.copy()
+        if self.align == "nearest":
+            after = np.minimum(before + 1, len(t) - 1)
+            closer = (t[after] >= times) & ( (before < 0) | (t[after] - times < times - t[np.maximum(before, 0)]) )
+            index[closer] = after[closer]
+
+        valid = index >= 0
+        if self.tolerance is not None:
+            valid &= np.abs( t[np.maximum(index, 0)] - times ) <= self.tolerance
+        if self.fill == "forward":      # the last sample before, even if too far away
+            index[~valid] = before[~valid]
+            valid = index >= 0
+
+        out = self.values[i][ np.maximum(index, 0) ]
+        if not blocks:
+            out = out.astype(object)
+        if not valid.all():
+            out[~valid] = missing
+        return out
+
+    def __trim(self):
+        """ drops the samples, which no later output time can use """
+        for i in range( len(self.times) ):
+            keep = np.searchsorted(self.times[i], self.last, side="right") - 1
+            if keep > 0:
+                self.times[i] = self.times[i][keep:]
+                self.values[i] = self.values[i][keep:]
+
+
 class ChannelMerger_Thread(Filter_Thread):
     def __init__(self, parent):
         Filter_Thread.__init__(self, parent)
+        self.engine = MergeEngine( [ len(meas.ports) for meas in self.parent.inm ], self.parent.align,
+                                   self.parent.tolerance, self.parent.fill, self.parent.clock, self.parent.max_lag )
+        self.wakeup = threading.Event()
 
-    def __get_data(self):
-        """ reads a data tuple from the inqueue. Return None, if queue is empty """
-        # data is now a list
-        data = []
+    def terminate(self):
+        """ Aborts the thread. """
+        self.STOP = True
+        self.wakeup.set()
 
-        # foreach queue
-        for inqueue in [meas.queue for meas in self.parent.inm]:
-            try:
-                data.append( inqueue.get(block=True, timeout=0.01) )
-            except queue.Empty:
-                return None
-        
-        return data
+    def __read(self):
+        """ gives everything, which is in the inqueues, to the engine; returns the number of items """
+        count = 0
+        for i, meas in enumerate(self.parent.inm):
+            if self.engine.finished[i]:
+                continue
+            inqueue = meas.queue
+            closed = getattr(inqueue, "closed", not meas.RUNNING)  # before reading: nothing comes after it
+            while True:
+                try:
+                    item = inqueue.get_nowait()
+                except queue.Empty:
+                    break
+                self.engine.add(i, item)
+                count = count + 1
+            if closed:
+                self.engine.finish(i)
+        return count
 
     def run(self):
-        """ this runs, until the inqueue is empty AND the inmeasuremnt is finished
-            A Filter subclass has to implement the process() method
-        """
+        """ this runs, until the inputs are finished and merged, or the thread is terminated """
         self.parent.outm.RUNNING = True
-        
-        while self.STOP == False:
-            data = self.__get_data()
-           
-            # is at least one incoming meas RUNNING
-            atLeastOneMeasRUNNING = False
-            for RUNNING in [meas.RUNNING for meas in self.parent.inm]:
-                if RUNNING == True:
-                    atLeastOneMeasRUNNING = True
-                    break
 
-            if data == None and atLeastOneMeasRUNNING == False:    # no more data chunks and measure is dead
-                self.STOP == True
-                break  
-            elif data == None: # dont process None data
-                pass
-            else:
-                self.process(data)
-        
-        # make things clear
-        self.parent.RUNNING = False
-        self.parent.outm.RUNNING = False
+        # every put into an input wakes the thread up, other queues are polled
+        queues = [ meas.queue for meas in self.parent.inm ]
+        for inqueue in queues:
+            if hasattr(inqueue, "add_listener"):
+                inqueue.add_listener(self.wakeup.set)
+        polled = not all( [ hasattr(inqueue, "add_listener") for inqueue in queues ] )
+
+        while self.STOP == False:
+            self.wakeup.clear()
+            count = self.__read()
 
-    def process(self, data):
-        time = data[0][0]   # has to be the same in every mesurement
+            start = time.perf_counter()
+            items = self.engine.merge()
+            for item in items:
+                self.parent.outm.queue.put(item)
+            if len(items) > 0:
+                rows = len(items[0]) if isinstance(items[0], np.ndarray) else len(items)
+                self.perf.count( count, rows, time.perf_counter() - start, sampleAge(self.source, items[-1]) )
 
-        newData = []
-        newData.append( time )
+            if self.engine.done():
+                break
+            if count == 0:
+                self.wakeup.wait(0.01 if polled else None)
 
-        for tuple_ in data:
-            for val in tuple_[1:]:          # without time
-                newData.append(val)
+        for inqueue in queues:
+            if hasattr(inqueue, "remove_listener"):
+                inqueue.remove_listener(self.wakeup.set)
 
-        self.parent.outm.queue.put( tuple(newData) )
+        # make things clear
+        self.parent.RUNNING = False
+        self.parent.outm.RUNNING = False
+        closeQueue(self.parent.outm.queue)
 
 """
 This file is part of duckDAQ.
@@ -7,9 +7,8 @@ class ChannelSplitter(Filter):
     Slits one Measurement consisting of n channels into n Measurements with one channel.
     This can be used in combination with a ChannelMerger to modify only one channel.
 
-    The StopWatch Device for example has the ability to invert one or more channels; the ingoing
-    Measurement there is divided by a ChannelSplitter, only the desired one is inverted and
-    then all ports are glued together again with an ChannelMerger. See code for example.
+    Measurement.split() does the same without a thread and without copying the data,
+    see ColumnView; prefer it, this filter runs one thread, which rebuilds every sample.
         
     *Arguments*
         
@@ -43,6 +42,10 @@ class ChannelSplitter_Thread(Filter_Thread):
         for meas, i in zip(self.parent.outm, list(range(1, len(self.parent.outm)+1)) ):  # copy to all outs
             meas.queue.put( (time, data[i]) )        
 
+    def process_block(self, block):
+        for meas, i in zip(self.parent.outm, list(range(1, len(self.parent.outm)+1)) ):
+            meas.queue.put( block[:, [0, i]] )      # fancy indexing copies
+
 """
 This file is part of duckDAQ.
 
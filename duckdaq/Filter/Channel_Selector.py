@@ -8,6 +8,9 @@ class Channel_Selector(Filter):
     useful in cooperation with a Multiplexer, i.e. if you want to display two
     ports with each one Voltmeter display.
 
+    Measurement.select() does the same without a thread and without copying the data,
+    see ColumnView.
+
         
     *Arguments*
 
@@ -40,6 +43,9 @@ class Channel_Selector_Thread(Filter_Thread):
 
         self.parent.outm.queue.put( (t, vol) )        
 
+    def process_block(self, block):
+        self.parent.outm.queue.put( block[:, [0, self.parent.portIndex]] )
+
 """
 This file is part of duckDAQ.
 
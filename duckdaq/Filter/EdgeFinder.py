@@ -31,6 +31,9 @@ class EdgeFinder(Filter):
         self.thread_class = EdgeFinder_Thread
         self.putNones = putNones
 
+        from duckdaq.util import recordDtype
+        self.outm.dtype = recordDtype(self.outm.ports, edges=True)     # "LH" / "HL" as 1 / -1
+
 class EdgeFinder_Thread(Filter_Thread):
     def __init__(self, parent):
         Filter_Thread.__init__(self, parent)
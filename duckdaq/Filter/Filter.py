@@ -1,6 +1,12 @@
+import logging
+import time
 from threading import Thread
 import queue
+import numpy as np
 from duckdaq import VirtualMeasurement
+from duckdaq.MeasurementQueue import EndOfStream
+from duckdaq.util import openQueue, closeQueue, drainQueue, isRecords, fromRecords
+from duckdaq.Stats import PerfCounters, sourceOf, sampleAge, itemRows
 
 class Filter():
     """
@@ -26,6 +32,8 @@ class Filter():
             The measurement, which goes into the filter
         self.outm : Measurement / VirtualMeasurement
             One **or** a list of outgoing measurements.
+        self.perf : Stats.PerfCounters
+            Throughput and latency of the running (or last) run, see Pipeline.stats().
 
     """
     def __init__(self, in_measurement):  # the measurement object to filter 
@@ -34,29 +42,56 @@ class Filter():
 
         self.inm = in_measurement          # input measurement
         self.outm = VirtualMeasurement(parentFilter=self)       # output measuremnt
+        register(self)
         
         # copy ports entry, if the filter does not want to change anything here
         self.outm.ports = self.inm.ports
 
-    def start(self):
+    def start(self, executor="thread"):
         """
         Sets the status "RUNNING", then
         creates and starts the thread.
 
+        With executor="process", the processing runs in a worker process instead (see
+        ProcessExecutor), so CPU-heavy filters do not slow down the acquisition. The output
+        measurement(s) behave the same. Where processes can not be forked (i.e. Windows)
+        and for filters with several input measurements, the filter runs in a thread anyway.
+
         *Arguments*
 
-            None
+            executor : string
+                "thread" or "process"
 
         *Returns*
 
             None
 
         """
+        if executor not in ("thread", "process"):
+            raise ValueError("executor has to be \"thread\" or \"process\"")
+        if executor == "process":
+            from .ProcessExecutor import forkAvailable
+            if not forkAvailable():     # i.e. Windows
+                logging.getLogger(__name__).warning("executor \"process\" needs fork, which is not available here, using a thread")
+                executor = "thread"
+        if executor == "process" and isinstance(self.inm, list):    # i.e. ChannelMerger
+            logging.getLogger(__name__).warning("executor \"process\" needs one input measurement, using a thread")
+            executor = "thread"
+
         self.RUNNING = True
-        self.thread = self.thread_class(self)    # create the thread
-        self.thread.start()
 
-    def start_block(self):
+        # filters behind this one wait for data from now on
+        for meas in (self.outm if isinstance(self.outm, list) else [self.outm]):
+            openQueue(meas.queue)
+
+        if executor == "process":
+            from .ProcessExecutor import ProcessExecutor
+            self.thread = ProcessExecutor(self).start()   # the collector thread
+        else:
+            self.thread = self.thread_class(self)    # create the thread
+            self.thread.start()
+
+    def start_block(self, executor="thread"):
         """
         Starts the thread with start() and joins the thread. This can be used, 
         when scripts want to wait for the filter to be finished before proceeding.
@@ -64,14 +99,15 @@ class Filter():
 
         *Arguments*
 
-            None
+            executor : string
+                See start().
 
         *Returns*
 
             None
 
         """
-        self.start()
+        self.start(executor)
         self.thread.join()
 
     def stop(self):
@@ -91,6 +127,24 @@ class Filter():
         self.thread.join()          # wait to finish 
         self.RUNNING = False        # useless? happens in the thread already?
 
+    def join(self):
+        """
+        Waits, until the filter is finished, i.e. its input is finished and all data
+        is processed. If the filter was never started, it returns at once.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        thread = getattr(self, "thread", None)
+        if thread is not None:
+            thread.join()
+
     def restart(self):
         """
         Stops the thread and starts it again.
@@ -110,13 +164,33 @@ class Filter():
         self.start()
 
 
+def register(filt):
+    """ enters a filter into the consumers of its input measurement(s), see Pipeline """
+    for meas in (filt.inm if isinstance(filt.inm, list) else [filt.inm]):
+        consumers = getattr(meas, "consumers", None)
+        if consumers is not None and filt not in consumers:
+            consumers.append(filt)
+
+
 class Filter_Thread(Thread):
     """
     The real data manipulation takes place in the process() method of the custom Filter_Thread().
-    process() is called by run() and gets one tuple from the input queue. In process() now
+    process() is called by run() and gets one tuple from the input queue (blocks in the queue
+    are split up into one tuple per sample, see util.isBlock()). In process() now
     data manipulation can be implemented. The process() method writes
     into the outgoing measurment(s) itself. (access via self.parent.outm)
+
+    Records (see util.recordDtype()) are converted into blocks first.
+
+    Filters, which can work on many samples at once with numpy, overload process_block()
+    instead. Then run() drains everything, which is in the input queue, and passes it as
+    blocks; consecutive tuples are stacked into one block. Tuples, which can not be converted
+    to floats (i.e. None or strings), still go to process().
+
     The Filter_Thread() class takes care, that all measurements have their .RUNNING variable set the right way.
+    When it is finished, it closes the queue(s) of the output measurement(s), so the filters behind
+    get EndOfStream (see MeasurementQueue) and finish, too. Nothing polls: an idle filter waits
+    in get().
 
     *Arguments*
 
@@ -128,6 +202,9 @@ class Filter_Thread(Thread):
         STOP : Bool
             Set True, if you want to abort the thread. There are methods for this too, see
             members.
+        perf : Stats.PerfCounters
+            Samples processed, time spent in process() and age of the samples. feed()
+            counts them per batch; the filter has them as self.perf, too.
     
     """
     def __init__(self, parent):
@@ -135,9 +212,17 @@ class Filter_Thread(Thread):
         self.parent = parent
         self.STOP = False               # set True, if abortion is requested
 
+        # True, if the inheritance has a process_block()
+        self.vectorized = type(self).process_block is not Filter_Thread.process_block
+
+        # throughput and latency of this run, see Pipeline.stats()
+        self.perf = PerfCounters()
+        self.parent.perf = self.perf
+        self.source = sourceOf(self.parent.inm)
+
     def terminate(self):
         """
-        Aborts the thread.
+        Aborts the thread. A waiting get() on the input queue is interrupted.
         
         *Arguments*
 
@@ -150,19 +235,108 @@ class Filter_Thread(Thread):
         """
         self.STOP = True
 
+        inm = self.parent.inm
+        for meas in (inm if isinstance(inm, list) else [inm]):
+            if hasattr(meas.queue, "interrupt"):
+                meas.queue.interrupt()
+
 
     def __get_data(self):
         """
         This is used by the mainloop of the run method.
-        Reads a data tuple from the inqueue. Return None, if queue is empty
+        Waits for data from the inqueue. Returns EndOfStream, if the input is finished
+        or the thread is terminated. Other queues than MeasurementQueue are polled;
+        then None is returned, if the queue is empty.
         """
+        inqueue = self.parent.inm.queue
+        if hasattr(inqueue, "close"):
+            return inqueue.get()        # blocks, no timeout
+
         try:
-            data = self.parent.inm.queue.get(block=True, timeout=0.01)
+            data = inqueue.get(block=True, timeout=0.01)
         except queue.Empty:
             return None
 
         return data
 
+    def __drain(self, items):
+        """ what else is in the inqueue at the moment, one batch, see util.drainQueue() """
+        return drainQueue(self.parent.inm.queue, items)
+
+    def feed(self, items):
+        """
+        Passes items of the input queue (tuples and blocks) to process_block() or
+        process(). Used by run() and by fused filters, see FusedExecutor.
+
+        *Arguments*
+
+            items : list of tuples / np.ndarray
+
+        *Returns*
+
+            None
+
+        """
+        start = time.perf_counter()
+        self.__dispatch(items)
+        self.perf.count( len(items), sum( [ itemRows(data) for data in items ] ),
+                         time.perf_counter() - start, sampleAge(self.source, items[-1]) )
+
+    def __dispatch(self, items):
+        """ process_block() for blocks and stacked tuples, process() for the rest """
+        items = [ fromRecords(data) if isRecords(data) else data for data in items ]
+
+        if not self.vectorized:
+            for data in items:
+                if isinstance(data, tuple):
+                    self.process(data)
+                else:
+                    self.process_block(data)
+            return
+
+        rows = []
+        for data in items:
+            if isinstance(data, tuple):
+                rows.append(data)
+                continue
+            self.__feed_rows(rows)
+            rows = []
+            self.process_block(data)
+        self.__feed_rows(rows)
+
+    def __feed_rows(self, rows):
+        """ stacks tuples into one block, if they are numbers """
+        if len(rows) == 0:
+            return
+        try:
+            block = np.asarray(rows, dtype=np.float64)
+        except (TypeError, ValueError):     # None, strings, ...
+            for data in rows:
+                self.process(data)
+            return
+        self.process_block(block)
+
+    def process_block(self, block):
+        """
+        Overload this method for vectorized filters. It gets all samples, which are
+        aviable, as one block and has to put the results into the outgoing measurement(s)
+        itself, preferably as one block, too.
+
+        As implemented in the base class, it calls process() for every row.
+
+        *Arguments*
+
+            block : np.ndarray
+                Two-dimensional, one row per sample: (time, data0, data1, ...)
+
+        *Returns*
+
+            None
+
+        """
+        for row in block.tolist():
+            self.process( tuple(row) )
+
 
     def process(self, data):
         """
@@ -212,13 +386,15 @@ class Filter_Thread(Thread):
         while self.STOP == False:
             data = self.__get_data()
             
-            if data == None and self.parent.inm.RUNNING == False:    # no more data chunks and measure is dead
+            if data is EndOfStream:         # input finished, or terminate()
+                break
+            elif data is None and self.parent.inm.RUNNING == False:    # no more data chunks and measure is dead
                 self.STOP == True
                 break  
-            elif data == None and self.parent.inm.RUNNING == True: # dont process None data
+            elif data is None and self.parent.inm.RUNNING == True: # dont process None data
                 continue
-            else:
-                self.process(data)
+            else:       # take everything aviable
+                self.feed( self.__drain([data]) )
 
         # make things clear
         self.parent.RUNNING = False
@@ -226,8 +402,10 @@ class Filter_Thread(Thread):
         if isinstance(self.parent.outm, list): # list of measurements, from Multiplexer, i.e.
             for meas in self.parent.outm:
                 meas.RUNNING = False
+                closeQueue(meas.queue)
         else:
             self.parent.outm.RUNNING = False
+            closeQueue(self.parent.outm.queue)
 
 
 
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+from .Filter import Filter_Thread
+from duckdaq.Stats import itemRows
+
+
+def measList(meas):
+    """ input or output of a filter as list of measurements """
+    if isinstance(meas, list):
+        return meas
+    return [meas]
+
+
+class FusedExecutor():
+    """
+    Runs connected filters in as few threads as possible. Normally every filter has its own
+    thread and a queue to the next filter. The executor looks for filters, whose input is the
+    output of another filter of the group and which are the only reader of it. Such a filter
+    is fused into the thread of the filter before: its queue is replaced by a DirectQueue,
+    which calls process() (or process_block()) of the filter directly. Linear chains (and fan-outs like
+    ChannelSplitter -> Inverters) this way run in the thread of their first filter, without
+    queue hops. The filters themselves are not changed.
+
+        schmitt = SchmittTrigger(meas)
+        edge = EdgeFinder(schmitt.outm)
+        ex = FusedExecutor([schmitt, edge])     # one thread instead of two
+        meas.start()
+        ex.start()
+
+    Filters with several inputs (ChannelMerger) or an own run() method keep their thread,
+    but the filters behind them can be fused into it. The measurements between fused filters
+    must not be read by anything else. Stopping a fused filter stops the whole thread it
+    belongs to. The fusion lasts one run: when the filter before a stage is finished (or
+    stopped), the measurement between them gets its own queue back, so the filters can
+    be started on their own again.
+
+    *Arguments*
+
+        filters : list of Filter
+            The filters to run.
+
+    *Variables*
+
+        roots : list of Filter
+            The filters, which get a thread, in the order they are started.
+        stages : list of Filter
+            The filters, which are fused into the thread of another one.
+
+    """
+    def __init__(self, filters):
+        self.filters = list(filters)
+
+        producers = {}          # id(measurement) -> filter, which writes into it
+        consumers = {}          # id(measurement) -> filters, which read it
+        for f in self.filters:
+            for meas in measList(f.outm):
+                producers[id(meas)] = f
+            for meas in measList(f.inm):
+                consumers.setdefault( id(meas), [] ).append(f)
+
+        self.producer = {}      # id(stage) -> filter before
+        self.stages = []
+        roots = []
+        for f in self.filters:
+            if self.__fusable(f) and id(f.inm) in producers and len(consumers[id(f.inm)]) == 1:
+                self.stages.append(f)
+                self.producer[id(f)] = producers[id(f.inm)]
+            else:
+                roots.append(f)
+
+        # upstream filters first, so their outputs are open, when the next ones start
+        self.roots = []
+        def visit(f):
+            if f in self.roots:
+                return
+            for meas in measList(f.inm):
+                if id(meas) in producers:
+                    visit( self.root(producers[id(meas)]) )
+            self.roots.append(f)
+        for f in roots:
+            visit(f)
+
+    def __fusable(self, f):
+        """ single input, and run() of the base class, which only calls process() """
+        return getattr(f, "thread_class", None) is not None \
+               and f.thread_class.run is Filter_Thread.run \
+               and not isinstance(f.inm, list)
+
+    def root(self, f):
+        """
+        Returns the filter, in whose thread a filter runs.
+
+        *Arguments*
+
+            f : Filter
+
+        *Returns*
+
+            root : Filter
+
+        """
+        while id(f) in self.producer:
+            f = self.producer[id(f)]
+        return f
+
+    def fuse(self):
+        """ Replaces the queues between fused filters by DirectQueues. Called by start(). """
+        for f in self.stages:
+            if not isinstance(f.inm.queue, DirectQueue):
+                f.inm.queue = DirectQueue(f, f.inm.queue)
+
+    def unfuse(self):
+        """
+        Restores the original queues. A DirectQueue does this itself, when it is closed
+        at the end of a run; join() and stop() call this for the rest.
+        """
+        for f in self.stages:
+            if isinstance(f.inm.queue, DirectQueue):
+                f.inm.queue.unfuse()
+
+    def start(self):
+        """
+        Starts the threads of the roots, the stages run inside of them.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        self.fuse()
+        for f in self.roots:
+            f.start()
+        for f in self.stages:
+            f.thread = self.root(f).thread
+
+    def start_block(self):
+        """ Starts the filters with start() and waits, until they are finished. """
+        self.start()
+        self.join()
+
+    def join(self):
+        """ Waits, until all threads are finished. """
+        for f in self.roots:
+            thread = getattr(f, "thread", None)
+            if thread is not None:
+                thread.join()
+        self.unfuse()
+
+    def stop(self):
+        """ Stops all threads. """
+        for f in self.roots:
+            f.stop()
+        self.unfuse()
+
+
+class DirectQueue():
+    """
+    Stands in for the queue of a measurement between two fused filters. put() calls
+    process() of the filter behind directly, in the thread of the filter before. Opening
+    and closing it starts and finishes the filter behind like Filter_Thread.run() does;
+    after close(), the measurement gets the original queue back.
+
+    *Arguments*
+
+        filt : Filter
+            The filter, which reads the measurement.
+        original : Queue.Queue
+            The replaced queue.
+
+    *Variables*
+
+        stage : Filter_Thread
+            The thread object of filt, which is never started; only its process() is used.
+
+    """
+    def __init__(self, filt, original):
+        self.filt = filt
+        self.original = original
+        self.stage = filt.thread_class(filt)
+        self.closed = True
+        self.rows_put = 0
+
+    def put(self, item, block=True, timeout=None):
+        self.rows_put = self.rows_put + itemRows(item)
+        self.stage.feed( [item] )
+
+    def open(self):
+        from duckdaq.util import openQueue
+
+        self.stage = self.filt.thread_class(self.filt)      # fresh state for every run
+        self.closed = False
+        self.rows_put = 0
+        self.filt.RUNNING = True
+        for meas in measList(self.filt.outm):
+            meas.RUNNING = True
+            openQueue(meas.queue)
+
+    def close(self):
+        from duckdaq.util import closeQueue
+
+        self.closed = True
+        self.filt.RUNNING = False
+        for meas in measList(self.filt.outm):
+            meas.RUNNING = False
+            closeQueue(meas.queue)
+        self.unfuse()       # the run is over
+
+    def unfuse(self):
+        """ puts the original queue back into the measurement """
+        if self.filt.inm.queue is self:
+            self.filt.inm.queue = self.original
+
+    def empty(self):
+        return True
+
+    def qsize(self):
+        return 0
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
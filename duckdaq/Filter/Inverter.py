@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
 from .Filter import Filter, Filter_Thread
 
 
@@ -19,16 +20,27 @@ class Inverter(Filter):
 
         in_measurement : Measurement / VirtualMeasurement
             Measurement to read from
+        ports : list of strings / ints
+            Only these ports are inverted (by name or index), default: all.
     
     *Variables*
         outm : VirtualMeasurement
             The created inverted measurement
 
     """
-    def __init__(self, in_measurement):
+    def __init__(self, in_measurement, ports=None):
         Filter.__init__(self, in_measurement)
         self.thread_class = Inverter_Thread
 
+        # columns of the data to invert, time is column 0
+        if ports is None:
+            ports = list( range( len(self.inm.ports) ) )
+        self.columns = []
+        for port in ports:
+            if not isinstance(port, int):
+                port = self.inm.ports.index(port)
+            self.columns.append(port + 1)
+
 
 class Inverter_Thread(Filter_Thread):
     def __init__(self, parent):
@@ -39,8 +51,11 @@ class Inverter_Thread(Filter_Thread):
         newData[0] = data[0]            # clone time
 
         # invert and leave analogue data untouched
-        for entry, i in zip( data[1:], list(range(1, len(data))) ):
-            if entry == True:
+        for i in range(1, len(data)):
+            entry = data[i]
+            if i not in self.parent.columns:
+                newData[i] = entry
+            elif entry == True:
                 newData[i] = False
             elif entry == False:
                 newData[i] = True
@@ -49,6 +64,14 @@ class Inverter_Thread(Filter_Thread):
         
         self.parent.outm.queue.put( tuple(newData) )
 
+    def process_block(self, block):
+        newBlock = np.array(block, dtype=np.float64)    # a copy, the input may be shared
+        columns = self.parent.columns
+        values = newBlock[:, columns]
+        newBlock[:, columns] = np.where( values == 1, 0., np.where( values == 0, 1., values ) )
+
+        self.parent.outm.queue.put(newBlock)
+
 """
 This file is part of duckDAQ.
 
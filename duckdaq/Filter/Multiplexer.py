@@ -6,6 +6,11 @@ class Multiplexer(Filter):
     """
     The Multiplexer provides a list of outgoing measurements, which are copies of the input measurement.
 
+    The data is not copied: all outgoing measurements read one BroadcastBuffer, every item is
+    kept only once, until the slowest reader has got it. Therefore the blocks are read-only.
+    Outgoing measurements can be added and removed, while the Multiplexer is running, see
+    add_output() and remove_output().
+
     The Filter class provides support for multiple **out**-going measurements, so very little code has to
     be added.
         
@@ -19,28 +24,94 @@ class Multiplexer(Filter):
     *Variables*
         self.outm : **list** of Measurement() Instances
             The cloned measurements
+        self.buffer : BroadcastBuffer
+            The items for all outgoing measurements.
 
     """
     def __init__(self, in_measurement, n):
         Filter.__init__(self, in_measurement)
         self.thread_class = Multiplexer_Thread
+
+        from duckdaq.BroadcastBuffer import BroadcastBuffer
+        self.buffer = BroadcastBuffer()
+        self.subscribers = {}       # id(outm) -> its subscriber of the buffer
        
         # here are the clones stored, previous outm is deleted 
         del self.outm
         self.outm = []
 
-        from duckdaq import VirtualMeasurement
         for i in range(0, n):                 
-            self.outm.append( VirtualMeasurement(parentFilter=self) ) # create empty
-            self.outm[i].ports = self.inm.ports  # copy portlist
+            self.add_output()
+
+    def add_output(self):
+        """
+        Creates a further outgoing measurement. If the Multiplexer is running, it gets
+        the data from now on.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            meas : VirtualMeasurement
+                The new measurement, it is appended to self.outm, too.
+
+        """
+        from duckdaq import VirtualMeasurement
+        from duckdaq.util import openQueue
+
+        meas = VirtualMeasurement(parentFilter=self)     # create empty
+        meas.ports = self.inm.ports  # copy portlist
+        meas.queue = self.buffer.subscribe()
+        self.subscribers[id(meas)] = meas.queue
+
+        if self.RUNNING:
+            meas.RUNNING = True
+            openQueue(meas.queue)
+        self.outm = self.outm + [meas]      # new list: the thread may iterate the old one
+        return meas
+
+    def remove_output(self, meas):
+        """
+        Removes an outgoing measurement. Its data, which is not read yet, is given free,
+        filters reading it finish.
+
+        *Arguments*
+
+            meas : VirtualMeasurement
+                One of self.outm.
+
+        *Returns*
+
+            None
+
+        """
+        self.outm = [ m for m in self.outm if m is not meas ]
+        self.buffer.unsubscribe( self.subscribers.pop(id(meas)) )
+        meas.RUNNING = False
+
             
 class Multiplexer_Thread(Filter_Thread):
     def __init__(self, parent):
         Filter_Thread.__init__(self, parent)
+
+        # outputs, whose queue was replaced (i.e. by a FusedExecutor), get the data directly
+        for meas in self.parent.outm:
+            self.parent.subscribers[id(meas)].active = meas.queue is self.parent.subscribers[id(meas)]
     
     def process(self, data):
-        for meas in self.parent.outm:  # copy to all outs
-            meas.queue.put( data )        
+        self.put(data)
+
+    def process_block(self, block):
+        self.put(block)
+
+    def put(self, item):
+        """ one item for all outs """
+        self.parent.buffer.put(item)
+        for meas in self.parent.outm:
+            if getattr(meas.queue, "buffer", None) is not self.parent.buffer:
+                meas.queue.put(item)
 
 """
 This file is part of duckDAQ.
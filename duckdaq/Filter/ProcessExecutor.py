@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import pickle
+import queue
+import struct
+import time
+from threading import Thread
+
+import numpy as np
+
+from duckdaq.MeasurementQueue import EndOfStream
+from duckdaq.util import drainQueue
+from .FusedExecutor import measList
+from duckdaq.Stats import PerfCounters, sourceOf, sampleAge, itemRows
+
+# message header in a ring slot: output index, kind, rows, columns
+HEADER = struct.Struct("<qqqq")
+BLOCK, ITEMS = 0, 1     # raw float64 block / pickled list of items
+
+
+class ProcessExecutor():
+    """
+    Runs the processing of a filter in a worker process, so a CPU-heavy filter (FFT, fitting)
+    does not compete with the acquisition for the GIL. Used by Filter.start(executor="process").
+
+    Two threads of the parent only move data: the feeder drains the input queue and writes
+    the items into a SharedRing, the worker process calls process_block() / process() of
+    a Filter_Thread object of the filter and writes its output into a second ring, the
+    collector puts it into the queue(s) of the output measurement(s). Blocks are copied into
+    the shared memory as they are; tuples are stacked into blocks, if they are numbers, and
+    pickled otherwise. Nothing is dropped: if a ring is full, the writer waits.
+
+    The worker is always forked (also where spawn is the default start method, i.e. macOS),
+    so the filter does not have to be picklable. Where fork is not available (i.e. Windows),
+    the filter runs in a thread as usual.
+
+    *Arguments*
+
+        filt : Filter
+            The filter to run. Its perf counters are the ones of the feeder: busy is the
+            time it takes to pass the data to the worker.
+        slots : int
+            Number of slots of each ring.
+        slot_size : int
+            Size of a slot in bytes. Larger blocks are split.
+
+    *Variables*
+
+        worker : multiprocessing.Process
+            The worker process.
+
+    """
+    def __init__(self, filt, slots=16, slot_size=1 << 20):
+        self.filt = filt
+        self.slots = slots
+        self.slot_size = slot_size
+
+    def start(self):
+        """
+        Creates the rings, forks the worker and starts feeder and collector.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            thread : Thread
+                The collector. It is finished, when all data is processed; its terminate()
+                stops the filter.
+
+        """
+        from duckdaq.SharedRing import SharedRing
+
+        self.inRing = SharedRing(slots=self.slots, slot_size=self.slot_size)
+        self.outRing = SharedRing(slots=self.slots, slot_size=self.slot_size)
+
+        self.worker = Filter_Worker(self.filt, self.inRing, self.outRing)
+        self.worker.start()
+
+        self.feeder = Feeder_Thread(self.filt, self.inRing)
+        self.collector = Collector_Thread(self.filt, self.outRing, self.feeder, self.worker, self.inRing)
+        self.collector.start()
+        self.feeder.start()
+        return self.collector
+
+
+def writeItems(ring, index, items):
+    """ writes items of a queue into a ring: blocks raw, everything else pickled """
+    rows = []
+    for data in items:
+        if isinstance(data, tuple):
+            rows.append(data)
+            continue
+        writeRows(ring, index, rows)
+        rows = []
+        writeBlock(ring, index, data)
+    writeRows(ring, index, rows)
+
+
+def writeRows(ring, index, rows):
+    """ stacks tuples into a block, if they are numbers, otherwise they are pickled """
+    if len(rows) == 0:
+        return
+    try:
+        block = np.asarray(rows, dtype=np.float64)
+    except (TypeError, ValueError):     # None, strings, ...
+        block = None
+
+    if block is not None and block.ndim == 2:
+        writeBlock(ring, index, block)
+    else:
+        data = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+        ring.put( [HEADER.pack(index, ITEMS, len(data), 0), data], wait=True )
+
+
+def writeBlock(ring, index, block):
+    """ a float64 block, split into parts, which fit into a slot """
+    if not (isinstance(block, np.ndarray) and block.ndim == 2 and block.dtype == np.float64):
+        data = pickle.dumps([block], protocol=pickle.HIGHEST_PROTOCOL)
+        ring.put( [HEADER.pack(index, ITEMS, len(data), 0), data], wait=True )
+        return
+
+    rows, cols = block.shape
+    step = max(1, (ring.slot_size - HEADER.size) // max(1, 8 * cols))
+    for start in range(0, max(rows, 1), step):
+        part = np.ascontiguousarray( block[start:start+step] )
+        ring.put( [HEADER.pack(index, BLOCK, part.shape[0], cols), part], wait=True )
+
+
+def readItem(view):
+    """ the output index and the items of a slot """
+    index, kind, a, b = HEADER.unpack_from(view)
+    if kind == BLOCK:
+        block = np.frombuffer(view, dtype=np.float64, count=a*b, offset=HEADER.size).reshape(a, b).copy()
+        return index, [block]
+    return index, pickle.loads( view[HEADER.size:HEADER.size + a] )
+
+
+class RingQueue():
+    """ stands in for an output queue in the worker: the items go into the output ring (None: dropped) """
+    def __init__(self, ring, index):
+        self.ring = ring
+        self.index = index
+        self.rows = []
+
+    def put(self, item, block=True, timeout=None):
+        if self.ring is None:
+            return
+        if isinstance(item, tuple):     # collected, written by flush()
+            self.rows.append(item)
+        else:
+            self.flush()
+            writeBlock(self.ring, self.index, item)
+
+    def flush(self):
+        writeRows(self.ring, self.index, self.rows)
+        self.rows = []
+
+    def empty(self):
+        return True
+
+    def qsize(self):
+        return 0
+
+
+def forkAvailable():
+    """ True, if the worker can be forked: it inherits the filter and the rings """
+    import multiprocessing
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def Filter_Worker(filt, inRing, outRing):
+    """ creates the worker process, always forked, whatever the default start method is """
+    import multiprocessing
+
+    class Worker(multiprocessing.get_context("fork").Process):
+        def run(self):
+            try:
+                # only in this process: the outputs go into the ring
+                outqueues = []
+                buffers = set()
+                for i, meas in enumerate( measList(filt.outm) ):
+                    buffer = getattr(meas.queue, "buffer", None)
+                    if buffer is not None and id(buffer) in buffers:   # broadcast: fanned out by the parent
+                        meas.queue = RingQueue(None, i)
+                    else:
+                        meas.queue = RingQueue(outRing, i)
+                    if buffer is not None:
+                        buffers.add( id(buffer) )
+                    outqueues.append(meas.queue)
+
+                stage = filt.thread_class(filt)
+                while True:
+                    view = inRing.get(copy=False)   # waits, until data or close()
+                    if view is None:
+                        break
+                    index, items = readItem(view)
+                    inRing.release()
+
+                    stage.feed(items)
+                    for outqueue in outqueues:
+                        outqueue.flush()
+            finally:
+                inRing.abort()      # maybe failed: the feeder must not wait for us
+                outRing.close()     # wake up the collector
+
+    return Worker()
+
+
+class Feeder_Thread(Thread):
+    """ drains the input queue of the filter into the input ring """
+    def __init__(self, filt, ring):
+        Thread.__init__(self)
+        self.filt = filt
+        self.ring = ring
+        self.STOP = False
+        self.perf = PerfCounters()
+        self.filt.perf = self.perf
+        self.source = sourceOf(self.filt.inm)
+
+    def terminate(self):
+        self.STOP = True
+        if hasattr(self.filt.inm.queue, "interrupt"):
+            self.filt.inm.queue.interrupt()
+
+    def run(self):
+        inqueue = self.filt.inm.queue
+        try:
+            while self.STOP == False:
+                if hasattr(inqueue, "close"):
+                    data = inqueue.get()        # blocks, no timeout
+                    if data is EndOfStream:
+                        break
+                else:
+                    try:
+                        data = inqueue.get(block=True, timeout=0.01)
+                    except queue.Empty:
+                        if self.filt.inm.RUNNING == False:
+                            break
+                        continue
+
+                items = drainQueue(inqueue, [data])     # what is available, one batch
+                start = time.perf_counter()
+                writeItems(self.ring, 0, items)
+                if self.ring.aborted:       # the worker is gone
+                    break
+                self.perf.count( len(items), sum( [ itemRows(data) for data in items ] ),
+                                 time.perf_counter() - start, sampleAge(self.source, items[-1]) )
+        finally:
+            self.ring.close()       # the worker finishes, when everything is processed
+
+
+class Collector_Thread(Thread):
+    """ puts the output of the worker into the output measurement(s), cleans up at the end """
+    def __init__(self, filt, ring, feeder, worker, inRing):
+        Thread.__init__(self)
+        self.filt = filt
+        self.ring = ring
+        self.feeder = feeder
+        self.worker = worker
+        self.inRing = inRing
+
+        # create logger
+        self.logger = logging.getLogger(__name__)
+
+    def terminate(self):
+        """ stops the filter: the feeder stops, the worker and this thread follow """
+        self.feeder.terminate()
+
+    def run(self):
+        from duckdaq.util import closeQueue
+
+        outms = measList(self.filt.outm)
+        for meas in outms:
+            meas.RUNNING = True
+
+        while True:
+            view = self.ring.get(timeout=0.5, copy=False)   # data or close()
+            if view is None and self.ring.closed:
+                view = self.ring.get(timeout=0, copy=False)  # maybe the timeout was just before close()
+                if view is None:
+                    break
+            elif view is None:
+                if not self.worker.is_alive():  # killed, it could not close the ring
+                    self.ring.close()           # take what is left, then finish
+                continue
+            index, items = readItem(view)
+            self.ring.release()
+            for item in items:
+                outms[index].queue.put(item)
+
+        self.worker.join()
+        if self.worker.exitcode != 0:
+            self.logger.error("worker of " + self.filt.__class__.__name__ + " failed, exit code " +
+                              str(self.worker.exitcode) + ", the filter is stopped")
+            self.feeder.terminate()
+            self.inRing.abort()     # a waiting put() of the feeder returns
+        self.feeder.join()
+        self.inRing.destroy()
+        self.ring.destroy()
+
+        self.filt.RUNNING = False
+        for meas in outms:
+            meas.RUNNING = False
+            closeQueue(meas.queue)
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
 from .Filter import Filter, Filter_Thread
 
 
@@ -29,6 +30,9 @@ class SchmittTrigger(Filter):
         self.levelRising = levelRising
         self.levelFalling = levelFalling
 
+        from duckdaq.util import recordDtype
+        self.outm.dtype = recordDtype(self.outm.ports, digital=True)
+
 
 class SchmittTrigger_Thread(Filter_Thread):
     def __init__(self, parent):
@@ -61,6 +65,35 @@ class SchmittTrigger_Thread(Filter_Thread):
         self.lastData = tuple( newData )    # save
         self.parent.outm.queue.put( self.lastData )
 
+    def process_block(self, block):
+        values = block[:, 1:]
+        n = len(block)
+        if n == 0:
+            return
+
+        # state before the block
+        if self.lastData == None:       # first call: decided by the mean value
+            last = values[0] >= (self.parent.levelRising + self.parent.levelFalling) / 2
+        else:
+            last = np.asarray( self.lastData[1:], dtype=bool )
+
+        # 1: high level reached, 0: low level reached, -1: inside the hysteresis, keep the state
+        levels = np.where( values >= self.parent.levelRising, 1,
+                           np.where( values <= self.parent.levelFalling, 0, -1 ) )
+
+        # forward fill the state through the hysteresis
+        index = np.where( levels >= 0, np.arange(n)[:, None], -1 )
+        index = np.maximum.accumulate(index, axis=0)
+        columns = np.arange( values.shape[1] )
+        states = np.where( index >= 0, levels[np.maximum(index, 0), columns], last[None, :] )
+
+        newBlock = np.empty_like(block)
+        newBlock[:, 0] = block[:, 0]
+        newBlock[:, 1:] = states        # 1.0 / 0.0 for True / False
+
+        self.lastData = (block[-1, 0],) + tuple( states[-1].astype(bool).tolist() )
+        self.parent.outm.queue.put(newBlock)
+
 """
 This file is part of duckDAQ.
 
@@ -10,9 +10,11 @@ from .ChannelMerger import ChannelMerger
 from .SchmittTrigger import SchmittTrigger
 from .Outlier_Buster import Outlier_Buster
 from .EdgeFinder import EdgeFinder
+from .AsyncFilter import AsyncFilter
+from .FusedExecutor import FusedExecutor
 
 __all__ = ["Filter", "Filter_Thread", "Channel_Selector",
-            "Inverter", "Multiplexer", "ChannelSplitter", "ChannelMerger", "SchmittTrigger", "Outlier_Buster", "EdgeFinder"]
+            "Inverter", "Multiplexer", "ChannelSplitter", "ChannelMerger", "SchmittTrigger", "Outlier_Buster", "EdgeFinder", "AsyncFilter", "FusedExecutor"]
 
 """
 This file is part of duckDAQ.
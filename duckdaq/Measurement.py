@@ -21,6 +21,16 @@ elif os.name == "nt":
     systemtime = time.clock
     time.clock()    # start timer
 
+# number of packets the stream reader can be ahead of the converter
+RING_SLOTS = 256
+
+def streamRequestSize(labjack):
+    """ size in bytes of the raw data, which one call of streamData() returns """
+    samplesPerPacket = getattr(labjack, "streamSamplesPerPacket", 25)
+    packetsPerRequest = getattr(labjack, "packetsPerRequest", 48)
+    return (14 + 2 * samplesPerPacket) * packetsPerRequest
+
+
 class Measurement():
     """
     Performs a mesurement.
@@ -35,39 +45,90 @@ class Measurement():
             type of measurement
                 1) "POLL": the queue is filled while polling
                 2) "STREAM": read stream data
-                3) "COUNT": read counter, data in the queue is then a frequency
+                3) "COUNT": read counter, data in the queue is then a frequency.
+                   One port uses Counter1, two neighbouring ports (i.e. DIN5, DIN6)
+                   Counter0 and Counter1. The timer lies on the pin below.
+                4) "BURST": stream exactly max_count samples into a preallocated array,
+                   without the queue in the loop. See start_block().
         max_count : int
             Specifies, how many samples should be taken. In stream mode, there will
             be some recorded some more.
         max_time : int
             Specifies, how long the measurement will take. See above for stream mode.
         delay : float
-            In poll mode, between the samples this time in seconds will be delayed.
+            In poll mode, this is the period of the samples in seconds. The samples are
+            taken at absolute deadlines, so the time of the USB transactions does not add up.
+            0 means: as fast as possible.
         scan_frequency : int
             In stream mode, this is the number of samples per second. Maximum is 50000,
             minimum depends on LabJack and driver, reasonable is 10000
         count_interval : float
             Time in seconds, how often the measured frequency in count-mode is put
             into the queue.
+        session : Session
+            If given, the device of the session is used and stays open after the
+            measurement. Otherwise, the next aviable device is opened for every run.
+        busy_wait : float
+            In poll and count mode, the last busy_wait seconds before a sample are spent
+            busy-waiting instead of sleeping. Useful for periods below some milliseconds.
+        catch_up : string
+            In poll and count mode, what happens, if a sample is too late for its deadline:
+            "skip" the missed samples or "burst" them without waiting.
         filename : string
             Is the filename, where CSV data is saved to or read from.
             If there is no filename passed to the csv methods, this filename is used.
             If no filename is given at all, a dialog appears.
         queue : Queue.Queue
             If specified, this queue will be used to put the measurement data.
-            If none is given, an empty one is created.
+            If none is given, an empty MeasurementQueue is created.
+        maxsize : int
+            Maximum number of items (tuples or blocks) in the queue. 0 means unbounded.
+        overflow : string
+            What happens, if the queue is full: "block", "drop_oldest", "drop_newest",
+            "decimate" or "spill" (to disk). See MeasurementQueue.
+        max_memory : int
+            Memory budget of the queue in bytes. Beyond it, data is buffered in a file
+            on disk, until it is read. None means unbounded.
+        blocks : bool
+            Only in stream mode: if True, every USB packet is put into the queue as
+            one numpy block instead of one tuple per sample. A block is a two-dimensional
+            ndarray, one row per sample. The first column is the time, the others
+            are the channels in the order of ports. See util.isBlock().
+        records : bool
+            Only in stream mode: if True, every USB packet is put into the queue as one
+            block of records instead, a structured ndarray with the time as float64 and
+            the channels as float32, see util.recordDtype(). It needs half the memory
+            of a block and a tenth of tuples. Filters get them as blocks.
+        trigger : Trigger
+            Only in stream mode: capture only windows around trigger events, see Trigger.
         
 
 
     *Variables*
 
-        queue : Queue.Queue
+        queue : MeasurementQueue
             The queue, where the measurement data is put. See arguments
         ports : list of strings
             The list of ports, see arguments.
         RUNNING : bool
             Is set True, if a measurement takes place. This is important for Filters,
             which stop reading the queue, if it is empty AND self.RUNNING is False.
+        scheduler : Scheduler.DeadlineScheduler
+            In poll and count mode, the scheduler of the last run. scheduler.stats()
+            gives the timing jitter.
+        burst : np.ndarray
+            In burst mode, the block of the last burst: max_count rows, the first column
+            is the time, the others are the ports.
+        consumers : list of Filter
+            The filters, which read this measurement. They register themselves, see Pipeline.
+        dtype : np.dtype
+            The structured dtype of the records, see util.recordDtype(). None: derived
+            from the ports, when needed.
+        start_time : float
+            System time of sample time 0 of the last run.
+        perf : Stats.PerfCounters
+            Samples acquired, time spent decoding / reading and age of the samples, when
+            they are put into the queue. See Pipeline.stats().
     """
     def __init__(self, ports=[],
                  max_count=None,
@@ -77,7 +138,16 @@ class Measurement():
                  queue=None,
                  delay=0,
                  scan_frequency=10000,
-                 filename=None):
+                 filename=None,
+                 blocks=False,
+                 busy_wait=0.0005,
+                 catch_up="skip",
+                 session=None,
+                 maxsize=0,
+                 overflow="block",
+                 max_memory=None,
+                 trigger=None,
+                 records=False):
 
         self.max_count = max_count  # maximum count of samples to measure
         self.count_interval = count_interval
@@ -90,12 +160,28 @@ class Measurement():
         self.RUNNING = False	    # check, if a daq is runnging
         self.queue=queue            # the queue to fill, has to be a Queue object. if none given we will create one
         self.ports=ports            # ports to read, is a list i.e. ["AIN0", "DIN3]
+        self.blocks = blocks        # stream mode: put one ndarray per packet instead of tuples
+        self.busy_wait = busy_wait  # poll/count mode: spin this long before a deadline
+        self.catch_up = catch_up    # poll/count mode: "skip" or "burst" after an overrun
+        self.scheduler = None       # timing of poll/count mode
+        self.session = session      # open device, shared with other measurements
+        self.ARMED = False          # device is configured, see arm()
+        self.trigger = trigger      # stream mode: only windows around events
+        self.burst = None           # burst mode: the preallocated block
+        self.consumers = []         # filters reading this measurement
+        self.records = records      # stream mode: put structured blocks
+        self.dtype = None           # of the records, None: from the ports
+        self.start_time = None      # system time of sample time 0
+
+        from duckdaq.Stats import PerfCounters
+        self.perf = PerfCounters()  # throughput and latency
 
         from queue import Queue   # check, if queue is a deque. if no queue given, create one
+        from duckdaq.MeasurementQueue import MeasurementQueue
         
         if self.queue is None:
-            self.queue = Queue()
-        elif type(self.queue) is not Queue:
+            self.queue = MeasurementQueue(maxsize, overflow, max_memory)
+        elif not isinstance(self.queue, Queue):
             raise TypeError("queue argument for measurement() is not of type Queue.Queue")
 
 
@@ -112,8 +198,9 @@ class Measurement():
             None
         
         """
-        while self.queue.empty() != True:
-            print(self.queue.get())
+        from duckdaq.util import queueRows
+        for row in queueRows(self.queue):
+            print(row)
 
     def data_csv_write(self, filename=None):
         """
@@ -137,6 +224,28 @@ class Measurement():
 
         from duckdaq.util import write_csv
         write_csv(filename, self)
+
+    def data_npy_write(self, filename=None):
+        """
+        Writes the queue as records into an .npy file, which a ReplayMeasurement can
+        play back, see util.write_npy()
+
+        *Arguments*
+
+            filename: string
+                Desired filename (best absolute). If no filename is given,
+                filename will be used.
+
+        *Returns*
+
+            None
+
+        """
+        if filename is None:
+            filename = self.filename
+
+        from duckdaq.util import write_npy
+        write_npy(filename, self)
     
     
     def data_csv_read(self, filename=None):
@@ -227,6 +336,24 @@ class Measurement():
         from duckdaq.util import meas2ndarray
         return meas2ndarray(self)
 
+    def data_records(self):
+        """
+        Creates one array of records from the data in the queue, see util.meas2records().
+        The columns are typed: analog ports float32, digital ports bool, edges int8.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            records : np.ndarray
+                Structured array, i.e. records["t"], records["AIN0"]
+
+        """
+        from duckdaq.util import meas2records
+        return meas2records(self)
+
     
     def data_dataframe(self):
         """
@@ -276,11 +403,70 @@ class Measurement():
         """
         return self
 
+    def select(self, ports):
+        """
+        A view of some ports of the measurement, without thread and without copying the
+        data, see ColumnView. Views have to be created before start(); then the data goes
+        to the views, not into self.queue.
+
+        *Arguments*
+
+            ports : list of strings / ints
+                The ports, by name or index, i.e. ["AIN0", "AIN2"]
+
+        *Returns*
+
+            view : ColumnView
+
+        """
+        from duckdaq.ColumnView import ColumnView
+        return ColumnView(self, ports)
+
+    def split(self):
+        """
+        One view per port, see select().
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            views : list of ColumnView
+
+        """
+        return [ self.select([i]) for i in range( len(self.ports) ) ]
+
+    def arm(self):
+        """
+        Creates the daq thread, opens and configures the device for the measurement,
+        but does not start it yet. In stream mode, also the reader is already waiting.
+        A following start() then only has to issue streamStart, which keeps the latency
+        of triggered experiments low, especially with a Session.
+        If the daq is already armed or RUNNING, nothing happens.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        if not self.RUNNING and not self.ARMED:
+            from duckdaq.util import openQueue
+            self.daq_thread = LJ_Daq_thread(self)    # create the collector thread
+            self.daq_thread.prepare()
+            self.ARMED = True
+            openQueue(self.queue)       # consumers wait for data from now on
+
     def start(self):
         """
         Creates one daq thread and starts the measurement as defined
         in the class arguments. RUNNING is set True. If the daq is
-        already RUNNING, nothing happens.
+        already RUNNING, nothing happens. If the measurement is not
+        armed, arm() is called first.
 
         *Arguments*
 
@@ -292,8 +478,9 @@ class Measurement():
 
         """
         if not self.RUNNING:
+            self.arm()
+            self.ARMED = False
             self.RUNNING = True
-            self.daq_thread = LJ_Daq_thread(self)    # create the collector thread
             self.daq_thread.start()
         else:
             pass
@@ -311,17 +498,72 @@ class Measurement():
 
         *Returns*
 
-            None
+            burst : np.ndarray
+                In burst mode the captured block (see Variables), otherwise None.
 
         """
         self.start()
         self.daq_thread.join()
 
+        if self.type == "BURST":
+            return self.burst
+
+    async def run(self):
+        """
+        asyncio version of start_block(): starts the measurement, if it is not RUNNING
+        yet, and waits until it is finished, without blocking the event loop.
+
+            await meas.run()
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            burst : np.ndarray
+                In burst mode the captured block, otherwise None.
+
+        """
+        from duckdaq.AsyncBridge import waitFinished
+
+        if not self.RUNNING:
+            self.start()
+        await waitFinished(self)
+
+        if self.type == "BURST":
+            return self.burst
+
+    def data_blocks(self, start=True):
+        """
+        Async generator of the measurement data as blocks (see util.isBlock()). Tuples
+        in the queue are stacked into blocks. It ends, when the measurement is finished
+        and the queue is empty. The event loop is woken up by the queue, see AsyncBridge.
+
+            async for block in meas.data_blocks():
+                ...
+
+        *Arguments*
+
+            start : bool
+                Start the measurement, if it is not RUNNING yet.
+
+        *Returns*
+
+            blocks : async generator of np.ndarray
+
+        """
+        from duckdaq.AsyncBridge import iterBlocks
+
+        if start and not self.RUNNING:
+            self.start()
+        return iterBlocks(self)
+
 
     def stop(self):
         """
-        Stops the daq thread and RUNNING is set False. If the daq is
-        not RUNNING, nothing happens.
+        Stops the daq thread and RUNNING is set False. An armed measurement
+        is disarmed. If the daq is not RUNNING, nothing happens.
 
         *Arguments*
 
@@ -337,6 +579,9 @@ class Measurement():
             self.daq_thread.join()          # wait to finish 
             #del self.daq_thread
             self.RUNNING = False
+        elif self.ARMED:                    # armed, but never started
+            self.daq_thread.disarm()
+            self.ARMED = False
         else:
             pass
 
@@ -354,7 +599,8 @@ class Measurement():
 
         """
         self.stop()
-        self.queue.queue.clear()      # clear queue
+        from duckdaq.util import clearQueue
+        clearQueue(self.queue)        # clear queue
         self.start()
 
 
@@ -365,6 +611,7 @@ class LJ_Daq_thread(Thread):
         self.parent = parent
         self.queue = self.parent.queue  # to put data
         self.STOP = False               # set True, if abortion is requested
+        self.dtype = None               # of the records
 
         self.portlist = self.create_portlist(self.parent.ports)
         
@@ -385,7 +632,7 @@ class LJ_Daq_thread(Thread):
 
             match = search('^DIN([4-7])$', port)
             if match:   # DIN in FIO ports
-                if self.parent.type == "STREAM":        # not in stream mode
+                if self.parent.type in ("STREAM", "BURST"):     # not in stream mode
                     self.STOP = True
                     raise NotImplementedError("Stream is not aviable for digital ports. stopping.")
                 portlist.append( ("D", int(match.group(1))) )
@@ -403,29 +650,44 @@ class LJ_Daq_thread(Thread):
 
     
     def terminate(self):
-        """ abort measurement """
+        """ abort measurement, wakes up the waiting loops """
         self.STOP = True
 
-    def count(self):
-        counterPin = self.portlist[0][1]
+        rawRing = getattr(self, "rawRing", None)
+        if rawRing is not None:
+            rawRing.interrupt()
+        if self.parent.scheduler is not None:
+            self.parent.scheduler.interrupt()
+
+    def count_config(self):
+        counterPins = [ n for (typ, n) in self.portlist ]
+        counterPin = counterPins[0]
         
         # lowest timer is fio4, thus lowest counter fio5
         if counterPin < 5:
             self.logger.info("Lowest port for counter is FIO 05")
             self.logger.info("  ... aborting")
-            exit()
+            self.STOP = True
+            return
+
+        # two counters: timer, counter0 and counter1 lie on three neighbouring pins
+        if len(counterPins) > 2 or (len(counterPins) == 2 and counterPins[1] != counterPin + 1):
+            self.logger.info("Two counters have to be on neighbouring ports, i.e. DIN5 and DIN6")
+            self.logger.info("  ... aborting")
+            self.STOP = True
+            return
         
         self.logger.info("  placing timer on FIO" + str(counterPin - 1) )
-        self.logger.info("  placing counter on FIO" + str(counterPin) )
+        for pin in counterPins:
+            self.logger.info("  placing counter on FIO" + str(pin) )
 
         
         numOfCounters = 1
         clockBase = "1MHz"
         clockDivisor = 0
 
-        import u3
-        import datetime
-        import time
+        from duckdaq import Backend
+        u3 = Backend.current()      # feedback commands of the device or the emulator
 
         clkBaseStr = clockBase
 
@@ -441,14 +703,17 @@ class LJ_Daq_thread(Thread):
             self.logger.info("Invalid clockBase for timer/counter specified")
             self.logger.info("  possible: 1MHz, 4MHz, 12MHz, 48MHz")
             self.logger.info("  ... aborting")
-            exit()
+            self.STOP = True
+            return
         
         self.logger.info("  clock frequency is " + str(clkBaseStr) )
         self.logger.info("  clock divisor is " + str(clockDivisor) )
         
         # Enable the timers, make sure no pin is set to analog
+        # with one port only counter1 is used, so the wiring is the same as before
         self.lj.configIO(
                     NumberOfTimersEnabled = numOfCounters,
+                    EnableCounter0 = len(counterPins) == 2,
                     EnableCounter1=True,
                     TimerCounterPinOffset = counterPin-1,       # first comes the timer, then the counter
                     FIOAnalog = 0)
@@ -462,13 +727,36 @@ class LJ_Daq_thread(Thread):
         #print "U3 Configuration: ", self.lj.configU3()
         
         # handles for timer / counter
-        clkTimer = u3.Timer0(False)
-        counter = u3.Counter1(False)
+        self.clkTimer = u3.Timer0(False)
+        if len(counterPins) == 2:
+            self.counters = [u3.Counter0(False), u3.Counter1(False)]
+        else:
+            self.counters = [u3.Counter1(False)]
+
+    def count(self):
+        clkTimer = self.clkTimer
+        counters = self.counters
         
+        # one interval every count_interval seconds
+        from duckdaq.Scheduler import DeadlineScheduler
+        scheduler = DeadlineScheduler(self.parent.count_interval,
+                                      busy_wait=self.parent.busy_wait,
+                                      catch_up=self.parent.catch_up)
+        self.parent.scheduler = scheduler
+
         # stop systemtime from computer
         start_time = systemtime()
+        self.parent.start_time = start_time
+        scheduler.start()
         number_of_measures = 0
 
+        # the first reading is the baseline of the first interval,
+        # every further reading ends one interval and starts the next one
+        startData = self.lj.getFeedback(clkTimer, *counters)
+        prevClock = startData[0]
+        prevEvents = startData[1:]
+        prevTime = systemtime() - start_time
+
         ##
         ##
         ## Counter Loop
@@ -476,37 +764,35 @@ class LJ_Daq_thread(Thread):
             if self.STOP is True:    # exit condition
                 break
 
-            # stop actual time
+            # pause and wait for events, until the next deadline
+            scheduler.wait()
+            if self.STOP is True:   # woken up by terminate()
+                break
+
+            busy = time.perf_counter()
+            results = self.lj.getFeedback(clkTimer, *counters)
             act_time = systemtime() - start_time
-           
-            
-            # before sleep
-            startData = self.lj.getFeedback(clkTimer, counter)
-            prevClock = startData[0]
-            prevEvents = startData[1]
-            
-            # pause and wait for events
-            time.sleep( self.parent.count_interval )
-           
-            # after sleep
-            results = self.lj.getFeedback(clkTimer, counter)
             clock = results[0]
-            events = results[1]
+            events = results[1:]
             
-            # calculate frequency
-            counts = events - prevEvents   # temp store here
-            intervalTime = clock - prevClock   # temp store here
-            deltaT = intervalTime / 4e6
+            # timer and counters are 32 bit and wrap around
+            intervalTime = (clock - prevClock) & 0xFFFFFFFF
+            deltaT = intervalTime / 4e6     # system timer runs with 4MHz
 
-            freq = float(counts) / deltaT 
+            if intervalTime > 0:
+                freqs = [ float( (e - prevE) & 0xFFFFFFFF ) / deltaT for (e, prevE) in zip(events, prevEvents) ]
 
-            # put measures
-            self.queue.put( (act_time,) + tuple([freq]) )
-            #print ( (act_time,) + tuple([freq]) )
+                # put measures, time is the start of the interval
+                self.queue.put( (prevTime,) + tuple(freqs) )
+                self.parent.perf.count(1, 1, time.perf_counter() - busy, systemtime() - start_time - prevTime)
 
+                # count
+                number_of_measures = number_of_measures + 1
 
-            # count and delay
-            number_of_measures = number_of_measures + 1
+            # this reading is the baseline for the next interval
+            prevClock = clock
+            prevEvents = events
+            prevTime = act_time
             
             # max count/time exceeded
             if (self.parent.max_count is not None) and (number_of_measures >= self.parent.max_count):
@@ -517,16 +803,28 @@ class LJ_Daq_thread(Thread):
         #self.lj.close()         # close device
 
 
+    def poll_config(self):
+        # all ports in one getFeedback transaction
+        from duckdaq import Backend
+        from duckdaq.FeedbackScan import FeedbackScan
+        self.scan = FeedbackScan(self.lj, self.portlist, Backend.current())
+
     def poll(self):
-        from duckdaq.util import setDataDirection
-        setDataDirection(self.lj, self.portlist)
-        
-        from time import sleep
+        from duckdaq.Scheduler import DeadlineScheduler
+
+        scan = self.scan
+
+        # one sample every delay seconds
+        scheduler = DeadlineScheduler(self.parent.delay,
+                                      busy_wait=self.parent.busy_wait,
+                                      catch_up=self.parent.catch_up)
+        self.parent.scheduler = scheduler
 
         start_time = systemtime()
+        self.parent.start_time = start_time
+        scheduler.start()
         number_of_measures = 0
-        
-        # configure FIO ports to digital/analog
+        perf = self.parent.perf
         
         while True:
             if self.STOP is True:    # exit condition
@@ -535,75 +833,84 @@ class LJ_Daq_thread(Thread):
             # stop actual time
             act_time = systemtime() - start_time
            
-            results = []   # temp store here
             # measure
-            for typ, n in self.portlist:
-                if typ == "A":               # analog
-                    results.append( self.lj.getAIN(n) )
-                if typ == "D":               # digital
-                    results.append( self.lj.getFIOState(n) )
-                    pass
-
-            self.queue.put( (act_time,) + tuple(results) )
+            busy = time.perf_counter()
+            self.queue.put( (act_time,) + scan.read() )
+            perf.count(1, 1, time.perf_counter() - busy, systemtime() - start_time - act_time)
             
-            # count and delay
+            # count
             number_of_measures = number_of_measures + 1
-            sleep(self.parent.delay)
 
             if (self.parent.max_count is not None) and (number_of_measures >= self.parent.max_count):   # max count/time exceeded
                 break
             if (self.parent.max_time is not None) and (act_time >= self.parent.max_time):
                 break
+
+            # wait for the next deadline
+            scheduler.wait()
         
         #self.lj.close()         # close device
 
 
-    def stream_converter(self):
-        from u3 import U3
-        import queue
+    def stream_config(self):
+        pl = [ p for (d, p) in self.portlist] # create list of ports to stream from
+        self.lj.streamConfig(NumChannels=len(pl),
+                                PChannels=pl,                   # PChannels: channels to scan
+                                NChannels=[31 for i in pl],     # NChannels: "31: to GND"
+                                Resolution=3,                   # Resolution: 3 = MAX           
+                                ScanFrequency=self.parent.scan_frequency)   # samples per second
+
+        # raw data to volts, vectorized
+        from duckdaq.StreamDecoder import StreamDecoder
+        self.decoder = StreamDecoder(self.lj, pl)
+        
+        # raw stream data goes through shared memory, the reader may be a process or a thread
+        from duckdaq.SharedRing import SharedRing
+        self.rawRing = SharedRing(slots=RING_SLOTS, slot_size=streamRequestSize(self.lj))
 
+        # the reader is started already, but waits for go() to call streamStart
+        self.stream_reader = LJ_Stream_Reader(rawRing = self.rawRing,
+                                              labjack = self.lj)
+        self.stream_reader.start()
+
+    def stream_converter(self):
         start_time = systemtime()
         number_of_measures = 0
         
         # period of time between measures
         deltaT = 1.0 / self.parent.scan_frequency   # each dT one measurement
 
+        decoder = self.decoder
+        packetsPerRequest = getattr(self.lj, "packetsPerRequest", 48)    # requests lost in the ring
+
         start_time = systemtime() # remeasure starttime for accuracy
+        self.parent.start_time = start_time
+        perf = self.parent.perf
         # process data / mainloop
        
         while self.STOP == False:
             
-            try:
-                result = self.rawQueue.get(True, 1)    # wait gently for 1s
-            except queue.Empty:
-                # break only, of the stream_reader is already dead
-                if self.stream_reader.is_alive() == True:
-                    continue
-                else:
-                    break
-           
-            if result == None:      # happens at slow sample rates (why?)
-                continue
+            result = self.rawRing.get(copy=False)   # waits, until data, close() or interrupt()
+            if result is None:
+                break
+
+            busy = time.perf_counter()
+            lostScans = decoder.lostScans
+            matrix = decoder.decode(result, lost=self.rawRing.lost * packetsPerRequest)    # one row per scan
+            self.rawRing.release()
 
-            #self.stream_reader.ljLock.acquire() # assure, only one process uses it. the other one is in stream_reader 
-            package = self.lj.processStreamData(result["result"])
-            #self.stream_reader.ljLock.release()
+            if decoder.lostScans != lostScans:      # converter was too slow: NaN, the timestamps stay right
+                self.logger.warning("stream ring buffer overrun: " + str(decoder.lostScans - lostScans) + " scan(s) lost")
 
             # stop actual time
             act_time = systemtime() - start_time
            
-            # make a array-matrix: [[results of ain0],[results of ain1], ...]
-            matrix = []
-            for port in self.parent.ports:
-                matrix.append(package[port])
-           
-            matrix = list(zip(*matrix))     # transpose matrix: [(value ain0, value ain1, ...)(value ain0, value ain1, ...) ...]
-
-            for row in matrix:          # append as tuple
-                mTime = number_of_measures * deltaT
-                self.parent.queue.put( (mTime,) + tuple(row) )
-                number_of_measures = number_of_measures + 1
+            number_of_measures = self.put_matrix(matrix, number_of_measures, deltaT)
+            perf.count(1, len(matrix), time.perf_counter() - busy,
+                       systemtime() - start_time - (number_of_measures - 1) * deltaT)
 
+            if self.parent.trigger is not None and self.parent.trigger.done:    # all windows captured
+                break
             if (self.parent.max_count is not None) and (number_of_measures >= self.parent.max_count):   # max count/time exceeded
                 break
             if (self.parent.max_time is not None) and (act_time >= self.parent.max_time):
@@ -616,25 +923,208 @@ class LJ_Daq_thread(Thread):
 
         
 
+    def burst_config(self):
+        """ stream configuration plus the preallocated buffers of burst mode """
+        import numpy as np
+
+        if self.parent.max_count is None:     # prepare() releases the device
+            raise ValueError("burst mode needs max_count")
+
+        self.stream_config()
+
+        n = self.parent.max_count
+        channels = len(self.portlist)
+
+        # the result, the time column is known in advance
+        self.parent.burst = np.empty( (n, channels + 1), dtype=np.float64 )
+        self.parent.burst[:, 0] = np.arange(n) / float(self.parent.scan_frequency)
+
+        # raw packages are only copied during the burst, decoded at the end
+        samplesPerPacket = getattr(self.lj, "streamSamplesPerPacket", 25)
+        packetSize = 14 + 2 * samplesPerPacket
+        requestSize = streamRequestSize(self.lj)
+        packets = -(-n * channels // samplesPerPacket)          # ceil
+        requests = -(-packets * packetSize // requestSize)
+        self.rawBurst = np.empty(requests * requestSize, dtype=np.uint8)
+        self.burstPackets = packets
+        self.packetSize = packetSize
+
+    def burst_capture(self):
+        """ copies raw stream requests into the preallocated buffer, until max_count samples are read """
+        length = len(self.rawBurst)
+        needed = self.burstPackets * self.packetSize
+        filled = 0
+        start_time = systemtime()
+        self.parent.start_time = start_time
+
+        while self.STOP == False and filled < needed:
+            result = self.rawRing.get(copy=False)   # waits, until data, close() or interrupt()
+            if result is None:
+                break
+
+            take = min(len(result), length - filled)
+            self.rawBurst[filled:filled+take] = result[:take]
+            filled = filled + take
+            self.rawRing.release()
+
+            if (self.parent.max_time is not None) and (systemtime() - start_time >= self.parent.max_time):
+                break
+
+        if self.rawRing.overruns > 0:
+            self.logger.warning("stream ring buffer overrun: " + str(self.rawRing.overruns) + " packet(s) lost")
+
+        # decode everything at once, right into the burst block
+        busy = time.perf_counter()
+        filled = filled - filled % self.packetSize
+        n = self.decoder.decode(self.rawBurst[:filled], out=self.parent.burst[:, 1:])
+        self.parent.perf.count(filled // self.packetSize, n, time.perf_counter() - busy)
+        if n < len(self.parent.burst):
+            self.logger.warning("burst incomplete: " + str(n) + " of " + str(len(self.parent.burst)) + " samples")
+            self.parent.burst = self.parent.burst[:n]
+
+        self.queue.put(self.parent.burst)
+
+    def put_matrix(self, matrix, number_of_measures, deltaT):
+        """ puts a decoded stream package as blocks, tuples or trigger windows, returns the new sample count """
+        if self.parent.trigger is not None:
+            return self.put_triggered(matrix, number_of_measures, deltaT)
+        elif self.parent.blocks or self.parent.records:    # one ndarray per packet
+            return self.put_block(matrix, number_of_measures, deltaT)
+        else:
+            return self.put_tuples(matrix, number_of_measures, deltaT)
+
+    def put_tuples(self, matrix, number_of_measures, deltaT):
+        """ puts one tuple per scan of a decoded stream package, returns the new sample count """
+        for row in matrix.tolist():          # append as tuple
+            mTime = number_of_measures * deltaT
+            self.queue.put( (mTime,) + tuple(row) )
+            number_of_measures = number_of_measures + 1
+
+        return number_of_measures
+
+    def put_block(self, matrix, number_of_measures, deltaT):
+        """ puts a decoded stream package as one ndarray block, returns the new sample count """
+        n = len(matrix)
+
+        # do not overshoot max_count
+        if self.parent.max_count is not None:
+            n = max(0, min(n, self.parent.max_count - number_of_measures))
+        if n == 0:
+            return number_of_measures
+
+        if self.parent.records:
+            self.queue.put( self.timed_records(matrix[:n], number_of_measures, deltaT) )
+        else:
+            self.queue.put( self.timed_block(matrix[:n], number_of_measures, deltaT) )
+        return number_of_measures + n
+
+    def put_triggered(self, matrix, number_of_measures, deltaT):
+        """ feeds a decoded stream package to the trigger and puts the complete windows, returns the new sample count """
+        block = self.timed_block(matrix, number_of_measures, deltaT)
+        for window in self.parent.trigger.process(block):
+            self.queue.put(window)
+        return number_of_measures + len(matrix)
+
+    def timed_block(self, matrix, number_of_measures, deltaT):
+        """ prepends the time column to the scans of a stream package """
+        import numpy as np
+
+        n = len(matrix)
+        block = np.empty( (n, matrix.shape[1] + 1), dtype=np.float64 )
+        block[:, 0] = np.arange(number_of_measures, number_of_measures + n) * deltaT   # time column
+        block[:, 1:] = matrix
+        return block
+
+    def timed_records(self, matrix, number_of_measures, deltaT):
+        """ the scans of a stream package as records, see util.recordDtype() """
+        import numpy as np
+        from duckdaq.util import measDtype
+
+        if self.dtype is None:
+            self.dtype = measDtype(self.parent)
+
+        n = len(matrix)
+        records = np.empty( n, dtype=self.dtype )
+        records["t"] = np.arange(number_of_measures, number_of_measures + n) * deltaT
+        for i, name in enumerate(self.dtype.names[1:]):
+            records[name] = matrix[:, i]
+        return records
+
+    def prepare(self):
+        """
+        Opens the device and does the whole configuration of the measurement type,
+        so run() only has to start the acquisition. Called by Measurement.arm().
+        """
+        if self.parent.trigger is not None:
+            if self.parent.type != "STREAM":
+                raise ValueError("a trigger is only possible in stream mode")
+            self.parent.trigger.attach(self.parent.ports)
+            self.parent.trigger.reset()
+
+        if self.parent.session is not None:     # device is already open
+            self.parent.session.lock.acquire()  # only one measurement at a time
+            self.lj = self.parent.session.lj
+        else:
+            # open labjack for all measurements
+            from duckdaq.util import initLJ
+            self.lj = initLJ()
+        
+        if self.lj == None:
+            if self.parent.session is not None:     # closed session
+                self.parent.session.lock.release()
+            print("device cannot be opened. stopping. please connect device")
+            raise RuntimeError
+        
+        try:        # the device is open (or the session locked): give it back on errors
+            # data direction registers
+            from duckdaq.util import setDataDirection
+            setDataDirection(self.lj, self.portlist)
+
+            if self.parent.type == "POLL":
+                self.poll_config()
+            elif self.parent.type == "COUNT":
+                self.count_config()
+            elif self.parent.type == "STREAM":
+                self.stream_config()
+            elif self.parent.type == "BURST":
+                self.burst_config()
+            else: 
+                raise NotImplementedError("Measurement type " + self.parent.type + " not aviable")
+        except:
+            self.release()
+            raise
+
+    def release(self):
+        """ closes the device, or gives it back to the session """
+        if self.parent.session is not None:
+            self.parent.session.lock.release()
+        else:
+            self.lj.close()         # close device
+
+    def disarm(self):
+        """ undoes prepare(), if run() is never called """
+        from duckdaq.util import closeQueue
+
+        if self.parent.type in ("STREAM", "BURST"):
+            self.stream_reader.stop_reading()
+            self.stream_reader.go()
+            self.stream_reader.join()
+            self.rawRing.destroy()
+            del self.rawRing
+        self.release()
+        closeQueue(self.queue)
+
     def run(self):
         """ mainloop"""
+        from duckdaq.util import closeQueue
         
         if self.STOP is True:    # exit condition: maybe set on init
             self.parent.RUNNING = False
+            self.disarm()
             return
         
-        # open labjack for all measurements
-        from duckdaq.util import initLJ
-        self.lj = initLJ()
-        
-        if self.lj == None:
-            print("device cannot be opened. stopping. please connect device")
-            raise RuntimeError
-        
-        # data direction registers
-        from duckdaq.util import setDataDirection
-        setDataDirection(self.lj, self.portlist)
-        
+        self.parent.perf.reset()
+
         self.logger.info("starting measurement")
         self.logger.info("    mode: " + self.parent.type)
         self.logger.info("    maxtime: " + str(self.parent.max_time) )
@@ -657,43 +1147,25 @@ class LJ_Daq_thread(Thread):
         #
         #   loop for stream mode
         #
-        elif self.parent.type == "STREAM":
-
-            # on windows we have to use a thread, on linux we can use a process
-            if os.name == "posix":
-                self.rawQueue = forkmod.Queue()         # temperary for raw stream data
-            elif os.name == "nt":
-                import queue
-                self.rawQueue = queue.Queue()
-
-            pl = [ p for (d, p) in self.portlist] # create list of ports to stream from
-            self.lj.streamConfig(NumChannels=len(pl),
-                                    PChannels=pl,                   # PChannels: channels to scan
-                                    NChannels=[31 for i in pl],     # NChannels: "31: to GND"
-                                    Resolution=3,                   # Resolution: 3 = MAX           
-                                    ScanFrequency=self.parent.scan_frequency)   # samples per second
-            
-            self.stream_reader = LJ_Stream_Reader(rawQueue = self.rawQueue,
-                                                  labjack = self.lj)
-            self.stream_reader.start()
-            self.stream_converter()     # loops until enough packages are read
+        elif self.parent.type in ("STREAM", "BURST"):
+            self.stream_reader.go()     # streamStart
+            if self.parent.type == "STREAM":
+                self.stream_converter()     # loops until enough packages are read
+            else:
+                self.burst_capture()        # copies the raw packages only
             self.stream_reader.stop_reading() # kill daq process at exit
             
             # stream has to be closed first, wait for exit
             self.stream_reader.join()
 
-            del self.rawQueue           # no more needed
-        
-        #
-        #   # unknown measurement type
-        #
-        else: 
-            raise NotImplementedError("Measurement type " + self.parent.type + " not aviable")
+            self.rawRing.destroy()      # no more needed
+            del self.rawRing
 
 
         self.parent.RUNNING = False
+        closeQueue(self.queue)      # end of stream for the consumers
         
-        self.lj.close()         # close device
+        self.release()
 
         self.logger.info("measurement finished")
 
@@ -702,10 +1174,11 @@ class LJ_Daq_thread(Thread):
 # Windows does not support unpickleable argements for processees
 # see beginning of the file for mechanism
 class LJ_Stream_Reader(forker):
-    def __init__(self, rawQueue, labjack):
+    def __init__(self, rawRing, labjack, barrier=None):
         forker.__init__(self)
         
-        self.rawQueue = rawQueue
+        self.rawRing = rawRing
+        self.barrier = barrier      # several devices start together
         """
         self.portlist = portlist
         self.scan_frequency = scan_frequency
@@ -715,33 +1188,48 @@ class LJ_Stream_Reader(forker):
         self.lj = labjack
 
         self.STOP = forkmod.Event()  # for clean exit
+        self.GO = forkmod.Event()    # streamStart, when set
 
         #self.ljLock = mp.Lock() # using the lj methods needs to be restricted to only one process
 
     def stop_reading(self):
         self.STOP.set()
 
-    def run(self):
-        from time import time, sleep
-        import copy
+    def go(self):
+        self.GO.set()
 
+    def run(self):
         # period of time between measures
         #deltaT = 1.0 / self.scan_frequency   # each dT one measurement
 
         #start_time = systemtime() # remeasure starttime for accuracy
+
+        self.GO.wait()          # process is started by arm(), stream by start()
+        if self.STOP.is_set():  # disarmed
+            self.rawRing.close()
+            return
+
+        if self.barrier is not None:    # wait for the readers of the other devices
+            self.barrier.wait()
         
         self.lj.streamStart() # GO!
        
         # process data / mainloop
-        while not self.STOP.is_set():
-            
-            #self.ljLock.acquire()       # assure, only one process uses it. the other one is in stream_converter
-            returnDict = next(self.lj.streamData(convert = False))
-            #self.ljLock.release()
+        try:
+            while not self.STOP.is_set():
+                
+                #self.ljLock.acquire()       # assure, only one process uses it. the other one is in stream_converter
+                returnDict = next(self.lj.streamData(convert = False))
+                #self.ljLock.release()
+
+                if returnDict is None:      # happens at slow sample rates (why?)
+                    continue
 
-            self.rawQueue.put( copy.deepcopy(returnDict) )
+                self.rawRing.put( returnDict["result"] )   # raw bytes, overruns are counted by the ring
 
-        self.lj.streamStop()        # has to be called _here_
+            self.lj.streamStop()        # has to be called _here_
+        finally:
+            self.rawRing.close()        # wake up the converter, also on errors
         
         #self.terminate()
 
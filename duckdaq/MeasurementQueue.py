@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+
+import mmap
+import pickle
+import struct
+import tempfile
+from queue import Queue
+
+import numpy as np
+
+class EndOfStreamType():
+    """ type of EndOfStream """
+    def __repr__(self):
+        return "EndOfStream"
+
+# returned by a blocking get() of a closed and empty MeasurementQueue
+EndOfStream = EndOfStreamType()
+
+# what put() does, when the queue is full
+POLICIES = ("block", "drop_oldest", "drop_newest", "decimate", "spill")
+
+class MeasurementQueue(Queue):
+    """
+    The queue of Measurements and VirtualMeasurements. It is a Queue.Queue, which can be
+    bounded with one of these overflow policies:
+
+        "block"         put() waits, until there is space again (backpressure)
+        "drop_oldest"   the oldest item is dropped
+        "drop_newest"   the new item is dropped
+        "decimate"      every second item in the queue is dropped, so the queue still
+                        spans the whole time, only with less resolution
+        "spill"         items go to a file on disk and come back in order, when the
+                        consumer catches up
+
+    Without maxsize, the queue is unbounded like before. An item is a tuple or a block.
+
+    Independent of maxsize, a memory budget in bytes can be given. If the items in memory
+    reach it, all further items are appended to a memory-mapped file on disk (see
+    SpillFile), until the consumer has caught up. get() returns them in order, so
+    util.queueToList(), util.meas2ndarray() and filters do not notice anything. This way,
+    long measurements do not lose samples, even if nobody reads the queue.
+
+    *Arguments*
+
+        maxsize : int
+            Maximum number of items in memory. 0 means unbounded.
+        overflow : string
+            The policy, see above.
+        max_memory : int
+            Memory budget in bytes. None means unbounded.
+        spill_dir : string
+            Directory of the spill file. None: the default temporary directory.
+
+    *Variables*
+
+        dropped : int
+            Number of items, which were dropped.
+        spilled : int
+            Number of items, which were written to disk.
+        memory : int
+            Bytes of the items in memory (estimated for tuples).
+        closed : bool
+            True, if no producer puts items into the queue, see open() / close().
+        rows_put : int
+            Number of samples put since open(), blocks count with their rows.
+        highwater : int
+            Largest number of items in the queue since open().
+
+    Listeners (see add_listener()) are called after every put(), i.e. to wake up an
+    asyncio event loop (see AsyncBridge).
+
+    The producer opens the queue, when it starts, and closes it, when it is finished.
+    A blocking get() without timeout waits, until an item is there or the queue is
+    closed; then it returns EndOfStream. So consumers do not have to poll with timeouts.
+    A new queue is closed: nobody will put something into it.
+
+    """
+    def __init__(self, maxsize=0, overflow="block", max_memory=None, spill_dir=None):
+        Queue.__init__(self, maxsize)
+        self.dropped = 0
+        self.spilled = 0
+        self.memory = 0
+        self.spill = None
+        self.spill_dir = spill_dir
+        self.listeners = ()
+        self.closed = True          # no producer yet
+        self.rows_put = 0
+        self.highwater = 0
+        self.__interrupts = 0
+        self.limit(maxsize, overflow, max_memory)
+
+    def limit(self, maxsize, overflow="block", max_memory=None):
+        """
+        Changes bound, overflow policy and memory budget, i.e. of the output of a filter.
+
+        *Arguments*
+
+            maxsize : int
+                Maximum number of items in memory. 0 means unbounded.
+            overflow : string
+                The policy, see class description.
+            max_memory : int
+                Memory budget in bytes. None means unbounded.
+
+        *Returns*
+
+            None
+
+        """
+        if overflow not in POLICIES:
+            raise ValueError("overflow has to be one of " + ", ".join(POLICIES))
+
+        with self.mutex:
+            self.maxsize = maxsize
+            self.overflow = overflow
+            self.max_memory = max_memory
+            if (overflow == "spill" or max_memory is not None) and self.spill is None:
+                self.spill = SpillFile(self.spill_dir)
+
+    def add_listener(self, callback):
+        """
+        Registers a function, which is called without arguments after every put() and
+        on wake(). It is called in the thread of the producer, so it has to be short
+        and thread safe.
+
+        *Arguments*
+
+            callback : function
+
+        *Returns*
+
+            None
+
+        """
+        self.listeners = self.listeners + (callback,)
+
+    def remove_listener(self, callback):
+        """ Unregisters a function of add_listener(). """
+        self.listeners = tuple( [ l for l in self.listeners if l is not callback ] )
+
+    def wake(self):
+        """ Calls the listeners without an item, i.e. when the measurement is finished. """
+        for callback in self.listeners:
+            callback()
+
+    def open(self):
+        """ Called by the producer, before it starts to put items. Interrupts of the
+        last run, which no get() has taken, are dropped. """
+        with self.mutex:
+            self.closed = False
+            self.rows_put = 0
+            self.highwater = self._qsize()
+            self.__interrupts = 0
+
+    def close(self):
+        """
+        Called by the producer, when it is finished. Waiting get() calls return
+        EndOfStream, as soon as the queue is empty.
+        """
+        with self.mutex:
+            self.closed = True
+            self.not_empty.notify_all()
+        self.wake()
+
+    def interrupt(self):
+        """
+        Called by a consumer, which is asked to stop: one waiting (or the next) blocking
+        get() on an empty queue returns EndOfStream, even if the queue is open.
+        """
+        with self.mutex:
+            self.__interrupts = self.__interrupts + 1
+            self.not_empty.notify_all()
+
+    def get(self, block=True, timeout=None):
+        """
+        Like Queue.get(). But a blocking get() without timeout returns EndOfStream,
+        if the queue is closed (or interrupted) and empty.
+        """
+        if not block or timeout is not None:
+            return Queue.get(self, block, timeout)
+
+        with self.not_empty:
+            while not self._qsize():
+                if self.__interrupts > 0:
+                    self.__interrupts = self.__interrupts - 1
+                    return EndOfStream
+                if self.closed:
+                    return EndOfStream
+                self.not_empty.wait()
+            item = self._get()
+            self.not_full.notify()
+            return item
+
+    def put(self, item, block=True, timeout=None):
+        self.__put(item, block, timeout)
+        for callback in self.listeners:
+            callback()
+
+    def __put(self, item, block, timeout):
+        if self.overflow == "block" or self.maxsize <= 0:
+            return Queue.put(self, item, block, timeout)
+
+        with self.not_full:
+            full = len(self.queue) >= self.maxsize
+
+            if self.overflow == "spill":
+                self._put(item, toDisk=full)
+            elif full and self.overflow == "drop_newest":
+                self.dropped = self.dropped + 1
+                return
+            elif full and self.overflow == "drop_oldest":
+                self.memory = self.memory - itemBytes( self.queue.popleft() )
+                self.dropped = self.dropped + 1
+                self._put(item)
+            elif full and self.overflow == "decimate":
+                kept = list(self.queue)[::2]
+                self.dropped = self.dropped + len(self.queue) - len(kept)
+                self.queue.clear()
+                self.queue.extend(kept)
+                self.memory = sum( [ itemBytes(i) for i in kept ] )
+                self._put(item)
+            else:
+                self._put(item)
+
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _put(self, item, toDisk=False):
+        self.rows_put = self.rows_put + (len(item) if isinstance(item, np.ndarray) else 1)
+        size = self._qsize() + 1
+        if size > self.highwater:
+            self.highwater = size
+
+        if self.spill is not None:
+            # keep the order: behind the spilled ones
+            if toDisk or len(self.spill) > 0 or self.__overBudget():
+                self.spill.append(item)
+                self.spilled = self.spilled + 1
+                return
+        self.queue.append(item)
+        self.memory = self.memory + itemBytes(item)
+
+    def __overBudget(self):
+        return self.max_memory is not None and self.memory >= self.max_memory
+
+    def _qsize(self):
+        if self.spill is not None:
+            return len(self.queue) + len(self.spill)
+        return len(self.queue)
+
+    def _get(self):
+        if len(self.queue) == 0:       # item was larger than the budget
+            return self.spill.pop()
+
+        item = self.queue.popleft()
+        self.memory = self.memory - itemBytes(item)
+
+        # refill from disk, what was spilled
+        if self.spill is not None:
+            while len(self.spill) > 0 and not self.__overBudget() and \
+                  (self.maxsize <= 0 or len(self.queue) < self.maxsize):
+                data = self.spill.pop()
+                self.queue.append(data)
+                self.memory = self.memory + itemBytes(data)
+        return item
+
+    def clear(self):
+        """ Drops everything in the queue, on disk too. """
+        with self.mutex:
+            self.queue.clear()
+            self.memory = 0
+            if self.spill is not None:
+                self.spill.clear()
+            self.not_full.notify_all()
+
+
+def itemBytes(item):
+    """ memory of a queue item: the data of a block, 8 bytes per value of a tuple """
+    nbytes = getattr(item, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    try:
+        return 8 * len(item)
+    except TypeError:
+        return 8
+
+
+# record header of the spill file: kind, two sizes
+HEADER = struct.Struct("<qqq")
+BLOCK, TUPLE, PICKLE = 0, 1, 2
+
+# read bytes of the spill file, from which on it is compacted
+COMPACT_BYTES = 1 << 24
+
+class SpillFile():
+    """
+    Items, which are appended to a temporary, memory-mapped file and read back in the same
+    order. Blocks of float64 and tuples of floats are stored raw, as arrays; everything else
+    is pickled. The file grows by doubling; if it is read completely, it starts from the
+    beginning again. If a consumer never catches up completely, the unread items are
+    moved to the beginning, as soon as more than COMPACT_BYTES and at least as much as
+    is left have been read, so the file does not grow with all the data ever spilled.
+
+    *Arguments*
+
+        directory : string
+            Where the file is created. None: the default temporary directory.
+
+    """
+    def __init__(self, directory=None):
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.map = None
+        self.size = 0
+        self.clear()
+
+    def __len__(self):
+        return self.count
+
+    def __reserve(self, n):
+        needed = self.writepos + n
+        if needed <= self.size:
+            return
+        size = max(needed, 2 * self.size, 1 << 20)
+        if self.map is not None:
+            self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.size = size
+
+    def __write(self, kind, a, b, payload):
+        length = len(payload)
+        padded = (length + 7) & ~7          # keep the arrays 8 byte aligned
+        self.__reserve(HEADER.size + padded)
+        HEADER.pack_into(self.map, self.writepos, kind, a, b)
+        start = self.writepos + HEADER.size
+        self.map[start:start+length] = payload
+        self.writepos = start + padded
+        self.count = self.count + 1
+
+    def append(self, item):
+        if isinstance(item, np.ndarray) and item.ndim == 2 and item.dtype == np.float64:
+            data = np.ascontiguousarray(item)
+            self.__write(BLOCK, data.shape[0], data.shape[1], memoryview(data).cast("B"))
+        elif isinstance(item, tuple) and all( [ type(v) is float for v in item ] ):
+            data = np.asarray(item, dtype=np.float64)
+            self.__write(TUPLE, len(item), 0, memoryview(data).cast("B"))
+        else:
+            data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+            self.__write(PICKLE, len(data), 0, data)
+
+    def pop(self):
+        kind, a, b = HEADER.unpack_from(self.map, self.readpos)
+        start = self.readpos + HEADER.size
+
+        if kind == BLOCK:
+            length = 8 * a * b
+            item = np.frombuffer(self.map, dtype=np.float64, count=a*b, offset=start).reshape(a, b).copy()
+        elif kind == TUPLE:
+            length = 8 * a
+            item = tuple( np.frombuffer(self.map, dtype=np.float64, count=a, offset=start).tolist() )
+        else:
+            length = a
+            item = pickle.loads( self.map[start:start+length] )
+
+        self.readpos = start + ((length + 7) & ~7)
+        self.count = self.count - 1
+        if self.count == 0:
+            self.clear()
+        elif self.readpos >= COMPACT_BYTES and self.readpos >= self.writepos - self.readpos:
+            self.__compact()
+        return item
+
+    def __compact(self):
+        """ moves the unread items to the beginning, shrinks a large file, which is mostly free """
+        left = self.writepos - self.readpos
+        self.map.move(0, self.readpos, left)
+        self.readpos = 0
+        self.writepos = left
+
+        if self.size > (64 << 20) and 4 * left < self.size:
+            size = max(2 * left, 1 << 20)
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+            self.size = size
+
+    def clear(self):
+        """ Drops all items. Large files are given back to the file system. """
+        self.readpos = 0
+        self.writepos = 0
+        self.count = 0
+        if self.size > (64 << 20):
+            self.map.close()
+            self.map = None
+            self.file.truncate(0)
+            self.size = 0
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
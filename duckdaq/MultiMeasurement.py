@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from threading import Thread
+import time
+from .Measurement import Measurement, LJ_Daq_thread, LJ_Stream_Reader, forkmod, systemtime, RING_SLOTS, streamRequestSize
+
+class MultiMeasurement(Measurement):
+    """
+    Streams from several U3 devices at once and merges their channels into one measurement.
+
+    Every device gets its own reader process and shared ring, so the devices are read in
+    parallel. The readers wait at a common barrier and then issue streamStart together.
+    All devices run with the same scan frequency, so the n-th sample of every device belongs
+    to the same time n / scan_frequency: the converter counts the samples of every device
+    and only emits scans, which are complete on all devices. (A ring overrun at one device
+    loses packets and therefore shifts this device against the others; it is logged.)
+
+    The ports of the merged measurement are named "serial:port", i.e. "320012345:AIN0".
+
+    *Arguments*
+
+        devices : list of Session / int
+            The devices: open Sessions or serial numbers.
+        ports : list of lists of strings
+            One list of ports for every device, i.e. [["AIN0", "AIN1"], ["AIN0"]]
+
+        All other arguments are the ones of Measurement; the type is always "STREAM".
+
+    *Variables*
+
+        device_ports : list of lists of strings
+            The ports argument.
+        ports : list of strings
+            The names of the merged ports.
+
+    """
+    def __init__(self, devices, ports,
+                 max_count=None,
+                 max_time=None,
+                 queue=None,
+                 scan_frequency=10000,
+                 filename=None,
+                 blocks=True,
+                 maxsize=0,
+                 overflow="block",
+                 max_memory=None,
+                 trigger=None,
+                 records=False):
+
+        if len(devices) != len(ports):
+            raise TypeError("MultiMeasurement needs one list of ports per device")
+
+        self.devices = devices
+        self.device_ports = ports
+
+        # merged portlist, named after the serial numbers
+        merged = []
+        for device, portlist in zip(devices, ports):
+            serial = getattr(device, "serial", device)
+            merged = merged + [ str(serial) + ":" + port for port in portlist ]
+
+        Measurement.__init__(self, ports=merged,
+                             max_count=max_count,
+                             max_time=max_time,
+                             type="STREAM",
+                             queue=queue,
+                             scan_frequency=scan_frequency,
+                             filename=filename,
+                             blocks=blocks,
+                             maxsize=maxsize,
+                             overflow=overflow,
+                             max_memory=max_memory,
+                             trigger=trigger,
+                             records=records)
+
+    def arm(self):
+        """
+        Like Measurement.arm(), for all devices. See there.
+        """
+        if not self.RUNNING and not self.ARMED:
+            from duckdaq.util import openQueue
+            self.daq_thread = Multi_Daq_thread(self)    # create the collector thread
+            self.daq_thread.prepare()
+            self.ARMED = True
+            openQueue(self.queue)       # consumers wait for data from now on
+
+
+class Multi_Daq_thread(LJ_Daq_thread):
+    def __init__(self, parent):
+        Thread.__init__(self)
+        self.parent = parent
+        self.queue = self.parent.queue  # to put data
+        self.STOP = False               # set True, if abortion is requested
+        self.dtype = None               # of the records
+
+        # create logger
+        self.logger = logging.getLogger(__name__)
+
+        self.portlists = [ self.create_portlist(ports) for ports in self.parent.device_ports ]
+
+    def prepare(self):
+        """ opens and configures all devices, starts the readers waiting at the barrier """
+        if self.parent.trigger is not None:
+            self.parent.trigger.attach(self.parent.ports)
+            self.parent.trigger.reset()
+
+        from duckdaq.util import initLJ, setDataDirection
+        from duckdaq.SharedRing import SharedRing
+        from duckdaq.StreamDecoder import StreamDecoder
+
+        self.ljs = []
+        self.sessions = []      # sessions, which are locked by us
+        for device in self.parent.devices:
+            if hasattr(device, "lock"):     # Session
+                device.lock.acquire()
+                self.sessions.append(device)
+                lj = device.lj
+            else:                           # serial number
+                lj = initLJ(serial=device)
+            if lj is None:
+                self.ljs.append(None)
+                self.release()
+                raise RuntimeError("device " + str(device) + " cannot be opened. please connect device")
+            self.ljs.append(lj)
+
+        self.decoders = []
+        self.rawRings = []
+        self.stream_readers = []
+        try:        # the sessions are locked: give them back on errors
+            barrier = forkmod.Barrier( len(self.ljs) )
+            for lj, portlist in zip(self.ljs, self.portlists):
+                setDataDirection(lj, portlist)
+
+                pl = [ p for (d, p) in portlist] # create list of ports to stream from
+                lj.streamConfig(NumChannels=len(pl),
+                                PChannels=pl,                   # PChannels: channels to scan
+                                NChannels=[31 for i in pl],     # NChannels: "31: to GND"
+                                Resolution=3,                   # Resolution: 3 = MAX
+                                ScanFrequency=self.parent.scan_frequency)   # samples per second
+
+                rawRing = SharedRing(slots=RING_SLOTS, slot_size=streamRequestSize(lj))
+                reader = LJ_Stream_Reader(rawRing = rawRing, labjack = lj, barrier = barrier)
+                reader.start()
+
+                self.decoders.append( StreamDecoder(lj, pl) )
+                self.rawRings.append(rawRing)
+                self.stream_readers.append(reader)
+        except:
+            for reader in self.stream_readers:
+                reader.stop_reading()
+                reader.go()
+            self.__stop_readers()
+            self.release()
+            raise
+
+    def release(self):
+        """ closes the devices, or gives them back to their sessions """
+        for session in self.sessions:
+            session.lock.release()
+        self.sessions = []
+
+        for device, lj in zip(self.parent.devices, self.ljs):
+            if lj is not None and not hasattr(device, "lock"):
+                lj.close()
+
+    def disarm(self):
+        """ undoes prepare(), if run() is never called """
+        from duckdaq.util import closeQueue
+
+        for reader in self.stream_readers:
+            reader.stop_reading()
+            reader.go()
+        self.__stop_readers()
+        self.release()
+        closeQueue(self.queue)
+
+    def terminate(self):
+        """ abort measurement, wakes up the converter """
+        self.STOP = True
+        for rawRing in list(self.rawRings):
+            rawRing.interrupt()
+
+    def __stop_readers(self):
+        for reader in self.stream_readers:
+            reader.stop_reading()
+        for reader in self.stream_readers:
+            reader.join()
+        for rawRing in self.rawRings:
+            rawRing.destroy()
+        self.rawRings = []
+
+    def stream_converter(self):
+        import numpy as np
+
+        number_of_measures = 0
+        deltaT = 1.0 / self.parent.scan_frequency   # each dT one measurement
+
+        # scans of every device, which are not emitted yet
+        pending = [ np.empty( (0, len(portlist)) ) for portlist in self.portlists ]
+        packetsPerRequest = [ getattr(lj, "packetsPerRequest", 48) for lj in self.ljs ]
+
+        start_time = systemtime()
+        self.parent.start_time = start_time
+        perf = self.parent.perf
+
+        while self.STOP == False:
+            # read from the device, which is behind: it limits the output anyway
+            i = int( np.argmin( [ len(p) for p in pending ] ) )
+            rawRing = self.rawRings[i]
+
+            result = rawRing.get(copy=False)    # waits, until data, close() or interrupt()
+            if result is None:
+                break
+
+            # lost scans are NaN (see StreamDecoder), so the row is the sample number on
+            # every device, and the devices stay aligned
+            busy = time.perf_counter()
+            decoder = self.decoders[i]
+            lostScans = decoder.lostScans
+            pending[i] = np.concatenate( (pending[i], decoder.decode(result, lost=rawRing.lost * packetsPerRequest[i])) )
+            rawRing.release()
+
+            if decoder.lostScans != lostScans:      # converter was too slow
+                self.logger.warning("stream ring buffer overrun at device " + str(i) + ": " + str(decoder.lostScans - lostScans) + " scan(s) lost")
+
+            # emit the scans, which are complete on all devices
+            n = min( [ len(p) for p in pending ] )
+            if n == 0:
+                perf.count(1, 0, time.perf_counter() - busy)
+                continue
+            matrix = np.hstack( [ p[:n] for p in pending ] )
+            pending = [ p[n:] for p in pending ]
+
+            act_time = systemtime() - start_time
+
+            number_of_measures = self.put_matrix(matrix, number_of_measures, deltaT)
+            perf.count(1, n, time.perf_counter() - busy,
+                       systemtime() - start_time - (number_of_measures - 1) * deltaT)
+
+            if self.parent.trigger is not None and self.parent.trigger.done:    # all windows captured
+                break
+            if (self.parent.max_count is not None) and (number_of_measures >= self.parent.max_count):   # max count/time exceeded
+                break
+            if (self.parent.max_time is not None) and (act_time >= self.parent.max_time):
+                break
+
+    def run(self):
+        """ mainloop"""
+        from duckdaq.util import closeQueue
+
+        if self.STOP is True:    # exit condition: maybe set on init
+            self.parent.RUNNING = False
+            self.disarm()
+            return
+
+        self.parent.perf.reset()
+
+        self.logger.info("starting measurement")
+        self.logger.info("    mode: STREAM, " + str(len(self.ljs)) + " devices")
+        self.logger.info("    maxtime: " + str(self.parent.max_time) )
+        self.logger.info("    maxcount: " + str(self.parent.max_count) )
+
+        for reader in self.stream_readers:
+            reader.go()             # streamStart after the barrier
+        self.stream_converter()     # loops until enough packages are read
+        self.__stop_readers()
+
+        self.parent.RUNNING = False
+        closeQueue(self.queue)      # end of stream for the consumers
+
+        self.release()
+
+        self.logger.info("measurement finished")
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+
+from duckdaq.util import openQueue
+from duckdaq.Stats import PerfCounters, StatsLogger
+
+
+def measList(meas):
+    """ input or output of a filter as list of measurements """
+    if isinstance(meas, list):
+        return meas
+    return [meas]
+
+
+def isFilter(item):
+    """ filters have an output measurement, measurements have a queue """
+    return hasattr(item, "outm")
+
+
+def inputs(filt):
+    """ the measurements, a filter reads; for Devices the input of their inner filters """
+    return measList( getattr(filt, "ainm", filt.inm) )
+
+
+def sessionsOf(meas):
+    """ the Sessions, a source uses: its session or the sessions among its devices """
+    sessions = [ getattr(meas, "session", None) ]
+    sessions.extend( [ device for device in getattr(meas, "devices", []) if hasattr(device, "lock") ] )
+    return [ s for s in sessions if s is not None ]
+
+
+def producerOf(meas):
+    """ the filter, which writes a measurement (or the measurement of a ColumnView) """
+    while getattr(meas, "parent", None) is not None:
+        meas = meas.parent
+    return getattr(meas, "parentFilter", None)
+
+
+class Pipeline():
+    """
+    The graph of measurements and filters, which are connected by their inm / outm.
+    Give any part of it: everything connected upstream (parentFilter, inm) and downstream
+    (the consumers of a measurement, filters register themselves there) is found, also
+    the views of a measurement (see ColumnView).
+
+        meas = Measurement(ports=["AIN0"], type="STREAM")
+        schmitt = SchmittTrigger(meas)
+        edge = EdgeFinder(schmitt.outm)
+
+        p = Pipeline(meas)
+        p.start()           # filters from the end to the beginning, then meas
+        ...
+        p.stop()            # meas first, the filters process what is left and finish
+
+    The filters are started before their sources, so nothing is missed, and they are
+    stopped after them: a stopped measurement closes its queue, the filters behind
+    process everything, which is still queued, and finish one after another. The
+    inner filters of a Device are part of the device, see Device.
+
+    *Arguments*
+
+        items : Measurement / VirtualMeasurement / Filter
+            Any parts of the pipeline, one or more.
+
+    *Variables*
+
+        sources : list of Measurement / VirtualMeasurement
+            The measurements without parent filter, where the data comes from.
+        filters : list of Filter
+            All filters, upstream ones first.
+        measurements : list of Measurement / VirtualMeasurement
+            All measurements, including the sources.
+        edges : list of tuples
+            (measurement, filter) for every measurement a filter reads,
+            (filter, measurement) for every output of a filter and
+            (measurement, view) for every ColumnView.
+
+    """
+    def __init__(self, *items):
+        if len(items) == 0:
+            raise TypeError("Pipeline needs at least one measurement or filter")
+        self.logger = None
+        self.discover(items)
+
+    def discover(self, items=None):
+        """
+        Finds the graph again, i.e. after filters were added.
+
+        *Arguments*
+
+            items : list of Measurement / VirtualMeasurement / Filter
+                Where to start, default: the measurements of the current graph.
+
+        *Returns*
+
+            None
+
+        """
+        if items is None:
+            items = self.measurements
+
+        # everything, which is connected
+        found = {}
+        todo = list(items)
+        while len(todo) > 0:
+            item = todo.pop()
+            if id(item) in found:
+                continue
+            found[id(item)] = item
+
+            if isFilter(item):
+                todo.extend( measList(item.inm) + inputs(item) + measList(item.outm) )
+                todo.extend( getattr(item, "filters", []) )
+            else:
+                if getattr(item, "parentFilter", None) is not None:
+                    todo.append(item.parentFilter)
+                if getattr(item, "parent", None) is not None:   # a view
+                    todo.append(item.parent)
+                todo.extend( getattr(item, "consumers", []) )
+                todo.extend( getattr(item.queue, "views", []) )
+
+        # inner filters of devices and their measurements belong to the device
+        inner = set()
+        for item in found.values():
+            if isFilter(item):
+                for f in getattr(item, "filters", []):
+                    inner.add( id(f) )
+                    for meas in measList(f.outm):
+                        inner.add( id(meas) )
+                        for view in getattr(meas.queue, "views", []):
+                            inner.add( id(view) )
+
+        filters = [ item for item in found.values() if isFilter(item) and id(item) not in inner ]
+        self.measurements = [ item for item in found.values() if not isFilter(item) and id(item) not in inner ]
+        self.sources = [ meas for meas in self.measurements
+                         if getattr(meas, "parentFilter", None) is None and getattr(meas, "parent", None) is None ]
+
+        # upstream filters first
+        self.filters = []
+        def visit(f):
+            if f in self.filters:
+                return
+            for meas in inputs(f):
+                producer = producerOf(meas)
+                if producer is not None and id(producer) not in inner:
+                    visit(producer)
+            self.filters.append(f)
+        for f in filters:
+            visit(f)
+
+        self.edges = []
+        for meas in self.measurements:
+            self.edges.extend( [ (meas, view) for view in getattr(meas.queue, "views", []) ] )
+        for f in self.filters:
+            self.edges.extend( [ (meas, f) for meas in inputs(f) ] )
+            self.edges.extend( [ (f, meas) for meas in measList(f.outm) ] )
+
+    def graph(self):
+        """
+        The graph as adjacency lists.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            graph : dict
+                For every measurement and filter (key) the list of the filters (and views)
+                reading it, or the measurements it writes.
+
+        """
+        graph = {}
+        for node in self.measurements + self.filters:
+            graph[node] = []
+        for a, b in self.edges:
+            graph[a].append(b)
+        return graph
+
+    def describe(self):
+        """
+        The graph as text, one line per edge, i.e. "Measurement[AIN0] -> SchmittTrigger".
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            text : string
+
+        """
+        lines = []
+        for a, b in self.edges:
+            lines.append( nodeName(a) + " -> " + nodeName(b) )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "Pipeline(" + str(len(self.sources)) + " source(s), " + str(len(self.filters)) + " filter(s))"
+
+    def start(self):
+        """
+        Starts the pipeline: the queues are opened and the devices of the sources are
+        armed, then the filters are started from the end to the beginning, then the
+        sources. Parts, which are RUNNING already, are left alone.
+
+        A Session runs one measurement at a time, so two sources, which share a Session,
+        can not be started together: RuntimeError is raised, before anything is started.
+        Start them one after another (i.e. one Pipeline each, start_block()).
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        # arming the second source of a session would wait forever for the lock, which
+        # the first one holds, until it is started and finished
+        users = {}
+        for meas in self.sources:
+            if meas.RUNNING:        # gives the session back, when it is finished
+                continue
+            for session in sessionsOf(meas):
+                if id(session) in users:
+                    raise RuntimeError(nodeName(users[id(session)]) + " and " + nodeName(meas) +
+                                       " share a Session, which runs one measurement at a time")
+                users[id(session)] = meas
+
+        # nobody may see a closed, empty queue and finish early
+        for f in self.filters:
+            if not f.RUNNING:
+                for meas in measList(f.outm):
+                    openQueue(meas.queue)
+        for meas in self.sources:
+            if hasattr(meas, "arm") and not meas.RUNNING:
+                meas.arm()
+
+        for f in reversed(self.filters):
+            if not f.RUNNING:
+                f.start()
+        for meas in self.sources:
+            if hasattr(meas, "start") and not meas.RUNNING:
+                meas.start()
+
+    def stop(self, drain=True):
+        """
+        Stops the sources, then the filters.
+
+        *Arguments*
+
+            drain : bool
+                True: the filters process all data, which is queued, before they finish.
+                False: they are stopped at once, queued data is left.
+
+        *Returns*
+
+            None
+
+        """
+        for meas in self.sources:
+            if hasattr(meas, "stop"):
+                meas.stop()
+
+        for f in self.filters:
+            if getattr(f, "thread", None) is None:      # never started
+                continue
+            if drain:
+                f.join()
+            else:
+                f.stop()
+
+        if self.logger is not None:
+            self.logger.stop()
+            self.logger = None
+
+    def join(self):
+        """
+        Waits, until the sources are finished and all filters have processed their data.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        for meas in self.sources:
+            thread = getattr(meas, "daq_thread", None)
+            if thread is not None and thread.ident is not None:    # started
+                thread.join()
+        for f in self.filters:
+            f.join()
+
+    def stats(self):
+        """
+        A snapshot of the counters of all stages: the sources, the filters and the inner
+        filters of devices (named "Device/Filter"). Where the data piles up, the queue of
+        the stage before is deep and its load is high; the age shows, how far a stage is
+        behind the acquisition.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            stats : dict
+                For every stage (by name, numbered if a name appears twice) the dict of
+                Stats.PerfCounters.snapshot(): rows in and out per second, load, age and
+                depth / high-water mark of the output queues.
+
+        """
+        stages = []
+        for meas in self.sources:
+            stages.append( ( nodeName(meas), getattr(meas, "perf", None), [meas.queue] ) )
+        for f in self.filters:
+            for inner in getattr(f, "filters", []):
+                stages.append( ( nodeName(f) + "/" + nodeName(inner), getattr(inner, "perf", None),
+                                 [ meas.queue for meas in measList(inner.outm) ] ) )
+            stages.append( ( nodeName(f), getattr(f, "perf", None), [ meas.queue for meas in measList(f.outm) ] ) )
+
+        stats = {}
+        for name, perf, queues in stages:
+            if name in stats:
+                n = 2
+                while name + "#" + str(n) in stats:
+                    n = n + 1
+                name = name + "#" + str(n)
+            if perf is None:        # never started
+                perf = PerfCounters()
+            stats[name] = perf.snapshot(queues)
+        return stats
+
+    def log_stats(self, interval=10., logger=None):
+        """
+        Logs stats() every interval seconds, until stop(). See Stats.StatsLogger.
+
+        *Arguments*
+
+            interval : float
+                Seconds between two reports.
+            logger : logging.Logger
+                Default: the logger of duckdaq.Stats.
+
+        *Returns*
+
+            logger : Stats.StatsLogger
+                The thread, which logs.
+
+        """
+        if self.logger is not None:
+            self.logger.stop()
+        self.logger = StatsLogger(self, interval, logger)
+        self.logger.start()
+        return self.logger
+
+    def start_block(self):
+        """ Starts the pipeline and waits, until it is finished. """
+        self.start()
+        self.join()
+
+    def sinks(self):
+        """
+        The measurements at the end of the pipeline, which no filter reads.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            sinks : list of VirtualMeasurement
+
+        """
+        read = set( [ id(a) for a, b in self.edges if not isFilter(a) ] )
+        return [ meas for meas in self.measurements if id(meas) not in read ]
+
+
+def nodeName(node):
+    """ class name of a filter; a measurement by its filter (or class) and its ports """
+    if isFilter(node):
+        return node.__class__.__name__
+
+    ports = "[" + ",".join( [ str(p) for p in node.ports ] ) + "]"
+    if getattr(node, "parent", None) is not None:       # ColumnView
+        return nodeName(node.parent) + ".view" + ports
+    parent = getattr(node, "parentFilter", None)
+    if parent is None:
+        return node.__class__.__name__ + ports
+    if isinstance(parent.outm, list):
+        return parent.__class__.__name__ + ".outm" + str( parent.outm.index(node) ) + ports
+    return parent.__class__.__name__ + ".outm" + ports
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import queue
+import threading
+from threading import Thread
+import time
+
+import numpy as np
+
+from .Measurement import Measurement, systemtime
+
+class ReplayMeasurement(Measurement):
+    """
+    Plays a recorded measurement back: a CSV file of data_csv_write() or an .npy file of
+    data_npy_write() (records, or a plain block with the time in column 0). The ports and
+    the timestamps are the ones of the recording, so the same filters, displays and
+    devices can re-process it without hardware.
+
+    Without speed, the blocks are put as fast as the consumers take them: if filters read
+    the measurement, the queue is bounded (maxsize items, overflow "block"), so the replay
+    waits for the slowest filter, and hours of data are processed in seconds. With speed,
+    the replay is paced: a block is put, when its last sample is due at speed times real
+    time, i.e. to test displays. The replay ends at the end of the file (or at max_count /
+    max_time), the queue is closed and the filters behind finish, like after a hardware
+    measurement.
+
+        meas = ReplayMeasurement("yesterday.npy")
+        schmitt = SchmittTrigger(meas)
+        Pipeline(meas).start_block()
+
+    An .npy file is memory-mapped, a CSV file is read block by block, so the file does not
+    have to fit into memory.
+
+    *Arguments*
+
+        filename : string
+            The recording, ".npy" or CSV.
+        ports : list of strings
+            Only replay these ports. Needed for an .npy block, which has no names.
+            Default: all ports of the recording.
+        speed : float
+            None: as fast as possible. Otherwise the factor to real time, i.e. 1 or 10.
+        block_size : int
+            Samples per block.
+        max_count : int
+            Replay at most so many samples.
+        max_time : float
+            Replay at most so many seconds (sample time) of the recording.
+        blocks : bool
+            True: put blocks, False: one tuple per sample.
+        records : bool
+            Put structured blocks, see util.recordDtype().
+        maxsize : int
+            Bound of the queue in items. 0: unbounded, the replay does not wait for
+            the consumers. None: 16, if filters read the measurement when it is armed,
+            otherwise unbounded, so start_block() and then reading the queue works.
+
+        queue, overflow and max_memory are the ones of Measurement.
+
+    *Variables*
+
+        file_ports : list of strings
+            All ports of the recording.
+        speed : float
+            See arguments.
+
+    """
+    def __init__(self, filename,
+                 ports=None,
+                 speed=None,
+                 block_size=1000,
+                 max_count=None,
+                 max_time=None,
+                 queue=None,
+                 blocks=True,
+                 maxsize=None,
+                 overflow="block",
+                 max_memory=None,
+                 records=False):
+
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive")
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+
+        self.speed = speed
+        self.block_size = block_size
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.max_memory = max_memory
+
+        self.file_ports, fileDtype = recordingPorts(filename)
+        if self.file_ports is None:         # plain .npy block, the ports are the columns
+            if ports is None:
+                raise TypeError("the ports of " + str(filename) + " are unknown, give them as argument")
+            self.file_ports = list(ports)
+        if ports is None:
+            ports = list(self.file_ports)
+        for port in ports:
+            if port not in self.file_ports:
+                raise ValueError("port " + str(port) + " is not in " + str(filename))
+
+        Measurement.__init__(self, ports=ports,
+                             max_count=max_count,
+                             max_time=max_time,
+                             type="REPLAY",
+                             queue=queue,
+                             filename=filename,
+                             blocks=blocks,
+                             maxsize=maxsize or 0,
+                             overflow=overflow,
+                             max_memory=max_memory,
+                             records=records)
+
+        if fileDtype is not None:       # keep bool / edge fields of the recording
+            names = [ fileDtype.names[0] ] + [ fileDtype.names[ self.file_ports.index(port) + 1 ] for port in ports ]
+            self.dtype = np.dtype( [ (name, fileDtype[name]) for name in names ] )
+
+    def arm(self):
+        """
+        Opens the recording, but does not start the replay yet. See Measurement.arm().
+        """
+        if not self.RUNNING and not self.ARMED:
+            from duckdaq.util import openQueue
+            if self.maxsize is None and hasattr(self.queue, "limit"):      # backpressure from the filters
+                self.queue.limit(16 if len(self.consumers) > 0 else 0, self.overflow, self.max_memory)
+            self.daq_thread = Replay_thread(self)
+            self.daq_thread.prepare()
+            self.ARMED = True
+            openQueue(self.queue)       # consumers wait for data from now on
+
+
+def recordingPorts(filename):
+    """
+    The ports of a recording (None for a plain block) and the dtype of its records (None
+    for CSV and plain blocks). Only the header is read.
+    """
+    if filename.endswith(".npy"):
+        data = np.load(filename, mmap_mode="r")
+        if data.dtype.names is not None:
+            return list(data.dtype.names[1:]), data.dtype
+        if data.ndim != 2:
+            raise ValueError(str(filename) + " is neither records nor a block")
+        return None, None
+
+    with open(filename, "r") as file:
+        header = file.readline().strip()
+    if header == "":
+        raise ValueError(str(filename) + " has no header")
+    return header.split(";")[1:], None      # without "t" field
+
+
+def readBlocks(filename, columns, block_size):
+    """
+    Generator of the blocks of a recording: float64, time and the selected columns.
+
+    *Arguments*
+
+        filename : string
+        columns : list of ints
+            The columns to read, 0 is the time.
+        block_size : int
+            Rows per block.
+
+    *Returns*
+
+        blocks : generator of np.ndarray
+
+    """
+    from itertools import islice
+    from duckdaq.util import fromRecords
+
+    if filename.endswith(".npy"):
+        data = np.load(filename, mmap_mode="r")
+        for start in range(0, len(data), block_size):
+            chunk = data[start:start + block_size]
+            if data.dtype.names is not None:
+                yield fromRecords( chunk[ [ data.dtype.names[c] for c in columns ] ] )
+            else:
+                yield np.array( chunk[:, columns], dtype=np.float64 )
+        return
+
+    with open(filename, "r") as file:
+        file.readline()         # header
+        while True:
+            lines = list( islice(file, block_size) )
+            if len(lines) == 0:
+                return
+            yield parseLines(lines)[:, columns]
+
+
+def parseLines(lines):
+    """ CSV lines of write_csv() as block; None, True / False and edges become numbers """
+    try:
+        return np.loadtxt(lines, delimiter=";", dtype=np.float64, ndmin=2)
+    except ValueError:      # something else than numbers
+        from duckdaq.util import EDGE_CODES
+        words = { "None" : np.nan, "": np.nan, "True" : 1., "False" : 0.,
+                  "LH" : EDGE_CODES["LH"], "HL" : EDGE_CODES["HL"] }
+        rows = []
+        for line in lines:
+            line = line.strip()
+            if line == "":
+                continue
+            rows.append( [ words[w] if w in words else float(w) for w in line.split(";") ] )
+        return np.array(rows, dtype=np.float64).reshape( len(rows), -1 )
+
+
+class Replay_thread(Thread):
+    def __init__(self, parent):
+        Thread.__init__(self)
+        self.parent = parent
+        self.queue = self.parent.queue  # to put data
+        self.STOP = False               # set True, if abortion is requested
+        self.stopped = threading.Event()
+        self.dtype = None               # of the records
+
+        # create logger
+        self.logger = logging.getLogger(__name__)
+
+    def prepare(self):
+        """ opens the recording """
+        columns = [0] + [ self.parent.file_ports.index(port) + 1 for port in self.parent.ports ]
+        self.blocks = readBlocks(self.parent.filename, columns, self.parent.block_size)
+
+    def disarm(self):
+        """ undoes prepare(), if run() is never called """
+        from duckdaq.util import closeQueue
+        self.blocks.close()
+        closeQueue(self.queue)
+
+    def terminate(self):
+        """ abort the replay, also a waiting put() or pacing """
+        self.STOP = True
+        self.stopped.set()
+
+    def put(self, item):
+        """ puts into the queue, waits while it is full, but not after terminate() """
+        while self.STOP == False:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def put_block(self, block):
+        """ puts a block as block, records or tuples """
+        if self.parent.records:
+            from duckdaq.util import measDtype, toRecords
+            if self.dtype is None:
+                self.dtype = measDtype(self.parent)
+            self.put( toRecords(block, self.dtype) )
+        elif self.parent.blocks:
+            self.put(block)
+        else:
+            for row in block.tolist():
+                self.put( tuple(row) )
+
+    def replay(self):
+        """ puts the blocks of the recording, paced or as fast as the queue takes them """
+        speed = self.parent.speed
+        number_of_measures = 0
+        first = None        # time of the first sample
+        started = time.monotonic()
+        perf = self.parent.perf
+
+        while self.STOP == False:
+            busy = time.perf_counter()
+            block = next(self.blocks, None)
+            if block is None or len(block) == 0:
+                break
+
+            if first is None:
+                first = block[0, 0]
+                if speed == 1:      # ages are real
+                    self.parent.start_time = systemtime() - first
+
+            # do not overshoot max_count / max_time
+            if self.parent.max_time is not None:
+                block = block[ block[:, 0] - first < self.parent.max_time ]
+            if self.parent.max_count is not None:
+                block = block[:self.parent.max_count - number_of_measures]
+            if len(block) == 0:
+                break
+            busy = time.perf_counter() - busy
+
+            if speed is not None:   # the last sample of the block is due
+                due = started + (block[-1, 0] - first) / speed
+                if self.stopped.wait( max(0., due - time.monotonic()) ):
+                    break
+
+            self.put_block(block)
+            number_of_measures = number_of_measures + len(block)
+            age = None
+            if self.parent.start_time is not None:
+                age = systemtime() - self.parent.start_time - block[-1, 0]
+            perf.count(1, len(block), busy, age)
+
+        return number_of_measures
+
+    def run(self):
+        """ mainloop """
+        from duckdaq.util import closeQueue
+
+        if self.STOP is True:    # exit condition: maybe set on init
+            self.parent.RUNNING = False
+            self.disarm()
+            return
+
+        self.parent.perf.reset()
+        self.parent.start_time = None
+
+        self.logger.info("starting replay of " + str(self.parent.filename))
+        self.logger.info("    speed: " + ( "max" if self.parent.speed is None else str(self.parent.speed) ) )
+
+        n = self.replay()
+        self.blocks.close()
+
+        self.parent.RUNNING = False
+        closeQueue(self.queue)      # end of stream for the consumers
+
+        self.logger.info("replay finished, " + str(n) + " samples")
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import math
+import threading
+import time
+
+class DeadlineScheduler():
+    """
+    Paces a loop at a fixed period without drift. The deadlines are absolute:
+    deadline n is start + n * period, measured with time.monotonic_ns(). So the time the
+    work of the loop takes (USB transactions, GIL) does not add up, like with sleep(delay).
+
+    The scheduler sleeps until shortly before the deadline and busy-waits the rest, which
+    makes sub-millisecond periods possible. If the work took longer than one period, the
+    deadline is overrun; then, depending on catch_up, the missed deadlines are skipped or
+    the loop runs without waiting (burst), until it is in time again.
+
+    interrupt() wakes up a waiting wait() at once, i.e. to stop the loop.
+
+    *Arguments*
+
+        period : float
+            Period in seconds. 0 means: do not wait at all.
+        busy_wait : float
+            The last busy_wait seconds before a deadline are spent spinning instead of
+            sleeping. 0 disables busy-waiting.
+        catch_up : string
+            "skip": after an overrun, continue with the next deadline in the future
+            "burst": return at once, until all missed deadlines are caught up
+
+    *Variables*
+
+        overruns : int
+            How often wait() was called after its deadline had passed.
+        skipped : int
+            Number of deadlines, which were skipped.
+
+    """
+    def __init__(self, period, busy_wait=0.0005, catch_up="skip"):
+        if catch_up not in ("skip", "burst"):
+            raise ValueError("catch_up must be \"skip\" or \"burst\"")
+
+        self.period = int( round(period * 1e9) )      # all times in ns
+        self.busy_wait = int( round(busy_wait * 1e9) )
+        self.catch_up = catch_up
+        self.__interrupted = threading.Event()
+        self.start()
+
+    def start(self):
+        """ Sets deadline 0 to now and resets the statistics. """
+        self.startTime = time.monotonic_ns()
+        self.tick = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.__interrupted.clear()
+
+        # running mean / variance of the lateness (Welford)
+        self.__count = 0
+        self.__mean = 0.
+        self.__m2 = 0.
+        self.__max = 0
+
+    def wait(self):
+        """
+        Waits for the next deadline.
+
+        *Returns*
+
+            tick : int
+                Number of the deadline, which was waited for.
+
+        """
+        self.tick = self.tick + 1
+        if self.period == 0:
+            return self.tick
+
+        deadline = self.startTime + self.tick * self.period
+        now = time.monotonic_ns()
+
+        if now > deadline:         # work took too long
+            self.overruns = self.overruns + 1
+            if self.catch_up == "skip":
+                missed = (now - deadline) // self.period + 1
+                self.tick = self.tick + missed
+                self.skipped = self.skipped + missed
+                deadline = deadline + missed * self.period
+            else:                   # burst: go on without waiting
+                self.__record(now - deadline)
+                return self.tick
+
+        # sleep coarse, then spin
+        remaining = deadline - now
+        if remaining > self.busy_wait:
+            if self.__interrupted.wait( (remaining - self.busy_wait) / 1e9 ):
+                return self.tick
+        now = time.monotonic_ns()
+        while now < deadline:
+            now = time.monotonic_ns()
+
+        self.__record(now - deadline)
+        return self.tick
+
+    def interrupt(self):
+        """ Lets a waiting (and every further) wait() return at once, until start(). """
+        self.__interrupted.set()
+
+    def __record(self, lateness):
+        self.__count = self.__count + 1
+        delta = lateness - self.__mean
+        self.__mean = self.__mean + delta / self.__count
+        self.__m2 = self.__m2 + delta * (lateness - self.__mean)
+        self.__max = max(self.__max, lateness)
+
+    def stats(self):
+        """
+        Returns the jitter statistics: how late wait() returned after the deadlines.
+
+        *Returns*
+
+            stats : dict
+                "samples", "overruns", "skipped", and "jitter_mean", "jitter_std",
+                "jitter_max" in seconds.
+
+        """
+        if self.__count > 1:
+            std = math.sqrt( self.__m2 / (self.__count - 1) )
+        else:
+            std = 0.
+        return { "samples" : self.__count,
+                 "overruns" : self.overruns,
+                 "skipped" : self.skipped,
+                 "jitter_mean" : self.__mean / 1e9,
+                 "jitter_std" : std / 1e9,
+                 "jitter_max" : self.__max / 1e9 }
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+class Session():
+    """
+    Keeps a device open across measurements. Without a session, every start of a
+    Measurement opens the U3, reads its calibration and closes it at the end again.
+
+    The calibration is cached on disk by serial number (see util.loadCalibration()),
+    so it is read from the device only once. The session can be shared by several
+    Measurements, but only one of them may be armed or RUNNING at a time; the others
+    wait in arm() / start().
+
+        s = dd.Session()
+        m = dd.Measurement(ports=["AIN0"], type="STREAM", max_count=1000, session=s)
+        m.arm()          # configure everything
+        ...
+        m.start()        # only streamStart
+
+    *Arguments*
+
+        serial : int
+            Serial number of the device. If None, the next aviable one is opened.
+        cached : bool
+            Use the calibration cache.
+
+    *Variables*
+
+        lj : U3.U3
+            The opened device.
+        serial : int
+            Its serial number.
+        lock : threading.Lock
+            Held by the measurement, which uses the device.
+
+    """
+    def __init__(self, serial=None, cached=True):
+        from duckdaq.util import initLJ
+
+        self.lj = initLJ(serial=serial, cached=cached)
+        if self.lj is None:
+            raise RuntimeError("device cannot be opened. please connect device")
+
+        self.serial = getattr(self.lj, "serialNumber", serial)
+        self.lock = threading.Lock()
+
+    def close(self):
+        """
+        Closes the device. The session can not be used any more.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            None
+
+        """
+        with self.lock:
+            self.lj.close()
+            self.lj = None
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
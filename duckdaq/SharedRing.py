@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+# positions of the counters in the header of the shared memory
+HEAD = 0        # number of slots written by the producer
+TAIL = 1        # number of slots released by the consumer
+OVERRUNS = 2    # number of packets, which did not fit into the ring
+CLOSED = 3      # set to 1 by the producer, if no more data follows
+ABORTED = 4     # set to 1 by the consumer, if it does not read any more
+HEADERSIZE = 5
+
+class SharedRing():
+    """
+    A fixed-size ring of byte slots in shared memory, for exactly one producer
+    and one consumer. It replaces a multiprocessing.Queue between the stream reader
+    process and the converter: the raw packets are copied into the slots as they are,
+    nothing is pickled or piped.
+
+    The producer advances the head, the consumer the tail. If the ring is full, the
+    producer does not wait, the packet is dropped and counted in overruns. With
+    put(wait=True), the producer waits for a free slot instead (i.e. between filter
+    processes, where nothing may be lost). If the consumer gives up (i.e. its process
+    failed), it calls abort(), so a waiting producer does not wait forever.
+
+    *Arguments*
+
+        slots : int
+            Number of slots in the ring.
+        slot_size : int
+            Maximum size of one packet in bytes.
+
+    *Variables*
+
+        overruns : int
+            Number of packets, which were dropped, because the ring was full.
+        closed : bool
+            True, if the producer called close().
+        aborted : bool
+            True, if the consumer called abort().
+        lost : int
+            Number of packets, which were dropped right before the packet of the last
+            get(), so the consumer can tell, where the gaps are.
+
+    """
+    def __init__(self, slots=1024, slot_size=8192):
+        self.slots = slots
+        self.slot_size = slot_size
+
+        headerBytes = 8 * (HEADERSIZE + 2 * slots)     # counters, lengths and overruns of the slots
+        self.shm = shared_memory.SharedMemory(create=True, size=headerBytes + slots * slot_size)
+
+        self.__counters = self.shm.buf[0:8 * HEADERSIZE].cast("q")
+        self.__lengths = self.shm.buf[8 * HEADERSIZE:8 * (HEADERSIZE + slots)].cast("q")
+        self.__marks = self.shm.buf[8 * (HEADERSIZE + slots):headerBytes].cast("q")    # OVERRUNS at put()
+        self.__data = self.shm.buf[headerBytes:headerBytes + slots * slot_size]
+        for i in range(HEADERSIZE):
+            self.__counters[i] = 0
+
+        self.available = multiprocessing.Semaphore(0)   # one release per written slot
+        self.free = multiprocessing.Semaphore(slots)    # one release per released slot
+        self.__held = False         # consumer holds a slot, see get(copy=False)
+        self.__lastMark = 0         # OVERRUNS at the put() of the last packet read
+        self.lost = 0
+
+    @property
+    def overruns(self):
+        return self.__counters[OVERRUNS]
+
+    @property
+    def closed(self):
+        return self.__counters[CLOSED] == 1
+
+    @property
+    def aborted(self):
+        return self.__counters[ABORTED] == 1
+
+    def put(self, data, wait=False):
+        """
+        Copies data into the next free slot. Only the producer may call this.
+
+        *Arguments*
+
+            data : bytes / bytearray / memoryview / list of them
+                The packet, at most slot_size bytes. A list is written as one packet.
+            wait : bool
+                If the ring is full: wait for a free slot instead of dropping the packet.
+
+        *Returns*
+
+            success : bool
+                False, if the ring was full and the packet was dropped, or the consumer
+                called abort().
+
+        """
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+        parts = [ memoryview(part).cast("B") for part in data ]
+        length = sum( [ len(part) for part in parts ] )
+        if length > self.slot_size:
+            raise ValueError("packet of " + str(length) + " bytes does not fit into a slot of " + str(self.slot_size))
+
+        if self.aborted:
+            return False
+        if not self.free.acquire(block=wait):     # full: do not overwrite unread data
+            self.__counters[OVERRUNS] = self.__counters[OVERRUNS] + 1
+            return False
+        if self.aborted:                          # woken up by abort()
+            self.free.release()
+            return False
+
+        head = self.__counters[HEAD]
+        slot = head % self.slots
+        start = slot * self.slot_size
+        for part in parts:
+            self.__data[start:start + len(part)] = part
+            start = start + len(part)
+        self.__lengths[slot] = length
+        self.__marks[slot] = self.__counters[OVERRUNS]
+        self.__counters[HEAD] = head + 1        # publish only after the data is written
+        self.available.release()
+        return True
+
+    def get(self, timeout=None, copy=True):
+        """
+        Reads the oldest packet. Only the consumer may call this.
+
+        *Arguments*
+
+            timeout : float
+                Seconds to wait for a packet. None waits forever.
+            copy : bool
+                If True, the packet is returned as bytes and the slot is released at once.
+                If False, a memoryview into the shared memory is returned. It is valid until
+                the next call of get() or release().
+
+        *Returns*
+
+            data : bytes / memoryview
+                The packet. None, if the timeout expired, the ring is closed and empty or
+                the get() was interrupted.
+
+        """
+        if self.__held:
+            self.release()
+
+        if not self.available.acquire(timeout=timeout):
+            return None
+        if self.__counters[HEAD] == self.__counters[TAIL]:    # woken up by close()
+            self.available.release()        # wake up the next get(), too
+            return None
+
+        slot = self.__counters[TAIL] % self.slots
+        start = slot * self.slot_size
+        view = self.__data[start:start + self.__lengths[slot]]
+        self.lost = self.__marks[slot] - self.__lastMark
+        self.__lastMark = self.__marks[slot]
+
+        if copy:
+            data = bytes(view)
+            self.__counters[TAIL] = self.__counters[TAIL] + 1
+            self.free.release()
+            return data
+
+        self.__held = True
+        return view
+
+    def release(self):
+        """ Releases the slot, which was returned by get(copy=False). """
+        if self.__held:
+            self.__held = False
+            self.__counters[TAIL] = self.__counters[TAIL] + 1
+            self.free.release()
+
+    def close(self):
+        """ Called by the producer: no more data follows. A waiting get() returns None. """
+        self.__counters[CLOSED] = 1
+        self.available.release()
+
+    def interrupt(self):
+        """ Called by the consumer, i.e. from another thread: a waiting get() returns None. """
+        self.available.release()
+
+    def abort(self):
+        """ Called by the consumer, if it does not read any more: a waiting put() and all
+        further ones return False. """
+        self.__counters[ABORTED] = 1
+        self.free.release()
+
+    def destroy(self):
+        """ Frees the shared memory. Call this in the process, which created the ring. """
+        self.__counters.release()
+        self.__lengths.release()
+        self.__marks.release()
+        self.__data.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
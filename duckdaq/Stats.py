@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from duckdaq.Measurement import systemtime
+
+
+class PerfCounters():
+    """
+    Throughput and latency counters of one stage: a filter thread or the daq thread of a
+    measurement. The stage calls count() once per batch of data, not per sample, so the
+    counters can stay on all the time. The output side is counted by the MeasurementQueue
+    (rows_put, highwater), see snapshot().
+
+    The age of the samples is the time between acquisition and processing: the time of
+    the last processed sample, measured from the start of the hardware measurement
+    (Measurement.start_time), compared with the clock, when its batch is done.
+
+    *Variables*
+
+        items : int
+            Queue items (tuples or blocks) processed.
+        rows : int
+            Samples processed.
+        busy : float
+            Seconds spent in process() / process_block(), or decoding at a measurement.
+        age : float
+            Age of the last sample leaving the stage in seconds, None if unknown.
+        age_max : float
+            Largest age so far.
+
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Sets everything to zero, the rates are measured from now on. """
+        self.started = time.monotonic()
+        self.items = 0
+        self.rows = 0
+        self.busy = 0.
+        self.age = None
+        self.age_max = 0.
+
+    def count(self, items, rows, busy, age=None):
+        """
+        Adds one batch.
+
+        *Arguments*
+
+            items : int
+                Number of queue items.
+            rows : int
+                Number of samples.
+            busy : float
+                Processing time in seconds.
+            age : float
+                Age of the last sample, None if unknown.
+
+        *Returns*
+
+            None
+
+        """
+        self.items = self.items + items
+        self.rows = self.rows + rows
+        self.busy = self.busy + busy
+        if age is not None:
+            self.age = age
+            if age > self.age_max:
+                self.age_max = age
+
+    def snapshot(self, outqueues=()):
+        """
+        The counters as dict, with rates per second and the state of the output queues.
+
+        *Arguments*
+
+            outqueues : list of queues
+                The queues of the output measurement(s).
+
+        *Returns*
+
+            stats : dict
+                "items_in", "rows_in", "rows_in_per_s", "rows_out", "rows_out_per_s",
+                "busy", "load" (busy / elapsed time), "age", "age_max" and "queues",
+                a list of queueStats() of the outputs.
+
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        queues = [ queueStats(q) for q in outqueues ]
+        rows_out = sum( [ q["rows_put"] for q in queues ] )
+        return { "items_in" : self.items,
+                 "rows_in" : self.rows,
+                 "rows_in_per_s" : self.rows / elapsed,
+                 "rows_out" : rows_out,
+                 "rows_out_per_s" : rows_out / elapsed,
+                 "busy" : self.busy,
+                 "load" : self.busy / elapsed,
+                 "age" : self.age,
+                 "age_max" : self.age_max,
+                 "queues" : queues }
+
+
+def queueStats(queue):
+    """
+    The state of a queue: "depth", "highwater", "rows_put", "dropped" and "spilled".
+    Other queues than MeasurementQueue only have a depth.
+    """
+    try:
+        depth = queue.qsize()
+    except NotImplementedError:
+        depth = 0
+    return { "depth" : depth,
+             "highwater" : getattr(queue, "highwater", depth),
+             "rows_put" : getattr(queue, "rows_put", 0),
+             "dropped" : getattr(queue, "dropped", 0),
+             "spilled" : getattr(queue, "spilled", 0) }
+
+
+def sourceOf(meas):
+    """ the measurement at the beginning of a chain of filters (the first input of mergers) """
+    while True:
+        if isinstance(meas, list):
+            meas = meas[0]
+        if getattr(meas, "parent", None) is not None:      # ColumnView
+            meas = meas.parent
+            continue
+        if getattr(meas, "parentFilter", None) is None:
+            return meas
+        meas = meas.parentFilter.inm
+
+
+def sampleTime(item):
+    """ time of the last sample of a queue item, None if it has none """
+    try:
+        if isinstance(item, np.ndarray) and item.dtype.names is not None:    # records
+            return float(item["t"][-1])
+        if isinstance(item, np.ndarray):
+            return float(item[-1, 0])
+        return float(item[0])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def sampleAge(source, item):
+    """ seconds since the last sample of item was acquired, None if unknown """
+    start_time = getattr(source, "start_time", None)
+    if start_time is None:
+        return None
+    t = sampleTime(item)
+    if t is None:
+        return None
+    return systemtime() - (start_time + t)
+
+
+def itemRows(item):
+    """ samples in a queue item """
+    if isinstance(item, np.ndarray):
+        return len(item)
+    return 1
+
+
+class StatsLogger(threading.Thread):
+    """
+    Logs Pipeline.stats() every interval seconds, one line per stage, until stop().
+    Used by Pipeline.log_stats().
+
+    *Arguments*
+
+        pipeline : Pipeline
+        interval : float
+            Seconds between two reports.
+        logger : logging.Logger
+            Where to log. Default: the logger of this module.
+        level : int
+            Log level, default logging.INFO.
+
+    """
+    def __init__(self, pipeline, interval=10., logger=None, level=logging.INFO):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.pipeline = pipeline
+        self.interval = interval
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.level = level
+        self.__stopped = threading.Event()
+
+    def stop(self):
+        """ Ends the thread. """
+        self.__stopped.set()
+
+    def run(self):
+        while not self.__stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        """ Logs one report now. """
+        for name, stats in self.pipeline.stats().items():
+            age = "-" if stats["age"] is None else "%.3f s" % stats["age"]
+            depths = ", ".join( [ str(q["depth"]) + "/" + str(q["highwater"]) for q in stats["queues"] ] )
+            self.logger.log(self.level, "%s: in %.0f/s, out %.0f/s, load %.1f %%, age %s, queue %s" %
+                            ( name, stats["rows_in_per_s"], stats["rows_out_per_s"],
+                              100 * stats["load"], age, depths ) )
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
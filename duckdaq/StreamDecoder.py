@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class StreamDecoder():
+    """
+    Converts the raw data of streamData(convert=False) to volts, a whole request at once.
+    This replaces processStreamData(), which decodes byte by byte and calibrates every
+    single sample.
+
+    The raw data consists of packets of 14 + 2 * samplesPerPacket bytes: a 12 byte header,
+    the samples as little endian 16 bit values and 2 trailing bytes. The samples of all
+    channels are interleaved. A packet does not necessarily end with a complete scan, so the
+    samples of an incomplete scan are kept and prepended to the next call.
+
+    Byte 10 of the header is the packet counter (modulo 256). If packets are missing (i.e.
+    the ring buffer of the reader overran), the lost scans are returned as rows of NaN and
+    the samples after the gap are put into the right columns again. So the row number stays
+    the sample number, timestamps derived from it stay right, and several devices stay
+    aligned.
+
+    *Arguments*
+
+        labjack : U3.U3
+            **Initalised** LabJack instance, streamConfig() has to be called already.
+        channels : list of int
+            The positive channels in the order of the stream configuration.
+
+    *Variables*
+
+        slope, offset : np.ndarray
+            Calibration of the channels, see util.calibrationArrays()
+        lostScans : int
+            Number of scans, which were lost and returned as NaN, since reset().
+
+    """
+    def __init__(self, labjack, channels):
+        from duckdaq.util import calibrationArrays
+
+        self.numChannels = len(channels)
+        self.slope, self.offset = calibrationArrays(labjack, channels)
+
+        self.samplesPerPacket = getattr(labjack, "streamSamplesPerPacket", 25)
+        self.packetWords = 7 + self.samplesPerPacket     # packet size in 16 bit words
+
+        self.reset()
+
+    def decode(self, raw, out=None, lost=None):
+        """
+        Decodes one request of raw stream data.
+
+        *Arguments*
+
+            raw : bytes / memoryview / np.ndarray
+                The "result" of streamData(convert=False). Is not referenced after the call.
+            out : np.ndarray
+                If given, the volts are written into its first rows instead of a new
+                array. Scans, which do not fit, are dropped.
+            lost : int
+                Number of packets, which are known to be lost before raw (i.e. the
+                overruns of the ring times the packets per request). The packet counter
+                only tells the gap modulo 256, this decides between the candidates.
+
+        *Returns*
+
+            volts : np.ndarray
+                Two-dimensional, one row per complete scan, one column per channel.
+                With out: the number of rows written.
+
+        """
+        words = np.frombuffer(raw, dtype="<u2").reshape(-1, self.packetWords)
+        counters = (words[:, 5] & 0xFF).astype(np.int64)    # byte 10: packet counter
+
+        # packets missing before each packet
+        gaps = np.empty(len(counters), dtype=np.int64)
+        gaps[1:] = (counters[1:] - counters[:-1] - 1) & 0xFF
+        if self.nextPacket is None:     # the first packet of the stream
+            gaps[0] = 0
+        else:
+            gaps[0] = (counters[0] - self.nextPacket) & 0xFF
+            if lost is not None and lost > gaps[0]:     # the counter wrapped around
+                gaps[0] = gaps[0] + 256 * ( (lost - gaps[0] + 128) // 256 )
+        if len(counters) > 0:
+            self.nextPacket = (counters[-1] + 1) & 0xFF
+
+        if not gaps.any():      # the usual case: contiguous
+            bits = self.__scans( words[:, 6:-1].ravel() )       # without header and trailer
+            if out is None:
+                return bits * self.slope + self.offset
+            numScans = min(len(bits), len(out))
+            np.multiply(bits[:numScans], self.slope, out=out[:numScans])
+            np.add(out[:numScans], self.offset, out=out[:numScans])
+            return numScans
+
+        # split at the gaps, NaN for the lost scans
+        parts = []
+        starts = list( np.flatnonzero(gaps) ) + [ len(words) ]
+        if starts[0] != 0:
+            parts.append( self.__scans( words[:starts[0], 6:-1].ravel() ) * self.slope + self.offset )
+        for start, end in zip(starts[:-1], starts[1:]):
+            parts.append( self.__skip(gaps[start] * self.samplesPerPacket) )
+            parts.append( self.__scans( words[start:end, 6:-1].ravel() ) * self.slope + self.offset )
+        volts = np.concatenate(parts)
+        if out is None:
+            return volts
+        numScans = min(len(volts), len(out))
+        out[:numScans] = volts[:numScans]
+        return numScans
+
+    def __scans(self, samples):
+        """ the complete scans of the samples as bits, one row per scan, keeps the rest """
+        if self.skip > 0:       # the rest of a scan, which was partly lost
+            n = min(self.skip, len(samples))
+            samples = samples[n:]
+            self.skip = self.skip - n
+
+        if len(self.carry) > 0:
+            samples = np.concatenate( (self.carry, samples) )
+
+        numScans = len(samples) // self.numChannels
+        self.carry = samples[numScans * self.numChannels:].copy()
+        return samples[:numScans * self.numChannels].reshape(numScans, self.numChannels)
+
+    def __skip(self, numSamples):
+        """ rows of NaN for numSamples lost samples and the incomplete scan before them """
+        lost = len(self.carry) - self.skip + numSamples     # from the start of the incomplete scan
+        rows = -(-lost // self.numChannels)                 # ceil: the last one is partly lost
+        self.skip = rows * self.numChannels - lost          # its samples after the gap
+        self.carry = np.empty(0, dtype=np.uint16)
+        self.lostScans = self.lostScans + rows
+        return np.full( (rows, self.numChannels), np.nan )
+
+    def reset(self):
+        """ Drops an incomplete scan, i.e. when a new stream starts. """
+        self.carry = np.empty(0, dtype=np.uint16)   # samples of an incomplete scan
+        self.skip = 0               # samples to drop, the rest of a partly lost scan
+        self.nextPacket = None      # expected packet counter
+        self.lostScans = 0
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
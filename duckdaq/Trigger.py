@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class Trigger():
+    """
+    Triggered capture for stream measurements. Instead of putting every sample into the
+    queue, only windows around an event are put: pre samples before the trigger and post
+    samples from the trigger on. The last pre samples are kept in a ring buffer, which does
+    not touch the queue. Every window is put as one block (see util.isBlock()), also if the
+    measurement does not use blocks.
+
+        t = dd.Trigger("AIN0", level=2.5, pre=200, post=800)
+        m = dd.Measurement(ports=["AIN0", "AIN1"], type="STREAM", trigger=t)
+
+    The trigger condition is evaluated vectorized on every decoded packet:
+
+        "edge"      the signal crosses level; with hysteresis, it has to have been below
+                    level - hysteresis before (for a falling slope: above level + hysteresis),
+                    so noise around the level does not trigger again and again
+        "level"     the signal is at or above level (falling slope: at or below)
+
+    After a window is complete, the trigger is armed again (rearm), until max_captures
+    windows are captured. Then the measurement ends.
+
+    *Arguments*
+
+        port : string
+            The port to trigger on, one of the ports of the measurement.
+        level : float
+            Trigger level, i.e. in volts.
+        kind : string
+            "edge" or "level", see above.
+        slope : string
+            "rising" or "falling"
+        pre : int
+            Number of samples before the trigger.
+        post : int
+            Number of samples from the trigger on, the trigger sample included.
+        hysteresis : float
+            See "edge" above.
+        rearm : bool
+            Capture further windows after the first one.
+        max_captures : int
+            Number of windows, after which the measurement ends. None: unlimited.
+
+    *Variables*
+
+        captures : int
+            Number of windows captured in the current run.
+        done : bool
+            True, if no more windows are captured.
+
+    """
+    def __init__(self, port, level, kind="edge", slope="rising", pre=100, post=900,
+                 hysteresis=0., rearm=True, max_captures=None):
+        if kind not in ("edge", "level"):
+            raise ValueError("kind must be \"edge\" or \"level\"")
+        if slope not in ("rising", "falling"):
+            raise ValueError("slope must be \"rising\" or \"falling\"")
+        if pre < 0 or post < 1:
+            raise ValueError("pre must be >= 0 and post >= 1")
+
+        self.port = port
+        self.level = level
+        self.kind = kind
+        self.slope = slope
+        self.pre = pre
+        self.post = post
+        self.hysteresis = hysteresis
+        self.rearm = rearm
+        self.max_captures = max_captures
+
+        self.column = None
+        self.reset()
+
+    def attach(self, ports):
+        """
+        Looks up the column of the trigger port. Called by the measurement on arm().
+
+        *Arguments*
+
+            ports : list of strings
+                The ports of the measurement.
+
+        *Returns*
+
+            None
+
+        """
+        if self.port not in ports:
+            raise ValueError("trigger port " + str(self.port) + " is not a port of the measurement")
+        self.column = ports.index(self.port) + 1      # column 0 is time
+
+    def reset(self):
+        """ Arms the trigger and empties the pre-trigger buffer. """
+        self.captures = 0
+        self.done = False
+        self.history = None         # the last pre samples
+        self.window = None          # window, which is captured at the moment
+        self.filled = 0
+        self.state = 0              # edge: last sample below (-1) / above (1) the band
+
+    def process(self, block):
+        """
+        Feeds a block of samples and returns the windows, which are complete.
+
+        *Arguments*
+
+            block : np.ndarray
+                Block of samples, column 0 is time.
+
+        *Returns*
+
+            windows : list of np.ndarray
+                Complete windows, each one block of up to pre + post rows. Only windows at
+                the very beginning of a measurement have less than pre samples before the
+                trigger.
+
+        """
+        windows = []
+        n = len(block)
+        if self.history is None:
+            self.history = np.empty( (0, block.shape[1]) )
+
+        triggers = self.__find(block[:, self.column])
+
+        pos = 0
+        while pos < n and not self.done:
+            if self.window is not None:         # capturing
+                take = min(self.post - self.filled, n - pos)
+                start = len(self.window) - self.post + self.filled
+                self.window[start:start+take] = block[pos:pos+take]
+                self.filled = self.filled + take
+                pos = pos + take
+
+                if self.filled == self.post:    # window is complete
+                    windows.append(self.window)
+                    self.window = None
+                    self.captures = self.captures + 1
+                    if not self.rearm or (self.max_captures is not None and self.captures >= self.max_captures):
+                        self.done = True
+            else:                               # armed: look for the next trigger
+                later = triggers[ triggers >= pos ]
+                if len(later) == 0:
+                    break
+                i = int(later[0])
+
+                if self.pre > 0:
+                    before = np.concatenate( (self.history, block[:i]) )[-self.pre:]
+                else:
+                    before = block[:0]
+                self.window = np.empty( (len(before) + self.post, block.shape[1]) )
+                self.window[:len(before)] = before
+                self.filled = 0
+                pos = i
+
+        # ring buffer of the last pre samples
+        if self.pre > 0:
+            if n >= self.pre:
+                self.history = block[n-self.pre:].copy()
+            else:
+                self.history = np.concatenate( (self.history, block) )[-self.pre:]
+
+        return windows
+
+    def __find(self, x):
+        """ indices of all samples of x, where the trigger condition is met """
+        if self.slope == "falling":     # mirror the signal
+            x = -x
+            level = -self.level
+        else:
+            level = self.level
+
+        if self.kind == "level":
+            return np.flatnonzero(x >= level)
+
+        # edge: +1 above the level, -1 below the band, 0 inside the band
+        s = np.where( x >= level, 1, np.where( x < level - self.hysteresis, -1, 0 ) )
+
+        # for every sample the state before it: forward fill the band with the last state
+        index = np.where( s != 0, np.arange(len(s)), -1 )
+        last = np.maximum.accumulate(index)
+        filled = np.where( last >= 0, s[np.maximum(last, 0)], self.state )
+        previous = np.concatenate( ([self.state], filled[:-1]) )
+
+        if len(filled) > 0:
+            self.state = int(filled[-1])
+        return np.flatnonzero( (s == 1) & (previous == -1) )
+
+
+"""
+This file is part of duckDAQ.
+
+DuckDAQ is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuckDAQ is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with duckDAQ.  If not, see <http://www.gnu.org/licenses/>.
+"""
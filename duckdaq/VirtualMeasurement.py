@@ -22,17 +22,33 @@ class VirtualMeasurement():
         filename : string
             Is the filename, where csvdata is saved.
 
+        maxsize : int
+            Maximum number of items in the queue. 0 means unbounded.
+            For the output of a filter, use self.queue.limit() later.
+
+        overflow : string
+            What happens, if the queue is full, see MeasurementQueue.
+
+        max_memory : int
+            Memory budget of the queue in bytes, beyond it data is buffered on disk.
+
     **Variables**
         self.parentFilter
             the filter, which created the virtual measurement
         self.queue
-            The queue, where the measurement data is put. See arguments
+            The MeasurementQueue, where the measurement data is put. It may contain tuples and
+            blocks (see util.isBlock()).
         self.ports
             The list of ports.
         self.RUNNING
             Is set True, if the filter is RUNNING.
+        self.consumers
+            The filters, which read this measurement. They register themselves, see Pipeline.
+        self.dtype
+            The structured dtype of the records, see util.recordDtype(). None: derived
+            from the ports, when needed. Filters set it, i.e. EdgeFinder.
     """
-    def __init__(self, parentFilter, ports=[], FILE=None):
+    def __init__(self, parentFilter, ports=[], FILE=None, maxsize=0, overflow="block", max_memory=None):
         
         self.FILE = FILE            # file to write data to
         self.RUNNING = False	    # check, if a daq is runnging
@@ -40,10 +56,12 @@ class VirtualMeasurement():
 
         # the filter which created this vm
         self.parentFilter = parentFilter
+        self.consumers = []         # filters reading this measurement
+        self.dtype = None           # of the records, None: from the ports
         
         # create queue
-        from queue import Queue   
-        self.queue = Queue()
+        from duckdaq.MeasurementQueue import MeasurementQueue
+        self.queue = MeasurementQueue(maxsize, overflow, max_memory)
     
     def findHardwareMeasurement(self, meas=None):
         """
@@ -69,12 +87,63 @@ class VirtualMeasurement():
             return self.findHardwareMeasurement(self)        
 
         # if no hw measurement, call again with the filters input meas
-        if type( meas ) is Measurement:
+        if isinstance( meas, Measurement ):
             return meas
         else:
             return meas.parentFilter.inm.findHardwareMeasurement()
 
+    def select(self, ports):
+        """
+        A view of some ports of the measurement, without thread and without copying the
+        data, see ColumnView and Measurement.select(). Views have to be created, before the
+        filter is started.
+
+        *Arguments*
+
+            ports : list of strings / ints
+                The ports, by name or index, i.e. ["AIN0", "AIN2"]
+
+        *Returns*
+
+            view : ColumnView
+
+        """
+        from duckdaq.ColumnView import ColumnView
+        return ColumnView(self, ports)
+
+    def split(self):
+        """
+        One view per port, see select().
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            views : list of ColumnView
+
+        """
+        return [ self.select([i]) for i in range( len(self.ports) ) ]
+
     
+    def data_blocks(self):
+        """
+        Async generator of the data as blocks, see Measurement.data_blocks(). The filter has
+        to be started before.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            blocks : async generator of np.ndarray
+
+        """
+        from duckdaq.AsyncBridge import iterBlocks
+        return iterBlocks(self)
+
     # reimport methods for data export
     #
     #
@@ -91,8 +160,9 @@ class VirtualMeasurement():
             None
         
         """
-        while self.queue.empty() != True:
-            print(self.queue.get())
+        from duckdaq.util import queueRows
+        for row in queueRows(self.queue):
+            print(row)
 
 
     def data_csv_write(self, filename=None):
@@ -117,6 +187,28 @@ class VirtualMeasurement():
 
         from duckdaq.util import write_csv
         write_csv(filename, self)
+
+    def data_npy_write(self, filename=None):
+        """
+        Writes the queue as records into an .npy file, which a ReplayMeasurement can
+        play back, see util.write_npy()
+
+        *Arguments*
+
+            filename: string
+                Desired filename (best absolute). If no filename is given,
+                filename will be used.
+
+        *Returns*
+
+            None
+
+        """
+        if filename is None:
+            filename = self.FILE
+
+        from duckdaq.util import write_npy
+        write_npy(filename, self)
     
     
     def data_csv_read(self, filename):
@@ -203,6 +295,24 @@ class VirtualMeasurement():
         from duckdaq.util import meas2ndarray
         return meas2ndarray(self)
 
+    def data_records(self):
+        """
+        Creates one array of records from the data in the queue, see util.meas2records().
+        The columns are typed: analog ports float32, digital ports bool, edges int8.
+
+        *Arguments*
+
+            None
+
+        *Returns*
+
+            records : np.ndarray
+                Structured array, i.e. records["t"], records["AIN0"]
+
+        """
+        from duckdaq.util import meas2records
+        return meas2records(self)
+
     
     def data_dataframe(self):
         """
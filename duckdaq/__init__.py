@@ -12,12 +12,18 @@ if "__DDPATH__" not in locals():     # only at first call
 # parts of the module
 from . import util
 from .Measurement import Measurement
+from .MultiMeasurement import MultiMeasurement
+from .ReplayMeasurement import ReplayMeasurement
 from .VirtualMeasurement import VirtualMeasurement
+from .Session import Session
+from .Trigger import Trigger
+from .Pipeline import Pipeline
 from . import Filter
 from . import Display
 from . import Device
+from . import Backend
 
-__all__ = ["util", "Measurement", "VirtualMeasurement", "Filter", "Device"]
+__all__ = ["util", "Measurement", "MultiMeasurement", "ReplayMeasurement", "VirtualMeasurement", "Session", "Trigger", "Pipeline", "Filter", "Device", "Backend"]
 
 
 
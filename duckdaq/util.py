@@ -39,9 +39,7 @@ def write_csv(filename, measurement):
     file.write("\n")
 
     # write data to file
-    while queue.empty() != True:
-        data = queue.get()
-
+    for data in queueRows(queue):
         lend = len(data)
         for entry, i in zip( data, list(range(lend))):
             # True/False, can not be interpreted by qtiplot, convert to 1/0
@@ -84,8 +82,7 @@ def read_csv(filename, measurement):
     header = header.strip()     # strip newline /whitespace
     measurement.ports = header.split(";")[1:]       # without "t" field
 
-    with measurement.queue.mutex:
-        measurement.queue.queue.clear()   # empty queue
+    clearQueue(measurement.queue)   # empty queue
 
     # add datalines to queue
     for line in lines:
@@ -101,6 +98,28 @@ def read_csv(filename, measurement):
     file.close()
 
 
+def write_npy(filename, measurement):
+    """
+    Writes the queue of a measurement as records (see meas2records()) into an .npy
+    file, which ReplayMeasurement can play back. The names of the fields are the ports,
+    analog ports are stored as float32. The queue will be emptied.
+
+    *Arguments*
+
+        filename: string
+            Desired filename (best absolute), should end with ".npy"
+        measurement: Measurement / VirtualMeasurement
+            Measurement from where to empty the queue
+
+    *Returns*
+
+        None
+
+    """
+    import numpy as np
+    np.save(filename, meas2records(measurement))
+
+
 def plot(measurement):
     """
     Creates a quick plot via matplotlib of the data in the queue
@@ -137,7 +156,7 @@ def plot(measurement):
 def queueToList(queue):
     """
     Takes all items in a queue and returns them in a list in
-    the right order.
+    the right order. Blocks are split up into one tuple per sample.
 
     *Arguments*
 
@@ -149,23 +168,339 @@ def queueToList(queue):
             list of the items which were in the queue
 
     """
-    
-    import time
-    result = []
+    return list( queueRows(queue) )
+
+
+def clearQueue(queue):
+    """
+    Empties a queue, also the part spilled to disk of a MeasurementQueue.
+
+    *Arguments*
+
+        queue : Queue.Queue / MeasurementQueue
+            queue to empty
+
+    *Returns*
+        None
+
+    """
+    if hasattr(queue, "clear"):
+        queue.clear()
+    else:
+        with queue.mutex:
+            queue.queue.clear()
+
+
+# default limits of one batch of drainQueue()
+DRAIN_ITEMS = 256
+DRAIN_BYTES = 1 << 22
 
+def drainQueue(queue, items=None, max_items=DRAIN_ITEMS, max_bytes=None):
+    """
+    Takes the items, which are in a queue, without blocking, but not more than one batch:
+    at most max_items items and max_bytes bytes. The rest stays in the queue for the next
+    call, so a backlog spilled to disk (see MeasurementQueue) is not loaded into memory
+    at once.
+
+    *Arguments*
+
+        queue : Queue.Queue / MeasurementQueue
+        items : list
+            Items taken already (they count for the limits), the new ones are appended.
+        max_items : int
+            Maximum number of items.
+        max_bytes : int
+            Maximum memory of the items. Default: the memory budget of the queue
+            (max_memory), or DRAIN_BYTES.
+
+    *Returns*
+        items : list
+
+    """
+    import queue as queuemod
+    from duckdaq.MeasurementQueue import itemBytes
+
+    if items is None:
+        items = []
+    if max_bytes is None:
+        max_bytes = getattr(queue, "max_memory", None) or DRAIN_BYTES
+
+    nbytes = sum( [ itemBytes(item) for item in items ] )
+    while len(items) < max_items and nbytes < max_bytes:
+        try:
+            item = queue.get_nowait()
+        except queuemod.Empty:
+            break
+        items.append(item)
+        nbytes = nbytes + itemBytes(item)
+    return items
+
+
+def openQueue(queue):
+    """
+    Opens a MeasurementQueue, when its producer starts. Other queues are ignored.
+
+    *Arguments*
+
+        queue : Queue.Queue / MeasurementQueue
+
+    *Returns*
+        None
+
+    """
+    if hasattr(queue, "open"):
+        queue.open()
+
+
+def closeQueue(queue):
+    """
+    Closes a MeasurementQueue, when its producer is finished: waiting consumers get
+    EndOfStream, listeners are woken up. Other queues are ignored.
+
+    *Arguments*
+
+        queue : Queue.Queue / MeasurementQueue
+
+    *Returns*
+        None
+
+    """
+    if hasattr(queue, "close"):
+        queue.close()
+
+
+def queueRows(queue):
+    """
+    Generator, which empties a queue and yields one data tuple (time, data0, data1, ...)
+    per sample. Blocks (see isBlock()) are split up into their rows.
+
+    *Arguments*
+
+        queue : Queue.Queue
+            queue to read and empty
+
+    *Returns*
+        rows : generator of tuples
+
+    """
     while queue.empty() != True:
-        result.append( queue.get() )
-    return result
+        data = queue.get()
+        if isinstance(data, tuple):
+            yield data
+        else:       # block or records
+            for row in data.tolist():
+                yield tuple(row)
 
 
-def initLJ():
+def isBlock(data):
+    """
+    Checks, if an item of a measurement queue is a block. Besides tuples of the form
+    (time, data0, data1, ...), queues may contain blocks: two-dimensional ndarrays with one
+    row per sample, where the first column is the time and the other columns are the ports.
+
+    *Arguments*
+
+        data : tuple / np.ndarray
+            item from a measurement queue
+
+    *Returns*
+
+        result : bool
+            True, if data is a block
+
+    """
+    return (not isinstance(data, tuple)) and getattr(data, "ndim", None) == 2
+
+
+# codes of the edges of EdgeFinder in records
+EDGE_CODES = { None : 0, "LH" : 1, "HL" : -1 }
+
+
+def recordDtype(ports, analog="float32", digital=False, edges=False):
+    """
+    Creates the structured dtype of the records of a measurement: one field "t" (float64)
+    for the time, then one field per port. Analog ports (AIN...) get the analog type,
+    digital ports (DIN...) bool, all others (i.e. the ports of filters) float64. With
+    digital=True, all ports are bool, with edges=True int8 edge codes, see EDGE_CODES. If a name appears twice,
+    it is numbered: "AIN0", "AIN0_2".
+
+    One sample of an analog port then takes 4 bytes instead of a float object in a tuple,
+    so a structured block needs about a tenth of the memory of tuples.
+
+    *Arguments*
+
+        ports : list of strings
+            The ports of the measurement.
+        analog : string / np.dtype
+            Type of analog ports, "float32" or "float64".
+        digital : bool
+            True for the output of a SchmittTrigger.
+        edges : bool
+            True for the output of an EdgeFinder.
+
+    *Returns*
+
+        dtype : np.dtype
+
+    """
+    import numpy as np
+    from re import search
+
+    fields = [ ("t", np.float64) ]
+    names = set(["t"])
+    for port in ports:
+        name = str(port)
+        n = 2
+        while name in names:
+            name = str(port) + "_" + str(n)
+            n = n + 1
+        names.add(name)
+
+        if edges:
+            typ = np.int8
+        elif digital:
+            typ = np.bool_
+        elif search('(^|:)AIN[0-9]+$', str(port)):
+            typ = np.dtype(analog)
+        elif search('(^|:)DIN[0-9]+$', str(port)):
+            typ = np.bool_
+        else:
+            typ = np.float64
+        fields.append( (name, typ) )
+    return np.dtype(fields)
+
+
+def measDtype(meas):
+    """
+    The structured dtype of a measurement: meas.dtype, if it is set (i.e. by EdgeFinder),
+    otherwise recordDtype() of its ports.
+    """
+    dtype = getattr(meas, "dtype", None)
+    if dtype is not None:
+        return dtype
+    return recordDtype(meas.ports)
+
+
+def isRecords(data):
+    """
+    Checks, if an item of a measurement queue is a block of records: a one-dimensional
+    structured ndarray, see recordDtype().
+    """
+    return getattr(getattr(data, "dtype", None), "names", None) is not None
+
+
+def toRecords(data, dtype):
+    """
+    Converts samples into records.
+
+    *Arguments*
+
+        data : list of tuples / np.ndarray
+            Tuples, a block (see isBlock()) or records. None becomes NaN, False or
+            edge code 0, "LH" / "HL" become edge codes.
+        dtype : np.dtype
+            See recordDtype().
+
+    *Returns*
+
+        records : np.ndarray
+
+    """
+    import numpy as np
+
+    if isRecords(data):
+        return data if data.dtype == dtype else data.astype(dtype)
+
+    records = np.empty( len(data), dtype=dtype )
+    if isBlock(data):
+        for i, name in enumerate(dtype.names):
+            column = data[:, i]
+            if records.dtype[name] == np.bool_:
+                records[name] = np.nan_to_num(column) != 0
+            elif records.dtype[name].kind == "i":
+                records[name] = np.nan_to_num(column)
+            else:
+                records[name] = column
+        return records
+
+    columns = list( zip(*data) )
+    for i, name in enumerate(dtype.names):
+        column = columns[i] if i < len(columns) else ()
+        typ = records.dtype[name]
+        if typ == np.int8:
+            records[name] = [ EDGE_CODES.get(v, 0) if v is None or isinstance(v, str) else v for v in column ]
+        elif typ == np.bool_:
+            records[name] = [ bool(v) if v is not None else False for v in column ]
+        else:
+            records[name] = [ np.nan if v is None else v for v in column ]
+    return records
+
+
+def fromRecords(records):
+    """
+    Converts records into a block (see isBlock()) of float64, i.e. for process_block()
+    of a filter. Digital ports become 0 / 1, edges their codes.
+    """
+    import numpy as np
+
+    block = np.empty( (len(records), len(records.dtype.names)), dtype=np.float64 )
+    for i, name in enumerate(records.dtype.names):
+        block[:, i] = records[name]
+    return block
+
+
+def meas2records(meas):
+    """
+    Creates one array of records (see recordDtype()) from the data in the queue of
+    a measurement. The queue is emptied.
+
+    *Arguments*
+
+        measurement : Measurement / VirtualMeasurement
+
+    *Returns*
+
+        records : np.ndarray
+            Structured array, one record per sample. The columns are records["t"],
+            records["AIN0"], ...
+
+    """
+    import numpy as np
+
+    dtype = measDtype(meas)
+    parts = []
+    rows = []
+    queue = meas.queue
+    while queue.empty() != True:
+        data = queue.get()
+        if isinstance(data, tuple):
+            rows.append(data)
+        else:
+            if len(rows) > 0:
+                parts.append( toRecords(rows, dtype) )
+                rows = []
+            parts.append( toRecords(data, dtype) )
+    if len(rows) > 0:
+        parts.append( toRecords(rows, dtype) )
+
+    if len(parts) == 0:
+        return np.empty( 0, dtype=dtype )
+    return np.concatenate(parts)
+
+
+def initLJ(serial=None, cached=False):
     """
     Opens the next aviable Labjack (U3) and returns the instance.
-    If no LabJack is connected, an exception is raised.
+    If no LabJack is connected, None is returned.
+    The device is opened with the backend selected by Backend.use().
 
     *Arguments*
         
-        None
+        serial : int
+            If given, the device with this serial number is opened.
+        cached : bool
+            If True, the calibration data is read from the cache on disk, see
+            loadCalibration(). Otherwise it is read from the device.
 
     *Returns*
         
@@ -173,20 +508,113 @@ def initLJ():
             Instance of the LabJack device
 
     """
-    from u3 import U3
-    from re import search
-    from LabJackPython import NullHandleException
+    from duckdaq import Backend
+    backend = Backend.current()     # real hardware or emulator
 
     try:
-        lj = U3()          # init lj
+        if serial is None:
+            lj = backend.U3()          # init lj
+        else:
+            lj = backend.U3(serial=serial)
         #self.lj.reset()
-        lj.getCalibrationData()
-    except NullHandleException:
+        if cached:
+            loadCalibration(lj)
+        else:
+            lj.getCalibrationData()
+    except backend.NullHandleException:
         return None
 
     return lj
 
 
+def loadCalibration(labjack, directory=None):
+    """
+    Sets the calibration data of a device from a cache on disk. The calibration of every
+    device is stored in a json file named after its serial number. If there is no file yet,
+    the data is read from the device with getCalibrationData() and then saved.
+
+    *Arguments*
+
+        labjack : U3.U3
+            Opened LabJack instance
+        directory : string
+            Directory of the cache. Default is ~/.duckdaq/calibration
+
+    *Returns*
+
+        calData : dict
+            The calibration data, as getCalibrationData() returns it.
+
+    """
+    import json
+
+    if directory is None:
+        directory = os.path.join( os.path.expanduser("~"), ".duckdaq", "calibration" )
+    filename = os.path.join( directory, "U3-" + str(labjack.serialNumber) + ".json" )
+
+    if os.path.exists(filename):
+        with open(filename, "r") as file:
+            labjack.calData = json.load(file)
+        return labjack.calData
+
+    calData = labjack.getCalibrationData()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(filename, "w") as file:
+            json.dump(calData, file)
+    except OSError:                 # not cached, but it works anyway
+        pass
+    return calData
+
+
+def calibrationArrays(labjack, channels):
+    """
+    Returns the calibration of the given analog channels as arrays, so raw 16 bit values
+    of a whole stream packet can be converted to volts at once:
+    volts = bits * slope + offset. The constants are the ones read by
+    getCalibrationData() in initLJ(), the same ones processStreamData() uses.
+    The HV inputs of a U3-HV (AIN0-3) have their own calibration, the FIO inputs
+    share the low voltage one. Channels are measured single ended (negative channel 31).
+
+    *Arguments*
+
+        labjack : U3.U3
+            **Initalised** LabJack instance
+        channels : list of int
+            The positive channel numbers, i.e. [0, 1, 4]
+
+    *Returns*
+
+        slope, offset : np.ndarray, np.ndarray
+            One entry per channel.
+
+    """
+    import numpy as np
+
+    calData = getattr(labjack, "calData", None)
+    isHV = getattr(labjack, "isHV", True)
+
+    slope = np.empty( len(channels), dtype=np.float64 )
+    offset = np.empty( len(channels), dtype=np.float64 )
+    for i, n in enumerate(channels):
+        if isHV and n < 4:      # high voltage input
+            if calData is not None:
+                slope[i] = calData["hvAIN%sSlope" % n]
+                offset[i] = calData["hvAIN%sOffset" % n]
+            else:               # nominal values of the driver
+                slope[i] = 0.000314
+                offset[i] = -10.3
+        else:                   # low voltage input
+            if calData is not None:
+                slope[i] = calData["lvSESlope"]
+                offset[i] = calData["lvSEOffset"]
+            else:
+                slope[i] = 0.000037231
+                offset[i] = 0.0
+
+    return slope, offset
+
+
 def setDataDirection(labjack, portlist):
     """
     Sets the HV-Analog-In and FIO ports if a LabJack instance to digital or analog input.
@@ -204,8 +632,6 @@ def setDataDirection(labjack, portlist):
             already formated portlist, **not a regular list of strings**
 
     """
-    from u3 import BitDirWrite
-    
     for typ, n in portlist:
 #            if n < 4:       # HV ports are hard wired
 #                continue
@@ -265,13 +691,30 @@ def meas2ndarray(meas):
     """
     import numpy as np
    
-    # fetch as list
-    tmplist = queueToList( meas.queue )
+    # collect blocks as they are, consecutive tuples are converted together
+    parts = []
+    rows = []
+    queue = meas.queue
+    while queue.empty() != True:
+        data = queue.get()
+        if isinstance(data, tuple):
+            rows.append(data)
+        else:
+            if len(rows) > 0:
+                parts.append( np.asarray( rows, dtype=np.float64 ) )
+                rows = []
+            if isRecords(data):
+                data = fromRecords(data)
+            parts.append( np.asarray( data, dtype=np.float64 ) )
+    if len(rows) > 0:
+        parts.append( np.asarray( rows, dtype=np.float64 ) )
 
     # create ndarray
-    array = np.asarray( tmplist, dtype=np.float64 )
-
-    return array
+    if len(parts) == 0:
+        return np.asarray( [], dtype=np.float64 )
+    elif len(parts) == 1:
+        return parts[0]
+    return np.concatenate( parts )
 
 
 def meas2dataframe(meas):
@@ -5,7 +5,7 @@ from setuptools import setup
 
 setup(
     name = "duckdaq",
-    packages = ["duckdaq", "duckdaq.Filter", "duckdaq.Device", "duckdaq.Display"],
+    packages = ["duckdaq", "duckdaq.Filter", "duckdaq.Device", "duckdaq.Display", "duckdaq.Backend"],
     version = "0.1",
     description = "Didactic lab software for the LabJack U3-HV",
     author = "Ulrich Leutner",